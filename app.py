@@ -62,7 +62,12 @@ def initialize_graph():
     """Initialize and cache the LangGraph workflow"""
     try:
         from src.graph.graph_builder import graph
-        return graph
+        from src.graph.answer_cache import CachedGraph
+        from src.llms.registry import warm_up
+        # Graph import is cheap; the vector store and clients load in the background
+        warm_up()
+        # Repeated and near-duplicate questions are answered without running the graph
+        return CachedGraph(graph)
     except ImportError as e:
         st.error(f"Import error: {e}")
         st.error("Please make sure all dependencies are installed and the graph is properly built.")
@@ -76,6 +81,8 @@ if graph is None:
 
 try:
     from langchain_core.messages import HumanMessage
+    from src.graph.streaming import stream_answer
+    from src.graph.instrumentation import breakdown_rows
 except ImportError as e:
     st.error(f"Import error: {e}")
     st.stop()
@@ -88,6 +95,25 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+def show_breakdown(placeholder, trace):
+    """Per-node time, LLM calls, tokens and chunks of the last answer"""
+    with placeholder.container():
+        st.markdown("**Last Answer Breakdown**")
+        if not trace:
+            st.caption("Ask a question to see where the time goes.")
+            return
+        totals = trace["totals"]
+        st.caption(
+            f"{trace['seconds']:.2f}s total · {totals['llm_calls']} LLM calls "
+            f"({totals['llm_seconds']:.2f}s) · {totals['prompt_tokens']} prompt + "
+            f"{totals['completion_tokens']} completion tokens · {totals['chunks']} chunks"
+            + (f" · {totals['retries']} retries" if totals["retries"] else "")
+        )
+        if trace["cache"]:
+            st.caption(f"Answered from cache ({trace['cache']} match)")
+        else:
+            st.dataframe(breakdown_rows(trace), hide_index=True, use_container_width=True)
+
 # Main title
 st.title("🤖 RAG Question Answering System")
 st.markdown("Ask questions about LangChain and LangGraph documentation!")
@@ -105,6 +131,25 @@ with st.sidebar:
         st.session_state.messages = []
         st.rerun()
     
+    cache_stats = graph.cache.stats()
+    st.markdown(
+        f"**Answer Cache**: {cache_stats['entries']} entries, "
+        f"{cache_stats['hit_rate']:.0%} hit rate "
+        f"({cache_stats['exact_hits']} exact, {cache_stats['similar_hits']} similar, "
+        f"{cache_stats['misses']} misses)"
+    )
+    from src.nodes.pregrader import pregrade_stats
+    pregrade = pregrade_stats.summary()
+    st.markdown(
+        f"**Local Pre-Grader**: skipped LLM grading on {pregrade['skip_rate']:.0%} "
+        f"of {pregrade['retrievals']} retrievals"
+    )
+    
+    st.markdown("---")
+    # Filled in again once the next answer is done
+    breakdown = st.empty()
+    show_breakdown(breakdown, st.session_state.get("last_trace"))
+    
     st.markdown("---")
     st.markdown("**Sample Questions:**")
     st.markdown("- What is LangGraph?")
@@ -131,31 +176,50 @@ if prompt := st.chat_input("Ask a question about LangChain or LangGraph..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
 
     with st.chat_message("assistant"):
-        with st.spinner("Thinking... 🤔"):
-            try:
-                # Create the input for the graph
-                input_messages = [HumanMessage(content=prompt)]
-                
-                # Run the graph
-                result = graph.invoke({"messages": input_messages})
-                
-                # Extract the response with proper text extraction
-                if result and "messages" in result and result["messages"]:
-                    raw_content = result["messages"][-1].content
-                    response = extract_text_content(raw_content)
-                else:
-                    response = "I'm sorry, I couldn't generate a response. Please try again."
-                
-                # Display the response
-                st.markdown(response)
-                
-                # Add assistant response to chat history (store clean text)
-                st.session_state.messages.append({"role": "assistant", "content": response})
-                
-            except Exception as e:
-                error_message = f"An error occurred: {str(e)}"
-                st.error(error_message)
-                st.session_state.messages.append({"role": "assistant", "content": error_message})
+        status = st.status("Thinking... 🤔")
+        placeholder = st.empty()
+        try:
+            # Create the input for the graph
+            input_messages = [HumanMessage(content=prompt)]
+            
+            # Run the graph: node progress goes to the status box, answer tokens
+            # are rendered as they arrive
+            partial = ""
+            info = None
+            for event, value in stream_answer(graph, {"messages": input_messages}):
+                if event == "node":
+                    status.write(f"✓ {value}")
+                elif event == "token":
+                    partial += value
+                    placeholder.markdown(partial + "▌")
+                elif event == "done":
+                    info = value
+            status.update(label="Done", state="complete", expanded=False)
+            
+            # Extract the response with proper text extraction
+            if info and info["answer"]:
+                response = extract_text_content(info["answer"])
+            else:
+                response = "I'm sorry, I couldn't generate a response. Please try again."
+            
+            # Display the response
+            placeholder.markdown(response)
+            if info and info["cache"]:
+                st.caption(f"⚡ Answered from cache ({info['cache']} match)")
+            elif info:
+                st.caption(f"First token after {info['ttft']:.2f}s · total {info['total']:.2f}s")
+            if info:
+                st.session_state.last_trace = info["trace"]
+                show_breakdown(breakdown, info["trace"])
+            
+            # Add assistant response to chat history (store clean text)
+            st.session_state.messages.append({"role": "assistant", "content": response})
+            
+        except Exception as e:
+            status.update(label="Failed", state="error", expanded=False)
+            error_message = f"An error occurred: {str(e)}"
+            st.error(error_message)
+            st.session_state.messages.append({"role": "assistant", "content": error_message})
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,184 @@
+"""
+Fixtures and stand-ins shared by the test modules
+
+Test modules import the helpers from here (from conftest import ...), which
+works both under pytest and when a test file is run as a script.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from src.ingetsion import retriever
+from src.llms import registry
+from src.llms.fake_llm import FakeChatModel
+from src.models.grader import ChunkGrades
+import numpy as np
+import pytest
+import threading
+import tiktoken
+import time
+import zlib
+
+# Async graph and API
+
+QUESTION = "How do vector stores enable semantic search?"
+
+# Seconds every fake LLM call takes in the async and API tests
+LATENCY = 0.05
+
+@pytest.fixture(autouse=True)
+def reset_vectorstore_cache():
+    """Tests build their stores in temporary directories: none is left cached for the next test"""
+    retriever._vectorstore_cache = retriever._vectorstore_key = None
+    yield
+    retriever._vectorstore_cache = retriever._vectorstore_key = None
+
+def register_fake_llms(latency=LATENCY):
+    """Separate router and answer models, so the calls of each can be counted"""
+    router, llm = FakeChatModel(latency=latency), FakeChatModel(latency=latency)
+    registry.reset_registry()
+    registry.register("llm", llm)
+    registry.register("tool_calling_llm", router.bind_tools([registry.get_retriever_tool()]))
+    return router, llm
+
+# Grading and routing
+
+def make_state(texts):
+    docs = [Document(page_content=text, metadata={"source": f"doc-{i}"}) for i, text in enumerate(texts)]
+    return {
+        "messages": [
+            HumanMessage(content="What is LangGraph?"),
+            ToolMessage(content="\n\n".join(texts), artifact=docs, tool_call_id="call-1"),
+        ]
+    }
+
+TEXTS = [
+    "LangGraph builds stateful agents as graphs.",
+    "Pinecone is a hosted vector database.",
+    "LangGraph nodes update a shared state.",
+    "Chunk overlap keeps context across splits.",
+]
+
+class StubChunkGrader:
+    """Batched grader: marks the given document numbers relevant and records its prompts"""
+
+    def __init__(self, relevant=None, fail=False):
+        self.relevant = relevant or []
+        self.fail = fail
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages[0]["content"])
+        if self.fail:
+            raise ValueError("could not parse structured output")
+        return ChunkGrades(relevant=self.relevant)
+
+class StubRouter:
+    """Tool-calling model: always retrieves with the latest question"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        query = [m for m in messages if isinstance(m, HumanMessage)][-1].content
+        return AIMessage(content="", tool_calls=[
+            {"name": "document_retriever", "args": {"query": query}, "id": f"call-{self.calls}"}
+        ])
+
+# Ingestion
+
+# Byte-level encoding with the GPT-2 pre-tokenizer, so the test needs no downloaded BPE files
+GPT2_PATTERN = r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+BYTE_ENCODING = tiktoken.Encoding(
+    "test-bytes",
+    pat_str=GPT2_PATTERN,
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+def paragraph_split(docs):
+    """Small stand-in for split_texts: one chunk per paragraph"""
+    return [
+        Document(page_content=paragraph.strip(), metadata=dict(doc.metadata))
+        for doc in docs
+        for paragraph in doc.page_content.split("\n\n")
+        if paragraph.strip()
+    ]
+
+PAGE_DELAY = 0.2
+
+class DocsHandler(BaseHTTPRequestHandler):
+    """Serves /page/<n> with an ETag and answers conditional requests with 304"""
+    requests_seen = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        etag = f'"{self.path}-v1"'
+        with self.lock:
+            self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        time.sleep(PAGE_DELAY)
+        if self.path == "/missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = (
+            f"<html lang='en'><head><title>Page {self.path}</title></head>"
+            f"<body><p>Documentation for {self.path} about LangGraph.</p></body></html>"
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DocsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Hybrid retrieval
+
+class HashingEmbeddings(Embeddings):
+    """Character trigram counts hashed into a small vector, so word variants land close together"""
+
+    def __init__(self, dimension=512):
+        self.dimension = dimension
+        self.embedded = 0
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in text.lower().split():
+            word = f" {word.strip('.,?!')} "
+            for i in range(len(word) - 2):
+                vector[zlib.crc32(word[i:i + 3].encode("utf-8")) % self.dimension] += 1
+        return (vector / max(np.linalg.norm(vector), 1e-9)).tolist()
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def corpus():
+    texts = [
+        "Checkpointers persist the graph state after every super-step of a run.",
+        "Tool nodes execute the tool calls requested by the chat model.",
+        "Document loaders fetch web pages and turn them into documents.",
+        "Text splitters cut long documents into overlapping chunks.",
+        "Vector stores keep embeddings and answer similarity queries.",
+        "Streaming sends tokens to the user while the model is still generating.",
+        "Conditional edges pick the next node from the current graph state.",
+        "Retrievers return the documents that best match a question.",
+    ]
+    return [Document(page_content=text, metadata={"source": f"doc-{i}"}) for i, text in enumerate(texts)]
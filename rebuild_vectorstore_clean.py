@@ -1,43 +1,63 @@
 """
 Script to rebuild the vector store from scratch (clean rebuild)
+or refresh it incrementally (--incremental)
 """
 import shutil
 import os
 from pathlib import Path
 
-def rebuild_clean():
+def rebuild_clean(backend=None):
     """Delete existing vector store and rebuild from scratch"""
+    from src.ingetsion.retriever import get_backend, DEFAULT_PERSIST_DIRECTORIES
+    
+    backend = get_backend(backend)
+    print(f"Backend: {backend}")
     
     # Delete existing vector store
-    chroma_path = Path("./chroma_db")
-    if chroma_path.exists():
+    store_path = Path(DEFAULT_PERSIST_DIRECTORIES[backend])
+    if store_path.exists():
         print("Deleting existing vector store...")
         try:
-            shutil.rmtree(chroma_path)
+            shutil.rmtree(store_path)
             print("✓ Vector store deleted")
         except Exception as e:
             print(f"✗ Error deleting vector store: {e}")
             print("Please close Streamlit app and try again")
             return
     
-    # Load and split documents
-    print("\nLoading documents from URLs...")
-    from src.ingetsion.document_loaders import load_web_documents, urls_full
-    from src.ingetsion.text_splitter import split_texts
-    from src.ingetsion.retriever import create_vectorstore
+    index_documents(backend)
+
+def refresh_incremental(backend=None):
+    """Re-index only the pages whose content changed since the last run"""
+    from src.ingetsion.retriever import get_backend
     
-    docs = load_web_documents(urls_full)
-    print(f"✓ Loaded {len(docs)} documents")
+    backend = get_backend(backend)
+    print(f"Backend: {backend} (incremental refresh)")
+    index_documents(backend)
+
+def index_documents(backend):
+    """Stream documents from the web into the (possibly empty) vector store"""
+    from src.ingetsion.document_loaders import urls_full
+    from src.ingetsion.pipeline import run_ingestion_pipeline
     
-    splits = split_texts(docs)
-    print(f"✓ Split into {len(splits)} chunks")
+    # Pages are fetched, split and inserted batch by batch; on an empty store this
+    # indexes everything and writes the content-hash manifest
+    print("\nIngesting documents from URLs...")
+    run_ingestion_pipeline(urls_full, backend=backend)
     
-    # Create new vector store
-    print("\nCreating vector store...")
-    retriever = create_vectorstore(splits, force_reload=True)
-    print("✓ Vector store created successfully!")
+    if backend == "hybrid":
+        # Embed the new chunks for the dense index now rather than on the first query
+        from src.ingetsion.retriever import create_vectorstore
+        create_vectorstore(backend=backend, force_reload=True)
     
     print("\n✅ Done! You can now run the Streamlit app.")
 
 if __name__ == "__main__":
-    rebuild_clean()
+    import sys
+    # Usage: python rebuild_vectorstore_clean.py [chroma|inverted_index|hybrid] [--incremental]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    backend = args[0] if args else None
+    if "--incremental" in sys.argv:
+        refresh_incremental(backend)
+    else:
+        rebuild_clean(backend)
@@ -0,0 +1,81 @@
+"""
+Micro-batching of concurrent retrieval queries
+
+Queries that arrive within RETRIEVAL_BATCH_WINDOW_MS of each other (up to
+RETRIEVAL_MAX_BATCH) are scored together with retrieve_batch: one vectorizer
+transform and one similarity computation per batch instead of per query. The
+batch runs off the event loop.
+"""
+
+import asyncio
+import os
+from typing import Any
+
+from langchain_core.retrievers import BaseRetriever
+
+from src.ingetsion.batch_retriever import retrieve_batch
+
+BATCH_WINDOW_MS = float(os.getenv("RETRIEVAL_BATCH_WINDOW_MS", "5"))
+MAX_BATCH = int(os.getenv("RETRIEVAL_MAX_BATCH", "32"))
+
+
+class MicroBatcher:
+    """Collects queries submitted from one event loop and runs them through batch_fn together"""
+
+    def __init__(self, batch_fn=retrieve_batch, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        self.stats = {"batches": 0, "queries": 0, "largest_batch": 0}
+
+    async def submit(self, query: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            # Keep a reference until the batch is done
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        queries = [query for query, _ in batch]
+        self.stats["batches"] += 1
+        self.stats["queries"] += len(queries)
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(queries))
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, self.batch_fn, queries)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), documents in zip(batch, results):
+            if not future.done():
+                future.set_result(documents)
+
+
+class MicroBatchingRetriever(BaseRetriever):
+    """Retriever whose async queries are batched with the other requests in flight"""
+
+    batcher: Any
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.batcher.batch_fn([query])[0]
+
+    async def _aget_relevant_documents(self, query, *, run_manager):
+        return await self.batcher.submit(query)
@@ -0,0 +1,239 @@
+"""
+HTTP API around the RAG graph
+
+    python -m src.api.server --port 8000
+
+Endpoints:
+- POST /ask          {"question": "..."} -> {"answer", "sources", "nodes", "ttft", "total", ...}
+- POST /ask/stream   same body; newline-delimited JSON events: node, token, done
+- GET  /health       load and retrieval batching counters
+- GET  /metrics      per-node time, LLM call, token and chunk counters (Prometheus text format)
+
+Questions run on the async graph, so one event loop serves all of them. At
+most API_MAX_CONCURRENCY run at once and up to API_MAX_QUEUE more wait for a
+slot (at most API_QUEUE_TIMEOUT seconds). Anything beyond that gets a 503 with
+Retry-After, so a load balancer can send the request elsewhere.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+from pathlib import Path
+
+from aiohttp import web
+
+# Allow running as a script as well as with -m
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.api.batching import MicroBatcher, MicroBatchingRetriever
+from src.graph.batch_runner import answer_sources
+from src.graph.instrumentation import render_prometheus
+from src.graph.streaming import astream_answer
+
+MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "16"))
+MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "64"))
+QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "30"))
+
+BATCHER = web.AppKey("batcher", MicroBatcher)
+GRAPH = web.AppKey("graph", object)
+LIMITER = web.AppKey("limiter", object)
+
+
+class Overloaded(Exception):
+    """Raised when the request queue is full or a request waited too long for a slot"""
+
+
+class ConcurrencyLimiter:
+    """At most max_concurrency holders at a time, with a bounded queue of waiters"""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if not self._semaphore.locked():
+            # A slot is free: acquire() returns without suspending
+            await self._semaphore.acquire()
+        elif self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{self.queued} requests already queued")
+        else:
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise Overloaded(f"no slot within {self.queue_timeout:.0f}s")
+            finally:
+                self.queued -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "queued": self.queued, "rejected": self.rejected,
+                "max_concurrency": self.max_concurrency, "max_queue": self.max_queue}
+
+
+def build_api_graph(batcher, use_cache=True):
+    """Async graph whose retrieval goes through the micro-batcher, behind the answer cache"""
+    from src.graph.graph_builder import build_graph
+    from src.graph.answer_cache import CachedGraph
+    from src.ingetsion.retriever_tool import get_retriever_tool
+
+    tool = get_retriever_tool(retriever=MicroBatchingRetriever(batcher=batcher))
+    graph = build_graph(asynchronous=True, retriever_tool=tool)
+    return CachedGraph(graph) if use_cache else graph
+
+
+async def _question(request):
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "body must be JSON"}), content_type="application/json")
+    question = body.get("question") if isinstance(body, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        raise web.HTTPBadRequest(text=json.dumps({"error": "'question' must be a non-empty string"}),
+                                 content_type="application/json")
+    return question
+
+
+def _overloaded(error):
+    return web.json_response({"error": f"server overloaded: {error}"}, status=503, headers={"Retry-After": "1"})
+
+
+def _summary(info, nodes):
+    """JSON-serializable summary of a finished run"""
+    result = info["result"] or {}
+    return {
+        "answer": info["answer"],
+        "sources": answer_sources(result),
+        "nodes": nodes,
+        "cache": info["cache"],
+        "ttft": info["ttft"],
+        "total": info["total"],
+        "llm_calls": result.get("llm_calls", 0),
+        "rewrite_count": result.get("rewrite_count", 0),
+        "trace": info["trace"],
+    }
+
+
+async def _run(graph, question):
+    from langchain_core.messages import HumanMessage
+
+    nodes = []
+    async for event, value in astream_answer(graph, {"messages": [HumanMessage(content=question)]}):
+        if event == "node":
+            nodes.append(value)
+        yield event, value, nodes
+
+
+async def ask(request):
+    question = await _question(request)
+    summary = None
+    try:
+        async with request.app[LIMITER].slot():
+            async for event, value, nodes in _run(request.app[GRAPH], question):
+                if event == "done":
+                    summary = _summary(value, nodes)
+    except Overloaded as e:
+        return _overloaded(e)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+    return web.json_response(summary)
+
+
+async def ask_stream(request):
+    question = await _question(request)
+    limiter = request.app[LIMITER]
+    try:
+        async with limiter.slot():
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            try:
+                async for event, value, nodes in _run(request.app[GRAPH], question):
+                    if event == "node":
+                        payload = {"event": "node", "node": value}
+                    elif event == "token":
+                        payload = {"event": "token", "text": value}
+                    else:
+                        payload = {"event": "done", **_summary(value, nodes)}
+                    await response.write((json.dumps(payload) + "\n").encode("utf-8"))
+            except Exception as e:
+                # Headers are already sent: report the failure in the stream itself
+                await response.write((json.dumps({"event": "error", "error": str(e)}) + "\n").encode("utf-8"))
+            await response.write_eof()
+            return response
+    except Overloaded as e:
+        return _overloaded(e)
+
+
+async def health(request):
+    return web.json_response({
+        "status": "ok",
+        **request.app[LIMITER].stats(),
+        "retrieval_batching": request.app[BATCHER].stats,
+    })
+
+
+async def metrics(request):
+    limiter = request.app[LIMITER].stats()
+    batching = request.app[BATCHER].stats
+    lines = [render_prometheus().rstrip("\n")]
+    for name, value, help_text in (
+        ("rag_api_in_flight", limiter["in_flight"], "Questions being answered"),
+        ("rag_api_queued", limiter["queued"], "Requests waiting for a slot"),
+        ("rag_api_rejected_total", limiter["rejected"], "Requests turned away with a 503"),
+        ("rag_retrieval_batches_total", batching["batches"], "Micro-batches of retrieval queries"),
+        ("rag_retrieval_batched_queries_total", batching["queries"], "Queries retrieved in micro-batches"),
+    ):
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return web.Response(text="\n".join(lines) + "\n", content_type="text/plain", charset="utf-8")
+
+
+def create_app(graph=None, batcher=None, use_cache=True, max_concurrency=MAX_CONCURRENCY,
+               max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT):
+    """aiohttp application serving the graph (by default the async graph with micro-batched retrieval)"""
+    batcher = batcher or MicroBatcher()
+    app = web.Application()
+    app[BATCHER] = batcher
+    app[GRAPH] = graph if graph is not None else build_api_graph(batcher, use_cache=use_cache)
+    app[LIMITER] = ConcurrencyLimiter(max_concurrency, max_queue, queue_timeout)
+    app.router.add_post("/ask", ask)
+    app.router.add_post("/ask/stream", ask_stream)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API for the RAG question answering graph")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the semantic answer cache")
+    args = parser.parse_args()
+
+    from src.llms.registry import warm_up
+    # Open the vector store and clients before the first request arrives
+    warm_up()
+    app = create_app(use_cache=not args.no_cache, max_concurrency=args.max_concurrency, max_queue=args.max_queue)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Synthetic corpora for benchmarks
+
+Chunks are made of pseudo-words drawn from a Zipf-like distribution, so the
+vocabulary and postings lengths behave like real text without downloading
+anything. Everything is generated from a seed, so the same size always gives
+the same corpus and runs can be compared.
+"""
+
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+
+SYLLABLES = [c + v for c in "bcdfghjklmnprstvwxz" for v in "aeiou"]
+VOCABULARY_SIZE = 20000
+WORDS_PER_CHUNK = 150
+ZIPF_EXPONENT = 1.1
+BATCH = 10000
+
+
+def vocabulary(size=VOCABULARY_SIZE) -> np.ndarray:
+    """size distinct pseudo-words of two or more syllables"""
+    words = []
+    base = len(SYLLABLES)
+    for i in range(size):
+        n, parts = i + base, []
+        while n:
+            n, digit = divmod(n, base)
+            parts.append(SYLLABLES[digit])
+        words.append("".join(parts))
+    return np.array(words)
+
+
+def _word_ids(rng, n, size):
+    probabilities = 1.0 / np.arange(1, size + 1) ** ZIPF_EXPONENT
+    probabilities /= probabilities.sum()
+    return rng.choice(size, size=n, p=probabilities)
+
+
+def synthetic_texts(n_chunks: int, words_per_chunk=WORDS_PER_CHUNK, seed=0) -> List[str]:
+    """n_chunks texts of words_per_chunk pseudo-words, generated BATCH chunks at a time"""
+    rng = np.random.default_rng(seed)
+    words = vocabulary()
+    texts = []
+    for start in range(0, n_chunks, BATCH):
+        count = min(BATCH, n_chunks - start)
+        ids = _word_ids(rng, count * words_per_chunk, len(words)).reshape(count, words_per_chunk)
+        texts.extend(" ".join(row) for row in words[ids])
+    return texts
+
+
+def synthetic_chunks(n_chunks: int, words_per_chunk=WORDS_PER_CHUNK, seed=0) -> List[Document]:
+    """Chunks as Documents, ten per synthetic source"""
+    return [
+        Document(page_content=text, metadata={"source": f"synthetic-{i // 10}"})
+        for i, text in enumerate(synthetic_texts(n_chunks, words_per_chunk, seed))
+    ]
+
+
+def synthetic_pages(n_pages: int, words_per_page=2000, seed=0) -> List[Document]:
+    """Page-sized documents with paragraph breaks, for the text splitter"""
+    pages = []
+    for i, text in enumerate(synthetic_texts(n_pages, words_per_page, seed)):
+        words = text.split(" ")
+        paragraphs = [" ".join(words[j:j + 100]) + "." for j in range(0, len(words), 100)]
+        pages.append(Document(page_content="\n\n".join(paragraphs), metadata={"source": f"page-{i}"}))
+    return pages
+
+
+def synthetic_queries(texts: List[str], n_queries: int, words=4, seed=1, band=(100, 2000)) -> List[str]:
+    """
+    Queries made of words from random chunks, so each has real matches.
+
+    Words are taken from a frequency band: the most common ones are in every
+    chunk and the rare ones fall outside the vectorizer's max_features.
+    """
+    rng = np.random.default_rng(seed)
+    rank = {word: i for i, word in enumerate(vocabulary())}
+    queries = []
+    for index in rng.integers(0, len(texts), size=n_queries):
+        terms = {w for w in texts[index].split(" ") if band[0] <= rank.get(w, -1) < band[1]}
+        # The rarest words in the band are the most selective
+        queries.append(" ".join(sorted(terms, key=lambda w: -rank[w])[:words]))
+    return queries
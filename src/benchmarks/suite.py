@@ -0,0 +1,340 @@
+"""
+Benchmark suite: ingestion, retrieval and graph latency on synthetic corpora
+
+    python -m src.benchmarks.suite --sizes 1000,10000,100000 --output bench.json
+    python -m src.benchmarks.suite --sizes 1000000 --skip-graph --output bench-1m.json
+    python -m src.benchmarks.suite --output new.json --compare bench.json
+
+For each corpus size (in chunks) it measures:
+- TF-IDF fit and transform throughput (OfflineTfIdfEmbeddings)
+- inverted index build, save and load time
+- per-query retrieval latency p50/p95/p99 and batch retrieval throughput
+- peak RSS of each stage
+
+Once per run it also times split_texts on synthetic pages, and the full graph
+with the deterministic fake LLM: latency per node path (e.g. retrieve then
+answer, or the rewrite loop) and the mean time spent in each node.
+
+Results are written as JSON. --compare reports every timing or throughput that
+got worse than the baseline file by more than --tolerance, and exits with 1 if
+there is any.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+# Allow running as a script as well as with -m
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.benchmarks.corpus import synthetic_chunks, synthetic_pages, synthetic_queries
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_QUERIES = 500
+DEFAULT_GRAPH_QUESTIONS = 50
+# Questions with no match in the corpus take the rewrite path
+OFF_TOPIC_QUESTIONS = ["kubernetes autoscaling quotas", "sourdough starter hydration"]
+# Inputs recorded with the results, not measurements
+SETTINGS = {"llm_latency_ms", "llm_jitter_ms"}
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter (Linux only), so the next reading is per stage"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Peak resident memory in MB: since the last reset on Linux, else of the whole process"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def measure(fn, *args, **kwargs):
+    """(result, seconds, peak RSS MB) of one call"""
+    _reset_peak_rss()
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    seconds = time.perf_counter() - started
+    return result, seconds, peak_rss_mb()
+
+
+def percentiles(seconds: List[float]) -> Dict:
+    samples = np.asarray(seconds) * 1000
+    return {
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def bench_split(n_pages=200, mode="token", encoding=None):
+    """split_texts throughput on synthetic pages (single process, so runs compare across machines)"""
+    from src.ingetsion.text_splitter import ENCODING_NAME, split_texts
+
+    pages = synthetic_pages(n_pages)
+    characters = sum(len(page.page_content) for page in pages)
+    chunks, seconds, peak = measure(split_texts, pages, mode=mode, workers=1, encoding=encoding or ENCODING_NAME)
+    return {
+        "mode": mode,
+        "pages": n_pages,
+        "chunks": len(chunks),
+        "seconds": seconds,
+        "pages_per_second": n_pages / seconds,
+        "characters_per_second": characters / seconds,
+        "peak_rss_mb": peak,
+    }
+
+
+def bench_size(n_chunks, n_queries=DEFAULT_QUERIES, k=4, seed=0):
+    """Fit, transform, index and retrieval timings for one corpus size"""
+    from src.ingetsion.inverted_index import TfidfInvertedIndex
+    from src.llms.offline_embeddings import OfflineTfIdfEmbeddings
+
+    documents, generate_seconds, _ = measure(synthetic_chunks, n_chunks, seed=seed)
+    texts = [doc.page_content for doc in documents]
+    queries = synthetic_queries(texts, n_queries, seed=seed + 1)
+    result = {"chunks": n_chunks, "corpus_seconds": generate_seconds}
+
+    embedding = OfflineTfIdfEmbeddings()
+    _, seconds, peak = measure(embedding.fit, texts)
+    result["fit"] = {"seconds": seconds, "chunks_per_second": n_chunks / seconds, "peak_rss_mb": peak}
+    print(f"   fit: {seconds:.2f}s ({n_chunks / seconds:,.0f} chunks/s)")
+
+    _, seconds, peak = measure(embedding.embed_documents_sparse, texts)
+    result["transform"] = {"seconds": seconds, "chunks_per_second": n_chunks / seconds, "peak_rss_mb": peak}
+    print(f"   transform: {seconds:.2f}s ({n_chunks / seconds:,.0f} chunks/s)")
+
+    # Building includes its own transform of every chunk
+    index, seconds, peak = measure(TfidfInvertedIndex.build, documents, embedding)
+    result["index_build"] = {"seconds": seconds, "peak_rss_mb": peak}
+    with tempfile.TemporaryDirectory() as directory:
+        _, result["index_build"]["save_seconds"], _ = measure(index.save, directory)
+        index, result["index_build"]["load_seconds"], _ = measure(TfidfInvertedIndex.load, directory)
+        print(f"   index: build {seconds:.2f}s, save {result['index_build']['save_seconds']:.2f}s, "
+              f"load {result['index_build']['load_seconds']:.3f}s")
+
+        latencies, hits = [], 0
+        _reset_peak_rss()
+        for query in queries:
+            started = time.perf_counter()
+            found = index.search(query, k)
+            latencies.append(time.perf_counter() - started)
+            hits += bool(found and found[0][1] > 0)
+        result["retrieval"] = {"queries": n_queries, "k": k, "hit_fraction": hits / n_queries,
+                               **percentiles(latencies), "peak_rss_mb": peak_rss_mb()}
+
+        _, seconds, _ = measure(index.search_batch, queries, k)
+        result["retrieval"]["batch_queries_per_second"] = n_queries / seconds
+        # Release the memory-mapped index before its directory is removed
+        del index
+    retrieval = result["retrieval"]
+    print(f"   retrieval: p50 {retrieval['p50_ms']:.2f}ms, p95 {retrieval['p95_ms']:.2f}ms, "
+          f"p99 {retrieval['p99_ms']:.2f}ms, batch {retrieval['batch_queries_per_second']:,.0f} queries/s")
+    return result
+
+
+def bench_graph(n_chunks=1000, n_questions=DEFAULT_GRAPH_QUESTIONS, llm_latency_ms=0.0, llm_jitter_ms=0.0, seed=0):
+    """Full graph latency per node path, with the fake LLM and an inverted index over a synthetic corpus"""
+    from src.graph.batch_runner import answer_question
+    from src.graph.graph_builder import build_graph
+    from src.ingetsion import retriever
+    from src.ingetsion.retriever import create_vectorstore
+    from src.llms import registry
+    from src.llms.fake_llm import create_fake_llm
+
+    documents = synthetic_chunks(n_chunks, seed=seed)
+    questions = synthetic_queries([doc.page_content for doc in documents], n_questions, seed=seed + 1)
+    # Every tenth question is off topic, alternating between the two
+    for i in range(0, len(questions), 10):
+        questions[i] = OFF_TOPIC_QUESTIONS[(i // 10) % len(OFF_TOPIC_QUESTIONS)]
+
+    graph = build_graph(asynchronous=True)
+    llm = create_fake_llm(latency=llm_latency_ms / 1000, jitter=llm_jitter_ms / 1000, seed=seed)
+
+    async def run_all():
+        # One at a time, so each latency is the question's own
+        return [await answer_question(graph, {"id": str(i), "question": q}) for i, q in enumerate(questions)]
+
+    saved_store = retriever._vectorstore_cache, retriever._vectorstore_key
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            create_vectorstore(documents, persist_directory=directory, force_reload=True, backend="inverted_index")
+            registry.reset_registry()
+            registry.register("llm", llm)
+            records = asyncio.run(run_all())
+        finally:
+            registry.reset_registry()
+            # The benchmark store goes away with its directory: give the caller its shared store back
+            retriever._vectorstore_cache, retriever._vectorstore_key = saved_store
+
+    failed = [record for record in records if "error" in record]
+    if failed:
+        raise RuntimeError(f"{len(failed)} graph runs failed, first: {failed[0]['error']}")
+
+    paths = {}
+    for record in records:
+        paths.setdefault(" → ".join(record["nodes"]), []).append(record)
+    result = {"questions": n_questions, "llm_latency_ms": llm_latency_ms, "llm_jitter_ms": llm_jitter_ms,
+              **percentiles([record["total"] for record in records]), "paths": {}}
+    for path, group in sorted(paths.items(), key=lambda item: -len(item[1])):
+        nodes = {}
+        for record in group:
+            for node, seconds in record["timings"].items():
+                nodes.setdefault(node, []).append(seconds)
+        result["paths"][path] = {
+            "count": len(group),
+            **percentiles([record["total"] for record in group]),
+            "nodes_mean_ms": {node: 1000 * sum(times) / len(group) for node, times in nodes.items()},
+        }
+        print(f"   {len(group):>3} × {path}: p50 {result['paths'][path]['p50_ms']:.1f}ms")
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_suite(sizes=DEFAULT_SIZES, n_queries=DEFAULT_QUERIES, k=4, split_pages=200,
+              graph_questions=DEFAULT_GRAPH_QUESTIONS, llm_latency_ms=0.0, llm_jitter_ms=0.0, seed=0) -> Dict:
+    """Run every benchmark and return the results; split_pages=0 or graph_questions=0 skips that part"""
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "per_stage_rss": _reset_peak_rss(),
+            "seed": seed,
+        },
+        "sizes": {},
+    }
+
+    if split_pages:
+        print(f"✂️  Splitting {split_pages} synthetic pages...")
+        try:
+            results["split"] = bench_split(split_pages)
+            print(f"   {results['split']['pages_per_second']:,.0f} pages/s")
+        except Exception as e:
+            # The tokenizer files are downloaded on first use, which fails on an offline box
+            results["split"] = {"error": str(e)}
+            print(f"   Skipped, the tokenizer could not be loaded: {e}")
+
+    for n_chunks in sorted(sizes):
+        print(f"📚 Corpus of {n_chunks:,} chunks")
+        results["sizes"][str(n_chunks)] = bench_size(n_chunks, n_queries, k, seed)
+
+    if graph_questions:
+        print(f"🔀 Graph with the fake LLM ({llm_latency_ms:g}ms ± {llm_jitter_ms:g}ms per call), "
+              f"{graph_questions} questions")
+        results["graph"] = bench_graph(min(sizes), graph_questions, llm_latency_ms, llm_jitter_ms, seed)
+    return results
+
+
+def _metrics(results, prefix=""):
+    """Flatten to {"sizes.1000.fit.seconds": value, ...}, keeping timings and throughputs"""
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(_metrics(value, name + "."))
+        elif (isinstance(value, (int, float)) and not isinstance(value, bool)
+              and key.endswith(("seconds", "_ms", "_per_second", "rss_mb")) and key not in SETTINGS):
+            metrics[name] = value
+    return metrics
+
+
+def compare(baseline: Dict, current: Dict, tolerance=0.1) -> List[str]:
+    """Metrics present in both runs that got worse by more than tolerance (a fraction)"""
+    before, after = _metrics(baseline), _metrics(current)
+    regressions = []
+    for name in sorted(before.keys() & after.keys()):
+        old, new = before[name], after[name]
+        if not old or name.startswith("meta."):
+            continue
+        # Throughputs should not drop, everything else (times, memory) should not grow
+        change = (old - new) / old if name.endswith("_per_second") else (new - old) / old
+        if change > tolerance:
+            regressions.append(f"{name}: {old:.4g} → {new:.4g} ({change:+.0%} worse)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, retrieval and graph latency")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated corpus sizes in chunks (up to 1000000)")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--split-pages", type=int, default=200)
+    parser.add_argument("--graph-questions", type=int, default=DEFAULT_GRAPH_QUESTIONS)
+    parser.add_argument("--skip-graph", action="store_true")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Fake LLM delay per call")
+    parser.add_argument("--llm-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown as a fraction")
+    args = parser.parse_args()
+
+    results = run_suite(
+        sizes=[int(size) for size in args.sizes.split(",") if size.strip()],
+        n_queries=args.queries,
+        k=args.k,
+        split_pages=args.split_pages,
+        graph_questions=0 if args.skip_graph else args.graph_questions,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_jitter_ms=args.llm_jitter_ms,
+        seed=args.seed,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"✅ Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        if regressions:
+            print(f"⚠️  {len(regressions)} regressions beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Semantic answer cache in front of the compiled graph
+
+A question is answered from the cache when its normalized text was seen
+before (exact hit) or when its TF-IDF vector is close enough to a cached
+question's (similar hit), using the same OfflineTfIdfEmbeddings the index was
+built with. That vectorizer drops English stop words, so "what is X" and
+"where is X" get the same vector: a similar hit also needs the same question
+words and the same negation. Entries expire after a TTL, the least recently used entry is
+evicted when the cache is full, and everything is dropped when the index
+version changes.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 3600.0
+# Cosine similarity of two questions' TF-IDF vectors for a similar hit
+DEFAULT_SIMILARITY_THRESHOLD = 0.9
+# Seconds between checks of the index version
+VERSION_CHECK_INTERVAL = 5.0
+
+# Stop words that change what is being asked; both questions of a similar hit must agree on them
+QUESTION_WORDS = frozenset({"what", "where", "when", "who", "whom", "whose", "which", "why", "how"})
+NEGATIONS = frozenset({"not", "no", "never", "nor", "none", "cannot", "without"})
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" ?!.")
+
+
+def question_signature(text: str) -> frozenset:
+    """Question words and negation of a normalized question ("what's" counts as "what", "doesn't" as "not")"""
+    signature = set()
+    for word in re.findall(r"[a-z]+(?:'[a-z]+)?", text):
+        if word in NEGATIONS or word.endswith("n't"):
+            signature.add("not")
+        base = word.split("'")[0]
+        if base in QUESTION_WORDS:
+            signature.add(base)
+    return frozenset(signature)
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    answer: str
+    vector: Optional[object] = None
+    signature: frozenset = frozenset()
+    created_at: float = field(default_factory=time.time)
+
+
+class AnswerCache:
+    """Thread-safe TTL/LRU cache of answers keyed on normalized question text"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD, backend=None, persist_directory=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.backend = backend
+        self.persist_directory = persist_directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._embedding = None
+        self._index_version = None
+        self._version_checked_at = 0.0
+        self.metrics = {
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Cache configured from ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL and ANSWER_CACHE_SIMILARITY"""
+        kwargs.setdefault("max_entries", int(os.getenv("ANSWER_CACHE_SIZE", DEFAULT_MAX_ENTRIES)))
+        kwargs.setdefault("ttl_seconds", float(os.getenv("ANSWER_CACHE_TTL", DEFAULT_TTL_SECONDS)))
+        kwargs.setdefault("similarity_threshold",
+                          float(os.getenv("ANSWER_CACHE_SIMILARITY", DEFAULT_SIMILARITY_THRESHOLD)))
+        return cls(**kwargs)
+
+    def _check_index_version(self, force=False):
+        """Drop every entry (and the embedding) when the index changed; call with the lock held"""
+        now = time.monotonic()
+        if not force and now - self._version_checked_at < VERSION_CHECK_INTERVAL:
+            return
+        self._version_checked_at = now
+        from src.ingetsion.retriever import index_version
+
+        version = index_version(self.backend, self.persist_directory)
+        if version != self._index_version:
+            if self._entries:
+                self.metrics["invalidations"] += 1
+            self._entries.clear()
+            self._embedding = None
+            self._index_version = version
+
+    def _embed(self, question):
+        """Sparse TF-IDF vector of the question, or None when near-duplicate matching is unavailable"""
+        if self.similarity_threshold is None or self.similarity_threshold > 1:
+            return None
+        if self._embedding is None:
+            from src.ingetsion.retriever import create_embedding, get_backend, DEFAULT_PERSIST_DIRECTORIES
+
+            persist_directory = self.persist_directory or DEFAULT_PERSIST_DIRECTORIES[get_backend(self.backend)]
+            embedding = create_embedding(persist_directory)
+            # No fitted vectorizer yet: exact hits only
+            self._embedding = embedding if embedding.load_cache() else False
+        if not self._embedding:
+            return None
+        vector = self._embedding.embed_query_sparse(question)
+        return vector if vector.nnz else None
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        self.metrics["expirations"] += len(expired)
+
+    def get(self, question: str):
+        """
+        Look up an answer.
+
+        Returns:
+            (answer, "exact" | "similar") or (None, None) on a miss
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._check_index_version()
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.metrics["exact_hits"] += 1
+                return entry.answer, "exact"
+
+            vector = self._embed(key)
+            if vector is not None:
+                signature = question_signature(key)
+                best_key, best_score = None, self.similarity_threshold
+                for other_key, other in self._entries.items():
+                    if other.vector is None or other.signature != signature:
+                        continue
+                    # TF-IDF vectors are L2-normalized, so the dot product is the cosine
+                    score = vector.multiply(other.vector).sum()
+                    if score >= best_score:
+                        best_key, best_score = other_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.metrics["similar_hits"] += 1
+                    return self._entries[best_key].answer, "similar"
+
+            self.metrics["misses"] += 1
+            return None, None
+
+    def put(self, question: str, answer):
+        if not answer:
+            return
+        if isinstance(answer, str) and not answer.strip():
+            return
+        key = normalize_question(question)
+        with self._lock:
+            self._check_index_version()
+            self._entries[key] = CacheEntry(question=key, answer=answer, vector=self._embed(key),
+                                            signature=question_signature(key))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics["evictions"] += 1
+
+    def invalidate(self):
+        """Drop every entry now and re-read the index version"""
+        with self._lock:
+            self._entries.clear()
+            self._embedding = None
+            self.metrics["invalidations"] += 1
+            self._check_index_version(force=True)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+            stats["entries"] = len(self._entries)
+        hits = stats["exact_hits"] + stats["similar_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedGraph:
+    """
+    Wraps a compiled graph: single-question inputs are answered from the cache when possible.
+
+    Hits return {"messages": [question, answer], "cache": "exact" | "similar"};
+    misses run the graph and add "cache": None to its result. Any other
+    attribute is forwarded to the wrapped graph.
+    """
+
+    def __init__(self, graph, cache: AnswerCache = None):
+        self.graph = graph
+        self.cache = cache if cache is not None else AnswerCache.from_env()
+
+    @staticmethod
+    def _question(inputs):
+        messages = inputs.get("messages") if isinstance(inputs, dict) else None
+        # Follow-ups inside a longer conversation depend on that conversation: not cacheable
+        if not messages or len(messages) != 1:
+            return None
+        content = getattr(messages[0], "content", None)
+        return content if isinstance(content, str) and content.strip() else None
+
+    def lookup(self, inputs):
+        """(question, answer, kind) for the inputs; question is None when they are not cacheable"""
+        question = self._question(inputs)
+        if question is None:
+            return None, None, None
+        answer, kind = self.cache.get(question)
+        return question, answer, kind
+
+    @staticmethod
+    def cached_result(question, answer, kind):
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        return {"messages": [HumanMessage(content=question), AIMessage(content=answer)], "cache": kind}
+
+    def store(self, question, result):
+        """Cache the final answer of a graph run for question"""
+        from langchain_core.messages import AIMessage
+
+        if not isinstance(result, dict) or result.get("generation_error"):
+            # The answer reports an LLM failure: the next ask should try again
+            return
+        messages = result.get("messages")
+        if messages and isinstance(messages[-1], AIMessage) and not messages[-1].tool_calls:
+            self.cache.put(question, messages[-1].content)
+
+    def invoke(self, inputs, config=None, **kwargs):
+        question, answer, kind = self.lookup(inputs)
+        if question is None:
+            return self.graph.invoke(inputs, config, **kwargs)
+        if answer is not None:
+            return self.cached_result(question, answer, kind)
+
+        result = self.graph.invoke(inputs, config, **kwargs)
+        self.store(question, result)
+        if isinstance(result, dict):
+            result = {**result, "cache": None}
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.graph, name)
@@ -0,0 +1,186 @@
+"""
+Batch question answering: many questions through the graph, results to JSONL
+
+    python src/main.py --batch questions.jsonl --output answers.jsonl --parallelism 16
+
+Input is JSONL ({"question": ..., "id": ...}) or CSV with a "question" column
+and optionally an "id" column. Questions without an id are numbered by their
+position in the file. Each result is appended to the output as soon as it is
+done, with the answer, retrieved sources, node path, per-node timings, total
+time, LLM call count, prompt/completion tokens and retrieved chunk count.
+
+On restart, questions already answered in the output are skipped, so a run
+that crashed resumes where it stopped. Failed questions are retried and get a
+new line; readers should keep the last line per id. An answer the generate
+node produced from an LLM error keeps its text but gets an "error" field too,
+so a resumed run retries it.
+
+Questions run concurrently on the async graph (at most `parallelism` at a
+time), and their retrievals are micro-batched into vectorized batch lookups.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import time
+from typing import Dict, List
+
+DEFAULT_PARALLELISM = int(os.getenv("BATCH_PARALLELISM", "8"))
+
+
+def load_questions(path) -> List[Dict]:
+    """[{"id": ..., "question": ...}] from a JSONL or CSV file"""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    questions = []
+    for position, row in enumerate(rows):
+        question = (row.get("question") or "").strip()
+        if question:
+            row_id = row.get("id")
+            questions.append({"id": str(row_id) if row_id not in (None, "") else str(position), "question": question})
+    return questions
+
+
+def completed_ids(output_path) -> set:
+    """Ids answered without error in an existing output file; a torn last line is cut off"""
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        # A crash mid-write leaves a partial last line: drop it so appends start on a fresh line
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "error" not in record:
+            done.add(str(record.get("id")))
+    return done
+
+
+def answer_sources(result) -> List[str]:
+    """Sources of the documents an answer was based on: graded chunks, else everything retrieved"""
+    documents = result.get("documents") or result.get("best_documents")
+    if not documents:
+        documents = [
+            doc
+            for message in result.get("messages") or []
+            for doc in (getattr(message, "artifact", None) or [])
+        ]
+    sources = []
+    for doc in documents:
+        source = doc.metadata.get("source")
+        if source not in sources:
+            sources.append(source)
+    return sources
+
+
+async def answer_question(graph, item) -> Dict:
+    """Run one question and return its output record"""
+    from langchain_core.messages import HumanMessage
+    from src.graph.instrumentation import instrument
+
+    started = last = time.perf_counter()
+    nodes, timings, result = [], {}, None
+    config, trace = instrument(question=item["question"])
+    try:
+        inputs = {"messages": [HumanMessage(content=item["question"])]}
+        async for mode, chunk in graph.astream(inputs, config, stream_mode=["updates", "values"]):
+            if mode == "values":
+                result = chunk
+                continue
+            # Nodes run one after another, so the time since the previous update is this node's
+            now = time.perf_counter()
+            for node in chunk:
+                nodes.append(node)
+                timings[node] = timings.get(node, 0.0) + now - last
+            last = now
+    except Exception as e:
+        trace.finish()
+        return {"id": item["id"], "question": item["question"], "error": str(e),
+                "nodes": nodes, "total": time.perf_counter() - started}
+
+    totals = trace.finish()["totals"]
+    messages = (result or {}).get("messages") or []
+    record = {
+        "id": item["id"],
+        "question": item["question"],
+        "answer": messages[-1].content if messages else "",
+        "sources": answer_sources(result or {}),
+        "nodes": nodes,
+        "timings": timings,
+        "total": time.perf_counter() - started,
+        "llm_calls": (result or {}).get("llm_calls", 0),
+        "rewrite_count": (result or {}).get("rewrite_count", 0),
+        "prompt_tokens": totals["prompt_tokens"],
+        "completion_tokens": totals["completion_tokens"],
+        "retrieved_chunks": totals["chunks"],
+    }
+    if (result or {}).get("generation_error"):
+        record["error"] = result["generation_error"]
+    return record
+
+
+async def run_batch(graph, questions: List[Dict], output_path, parallelism=DEFAULT_PARALLELISM, progress_every=50):
+    """Answer the questions not yet in output_path, appending one JSON line per answer"""
+    done = completed_ids(output_path)
+    pending = [item for item in questions if item["id"] not in done]
+    print(f"📦 {len(questions)} questions, {len(questions) - len(pending)} already answered, "
+          f"{len(pending)} to run with parallelism {parallelism}")
+
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+    stats = {"answered": 0, "failed": 0}
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+        async def run(item):
+            async with semaphore:
+                record = await answer_question(graph, item)
+            # Single event loop: writes never interleave
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            stats["failed" if "error" in record else "answered"] += 1
+            finished = stats["answered"] + stats["failed"]
+            if finished % progress_every == 0 or finished == len(pending):
+                elapsed = time.perf_counter() - started
+                print(f"   {finished}/{len(pending)} done ({finished / elapsed:.1f} questions/s, "
+                      f"{stats['failed']} failed)")
+
+        await asyncio.gather(*(run(item) for item in pending))
+
+    elapsed = time.perf_counter() - started
+    return {"questions": len(questions), "skipped": len(questions) - len(pending), **stats, "seconds": elapsed}
+
+
+def build_batch_graph(name="simple", batcher=None):
+    """Async "simple" or "full" graph whose retrievals go through a micro-batcher"""
+    from src.api.batching import MicroBatcher, MicroBatchingRetriever
+    from src.ingetsion.retriever_tool import get_retriever_tool
+
+    tool = get_retriever_tool(retriever=MicroBatchingRetriever(batcher=batcher or MicroBatcher()))
+    if name == "full":
+        from src.graph.graph_builder import build_graph
+        return build_graph(asynchronous=True, retriever_tool=tool)
+    if name == "simple":
+        from src.graph.simple_graph_builder import build_simple_graph
+        return build_simple_graph(asynchronous=True, retriever_tool=tool)
+    raise ValueError(f"Unknown graph '{name}'. Choose 'simple' or 'full'")
+
+
+def run_batch_file(input_path, output_path=None, graph="simple", parallelism=DEFAULT_PARALLELISM):
+    """Answer every question in input_path; output defaults to <input>.answers.jsonl"""
+    if output_path is None:
+        output_path = os.path.splitext(input_path)[0] + ".answers.jsonl"
+    compiled = build_batch_graph(graph) if isinstance(graph, str) else graph
+    summary = asyncio.run(run_batch(compiled, load_questions(input_path), output_path, parallelism))
+    print(f"✅ {summary['answered']} answered, {summary['failed']} failed, {summary['skipped']} skipped "
+          f"in {summary['seconds']:.1f}s → {output_path}")
+    return summary
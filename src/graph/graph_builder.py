@@ -1,41 +1,82 @@
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode, tools_condition
 from src.states.graphstate import GraphState
-from src.nodes.generate import generate_answer
-from src.nodes.grader import grade_documents    
-from src.ingetsion.retriever_tool import get_retriever_tool
-from src.nodes.generator import generate_query_or_respond
-from src.nodes.rewrite import rewrite_question
-from src.ingetsion.retriever_tool import get_retriever_tool
-
-workflow = StateGraph(GraphState)
-
-workflow.add_node("generate_query_or_respond", generate_query_or_respond)
-workflow.add_node("retrieve", ToolNode([get_retriever_tool()]))
-workflow.add_node("rewrite_question", rewrite_question)
-workflow.add_node("generate_answer", generate_answer)
-
-workflow.add_edge(START, "generate_query_or_respond")
-workflow.add_conditional_edges(
-    "generate_query_or_respond",
-    tools_condition,
-    {
-        "tools": "retrieve",
-        END: END,
-    },
-)
-
-workflow.add_conditional_edges(
-    "retrieve",
-    grade_documents,
-    {
-        "generate_answer": "generate_answer",
-        "rewrite_question": "rewrite_question",
-    },
-)
-workflow.add_edge("generate_answer", END)
-workflow.add_edge("rewrite_question", "generate_query_or_respond")
-graph = workflow.compile()
+from src.nodes.generate import generate_answer, agenerate_answer
+from src.nodes.grader import grade_documents, agrade_documents, route_after_grading
+from src.nodes.pregrader import pregrade_documents, route_after_pregrading
+from src.nodes.generator import generate_query_or_respond, agenerate_query_or_respond
+from src.nodes.rewrite import rewrite_question, arewrite_question
+from src.llms.registry import get_retriever_tool
+
+SYNC_NODES = {
+    "generate_query_or_respond": generate_query_or_respond,
+    "grade_documents": grade_documents,
+    "rewrite_question": rewrite_question,
+    "generate_answer": generate_answer,
+}
+ASYNC_NODES = {
+    "generate_query_or_respond": agenerate_query_or_respond,
+    "grade_documents": agrade_documents,
+    "rewrite_question": arewrite_question,
+    "generate_answer": agenerate_answer,
+}
+
+def build_graph(asynchronous=False, retriever_tool=None):
+    """
+    Build and compile the RAG graph.
+
+    With asynchronous=True the LLM nodes await ainvoke instead of blocking on
+    invoke, so the graph is meant for ainvoke/astream and many questions can
+    run on one event loop. Retrieval and the local pre-grader work either way.
+    retriever_tool replaces the shared retriever tool (e.g. a micro-batching one).
+    """
+    nodes = ASYNC_NODES if asynchronous else SYNC_NODES
+    workflow = StateGraph(GraphState)
+
+    workflow.add_node("generate_query_or_respond", nodes["generate_query_or_respond"])
+    workflow.add_node("retrieve", ToolNode([retriever_tool or get_retriever_tool()]))
+    workflow.add_node("pregrade_documents", pregrade_documents)
+    workflow.add_node("grade_documents", nodes["grade_documents"])
+    workflow.add_node("rewrite_question", nodes["rewrite_question"])
+    workflow.add_node("generate_answer", nodes["generate_answer"])
+
+    workflow.add_edge(START, "generate_query_or_respond")
+    workflow.add_conditional_edges(
+        "generate_query_or_respond",
+        tools_condition,
+        {
+            "tools": "retrieve",
+            END: END,
+        },
+    )
+
+    workflow.add_edge("retrieve", "pregrade_documents")
+    # Clear-cut retrievals skip the LLM grader
+    workflow.add_conditional_edges(
+        "pregrade_documents",
+        route_after_pregrading,
+        {
+            "grade_documents": "grade_documents",
+            "generate_answer": "generate_answer",
+            "rewrite_question": "rewrite_question",
+        },
+    )
+    workflow.add_conditional_edges(
+        "grade_documents",
+        route_after_grading,
+        {
+            "generate_answer": "generate_answer",
+            "rewrite_question": "rewrite_question",
+        },
+    )
+    workflow.add_edge("generate_answer", END)
+    workflow.add_edge("rewrite_question", "generate_query_or_respond")
+    return workflow.compile()
+
+
+graph = build_graph()
+# Same graph with async LLM nodes, for ainvoke/astream
+async_graph = build_graph(asynchronous=True)
 
 # Optional: Display graph visualization (uncomment if needed in Jupyter)
 # from IPython.display import Image, display
@@ -0,0 +1,322 @@
+"""
+Local instrumentation of graph runs: time, LLM calls, tokens and chunks per node
+
+A RequestTrace is a LangChain callback handler. Added to a run's config with
+instrument(), it sees every node step (the chain runs LangGraph tags
+graph:step:N), every chat model call and every retrieval made inside them, in
+sync and async graphs alike, without any change to the nodes. Per node step
+it records wall time, LLM calls and their time, prompt/completion tokens,
+retries, errors and retrieved chunks. Token counts come from the provider's
+usage metadata and are estimated from the text when a model reports none.
+
+trace.finish() adds the request to the process-wide METRICS, which
+render_prometheus() exports in the Prometheus text format (the API server
+serves it at GET /metrics), and appends the trace as one JSON line to
+TRACE_LOG_FILE when that is set.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.llms.tokens import count_tokens
+
+TRACE_LOG_FILE = os.getenv("TRACE_LOG_FILE", "")
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+COUNTS = ("llm_calls", "prompt_tokens", "completion_tokens", "retries", "errors", "chunks")
+_trace_log_lock = threading.Lock()
+
+
+def _node_key(metadata):
+    """(node, step) an event belongs to; "other" for calls made outside graph nodes"""
+    metadata = metadata or {}
+    return metadata.get("langgraph_node", "other"), metadata.get("langgraph_step")
+
+
+def _usage(response):
+    """(prompt, completion) tokens reported by the model, or None"""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return None
+
+
+def _generated_text(response):
+    return " ".join(
+        str(getattr(generation, "text", "") or "")
+        for generations in response.generations for generation in generations
+    )
+
+
+class RequestTrace(BaseCallbackHandler):
+    """Per-node breakdown of one graph run"""
+
+    # Record events on the calling thread, also for async runs (updates are locked)
+    run_inline = True
+
+    def __init__(self, question: Optional[str] = None):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.question = question
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.steps: Dict = {}
+        # Node every open chain run belongs to, to attribute retries
+        self._chain_runs = {}
+        self._node_runs = {}
+        self._llm_runs = {}
+        self._retriever_runs = {}
+        self.summary = None
+
+    def _step(self, key):
+        step = self.steps.get(key)
+        if step is None:
+            step = self.steps[key] = {"node": key[0], "step": key[1], "seconds": 0.0, "llm_seconds": 0.0,
+                                      **{name: 0 for name in COUNTS}}
+        return step
+
+    def on_chain_start(self, serialized, inputs, *, run_id, tags=None, metadata=None, **kwargs):
+        key = _node_key(metadata)
+        with self._lock:
+            self._chain_runs[run_id] = key
+            # The node's own run, not the chains it calls (they inherit its metadata)
+            if kwargs.get("name") == (metadata or {}).get("langgraph_node") and any(
+                    tag.startswith("graph:step:") for tag in tags or []):
+                self._step(key)
+                self._node_runs[run_id] = (key, time.perf_counter())
+
+    def _end_node(self, run_id, error=False):
+        with self._lock:
+            self._chain_runs.pop(run_id, None)
+            run = self._node_runs.pop(run_id, None)
+            if run is not None:
+                key, started = run
+                step = self._step(key)
+                step["seconds"] += time.perf_counter() - started
+                step["errors"] += error
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_node(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        # Routing to another node is signalled with an exception, not a failure
+        self._end_node(run_id, error=type(error).__name__ not in ("GraphBubbleUp", "GraphInterrupt", "ParentCommand"))
+
+    def _start_llm(self, run_id, tags, metadata, prompt_tokens):
+        with self._lock:
+            key = _node_key(metadata)
+            step = self._step(key)
+            step["llm_calls"] += 1
+            # llm.with_retry() tags every attempt after the first with retry:attempt:N
+            step["retries"] += any(tag.startswith("retry:attempt:") for tag in tags or [])
+            self._llm_runs[run_id] = (key, time.perf_counter(), prompt_tokens)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, metadata=None, **kwargs):
+        prompt = sum(count_tokens(str(message.content)) for batch in messages for message in batch)
+        self._start_llm(run_id, tags, metadata, prompt)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, metadata=None, **kwargs):
+        self._start_llm(run_id, tags, metadata, sum(count_tokens(prompt) for prompt in prompts))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = _usage(response)
+        with self._lock:
+            run = self._llm_runs.pop(run_id, None)
+            if run is None:
+                return
+            key, started, estimated_prompt = run
+            if usage is None:
+                usage = (estimated_prompt, count_tokens(_generated_text(response)))
+            step = self._step(key)
+            step["llm_seconds"] += time.perf_counter() - started
+            step["prompt_tokens"] += usage[0]
+            step["completion_tokens"] += usage[1]
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            run = self._llm_runs.pop(run_id, None)
+            if run is not None:
+                key, started, _ = run
+                step = self._step(key)
+                step["llm_seconds"] += time.perf_counter() - started
+                step["errors"] += 1
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        # Sent by runs that retry internally and report it through callbacks
+        with self._lock:
+            key = self._chain_runs.get(run_id) or self._llm_runs.get(run_id, (("other", None),))[0]
+            self._step(key)["retries"] += 1
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        with self._lock:
+            # Retrievers that wrap another (lazy, micro-batching) are counted once, at the outside
+            outermost = parent_run_id not in self._retriever_runs
+            self._retriever_runs[run_id] = _node_key(metadata) if outermost else None
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        with self._lock:
+            key = self._retriever_runs.pop(run_id, None)
+            if key is not None:
+                self._step(key)["chunks"] += len(documents)
+
+    def finish(self, cache=None) -> Dict:
+        """Close the trace: record it in METRICS and the trace log, and return its summary"""
+        with self._lock:
+            steps = [dict(step) for step in self.steps.values()]
+        totals = {name: sum(step[name] for step in steps) for name in COUNTS}
+        totals["llm_seconds"] = sum(step["llm_seconds"] for step in steps)
+        nodes = {}
+        for step in steps:
+            node = nodes.setdefault(step["node"], {"runs": 0, "seconds": 0.0, "llm_seconds": 0.0,
+                                                  **{name: 0 for name in COUNTS}})
+            node["runs"] += 1
+            for name in ("seconds", "llm_seconds") + COUNTS:
+                node[name] += step[name]
+        self.summary = {
+            "trace_id": self.trace_id,
+            "question": self.question,
+            "started_at": self.started_at,
+            "seconds": time.perf_counter() - self._started,
+            "cache": cache,
+            "steps": steps,
+            "nodes": nodes,
+            "totals": totals,
+        }
+        METRICS.observe(self.summary)
+        if TRACE_LOG_FILE:
+            write_trace(self.summary, TRACE_LOG_FILE)
+        return self.summary
+
+
+def breakdown_rows(summary) -> List[Dict]:
+    """One row per node of a trace summary, slowest first, for tables and logs"""
+    rows = [
+        {
+            "node": name,
+            "runs": node["runs"],
+            "seconds": round(node["seconds"], 3),
+            "llm_seconds": round(node["llm_seconds"], 3),
+            "llm_calls": node["llm_calls"],
+            "prompt_tokens": node["prompt_tokens"],
+            "completion_tokens": node["completion_tokens"],
+            "chunks": node["chunks"],
+            "retries": node["retries"],
+            "errors": node["errors"],
+        }
+        for name, node in (summary or {}).get("nodes", {}).items()
+    ]
+    return sorted(rows, key=lambda row: -row["seconds"])
+
+
+def write_trace(summary, path):
+    """Append one trace as a JSON line"""
+    line = json.dumps(summary, ensure_ascii=False, default=str)
+    with _trace_log_lock:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def instrument(config=None, question=None):
+    """(config with a new RequestTrace added to its callbacks, the trace)"""
+    trace = RequestTrace(question)
+    config = dict(config or {})
+    callbacks = config.get("callbacks")
+    if callbacks is None:
+        config["callbacks"] = [trace]
+    elif isinstance(callbacks, list):
+        config["callbacks"] = callbacks + [trace]
+    else:
+        # A callback manager
+        callbacks = callbacks.copy()
+        callbacks.add_handler(trace, inherit=True)
+        config["callbacks"] = callbacks
+    return config, trace
+
+
+class Metrics:
+    """Process-wide counters over finished traces, exported in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.cache_hits = 0
+            self.request_seconds = 0.0
+            self.buckets = [0] * len(LATENCY_BUCKETS)
+            self.nodes: Dict[str, Dict] = {}
+
+    def observe(self, summary):
+        with self._lock:
+            self.requests += 1
+            self.cache_hits += summary["cache"] is not None
+            self.request_seconds += summary["seconds"]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                self.buckets[i] += summary["seconds"] <= bound
+            for name, node in summary["nodes"].items():
+                totals = self.nodes.setdefault(name, {key: 0 for key in node})
+                for key, value in node.items():
+                    totals[key] += value
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+
+            def metric(name, kind, help_text, samples: List):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                    lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+            metric("rag_requests_total", "counter", "Questions answered", [({}, self.requests)])
+            metric("rag_cache_hits_total", "counter", "Questions answered from the answer cache",
+                   [({}, self.cache_hits)])
+            buckets = [({"le": str(bound)}, count) for bound, count in zip(LATENCY_BUCKETS, self.buckets)]
+            buckets.append(({"le": "+Inf"}, self.requests))
+            lines.append("# HELP rag_request_seconds Time to answer a question")
+            lines.append("# TYPE rag_request_seconds histogram")
+            lines.extend(f'rag_request_seconds_bucket{{le="{labels["le"]}"}} {count}' for labels, count in buckets)
+            lines.append(f"rag_request_seconds_sum {self.request_seconds}")
+            lines.append(f"rag_request_seconds_count {self.requests}")
+
+            nodes = sorted(self.nodes.items())
+            for name, key, kind, help_text in (
+                ("rag_node_runs_total", "runs", "counter", "Node executions"),
+                ("rag_node_seconds_total", "seconds", "counter", "Wall time spent in each node"),
+                ("rag_llm_calls_total", "llm_calls", "counter", "LLM calls made by each node"),
+                ("rag_llm_seconds_total", "llm_seconds", "counter", "Time spent waiting on LLM calls"),
+                ("rag_llm_retries_total", "retries", "counter", "Retried calls"),
+                ("rag_errors_total", "errors", "counter", "Failed LLM calls and node runs"),
+                ("rag_retrieved_chunks_total", "chunks", "counter", "Chunks returned by retrieval"),
+            ):
+                metric(name, kind, help_text, [({"node": node}, totals[key]) for node, totals in nodes])
+            metric("rag_llm_tokens_total", "counter", "Prompt and completion tokens",
+                   [({"node": node, "type": kind}, totals[f"{kind}_tokens"])
+                    for node, totals in nodes for kind in ("prompt", "completion")])
+            return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def render_prometheus() -> str:
+    """The current metrics in the Prometheus text exposition format"""
+    return METRICS.render()
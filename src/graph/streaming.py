@@ -0,0 +1,162 @@
+"""
+Stream a graph run: node progress, answer tokens and latency
+
+The graph is run with stream_mode=["updates", "messages", "values"]. With
+"messages", LangGraph streams the tokens of every chat model call made inside
+a node, so generate_answer keeps calling llm.invoke and its tokens still reach
+the UI as they are produced. Only the nodes that write the answer are passed on;
+grading and rewriting calls are not shown.
+
+Every run is instrumented: info["trace"] in the done event has the time,
+LLM calls, tokens and retrieved chunks per node (see instrumentation.py).
+
+astream_answer does the answer cache lookup and store on a worker thread: the
+first lookup loads the fitted vectorizer, and neither may block the event loop.
+"""
+
+import asyncio
+import time
+
+from src.graph.instrumentation import instrument
+
+# Nodes whose model output is the answer shown to the user
+ANSWER_NODES = ("generate_answer", "generate_query_or_respond")
+
+
+def _text(content):
+    """Plain text of a message or chunk content (a string or a list of parts)"""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content or []:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            parts.append(part.get("text", ""))
+    return "".join(parts)
+
+
+class _AnswerStream:
+    """Turns graph stream chunks into node / token / done events"""
+
+    def __init__(self, trace=None):
+        self.trace = trace
+        self.started = time.perf_counter()
+        self.info = {"answer": "", "result": None, "ttft": None, "total": None, "cache": None, "trace": None}
+        self.tokens = []
+        self.streamed = set()
+        self.result = None
+
+    def cached(self, graph, question, answer, kind):
+        self.info.update(answer=answer, result=graph.cached_result(question, answer, kind), cache=kind)
+        self.info["ttft"] = self.info["total"] = time.perf_counter() - self.started
+        self.info["trace"] = self.trace.finish(cache=kind)
+        return [("token", answer), ("done", self.info)]
+
+    def events(self, mode, chunk):
+        from langchain_core.messages import AIMessage, AIMessageChunk
+
+        if mode == "updates":
+            return [("node", node) for node in chunk]
+        if mode == "values":
+            self.result = chunk
+            return []
+        message, metadata = chunk
+        if metadata.get("langgraph_node") not in ANSWER_NODES:
+            return []
+        if not isinstance(message, AIMessage) or message.tool_calls:
+            return []
+        # A node's finished message repeats the chunks already streamed from it
+        step = (metadata.get("langgraph_node"), metadata.get("langgraph_step"))
+        if isinstance(message, AIMessageChunk):
+            self.streamed.add(step)
+        elif step in self.streamed:
+            return []
+        text = _text(message.content)
+        if not text:
+            return []
+        if self.info["ttft"] is None:
+            self.info["ttft"] = time.perf_counter() - self.started
+        self.tokens.append(text)
+        return [("token", text)]
+
+    def done(self, cache_miss=False):
+        from langchain_core.messages import AIMessage
+
+        info = self.info
+        result = self.result
+        messages = (result or {}).get("messages") or []
+        final = messages[-1] if messages else None
+        if isinstance(final, AIMessage) and not final.tool_calls:
+            info["answer"] = _text(final.content)
+        else:
+            info["answer"] = "".join(self.tokens)
+        info["total"] = time.perf_counter() - self.started
+        if info["ttft"] is None:
+            info["ttft"] = info["total"]
+
+        if cache_miss:
+            result = {**result, "cache": None}
+        info["result"] = result
+        info["trace"] = self.trace.finish()
+        return "done", info
+
+
+STREAM_MODES = ["updates", "messages", "values"]
+
+
+def _start(inputs, config):
+    """The answer stream and the instrumented run config"""
+    messages = inputs.get("messages") or []
+    question = getattr(messages[-1], "content", None) if messages else None
+    config, trace = instrument(config, question=question)
+    return _AnswerStream(trace), config
+
+
+def stream_answer(graph, inputs, config=None):
+    """
+    Run the graph and yield events as they happen:
+
+    - ("node", name) when a node finishes
+    - ("token", text) for each piece of the answer
+    - ("done", info) once, with the final state as info["result"], the full
+      answer, and info["ttft"] / info["total"]: seconds to the first token and
+      to the end of the run. info["cache"] is the cache match kind, if any,
+      and info["trace"] the per-node breakdown of the run.
+
+    A CachedGraph is consulted first; a hit is yielded as a single token.
+    """
+    stream, config = _start(inputs, config)
+    cached_graph = question = None
+    if hasattr(graph, "lookup"):
+        question, answer, kind = graph.lookup(inputs)
+        if answer is not None:
+            yield from stream.cached(graph, question, answer, kind)
+            return
+        cached_graph, graph = graph, graph.graph
+
+    for mode, chunk in graph.stream(inputs, config, stream_mode=STREAM_MODES):
+        yield from stream.events(mode, chunk)
+    if question is not None:
+        cached_graph.store(question, stream.result)
+    yield stream.done(cache_miss=question is not None)
+
+
+async def astream_answer(graph, inputs, config=None):
+    """Async version of stream_answer, for graphs built with build_graph(asynchronous=True)"""
+    stream, config = _start(inputs, config)
+    cached_graph = question = None
+    if hasattr(graph, "lookup"):
+        question, answer, kind = await asyncio.to_thread(graph.lookup, inputs)
+        if answer is not None:
+            for event in stream.cached(graph, question, answer, kind):
+                yield event
+            return
+        cached_graph, graph = graph, graph.graph
+
+    async for mode, chunk in graph.astream(inputs, config, stream_mode=STREAM_MODES):
+        for event in stream.events(mode, chunk):
+            yield event
+    if question is not None:
+        await asyncio.to_thread(cached_graph.store, question, stream.result)
+    yield stream.done(cache_miss=question is not None)
@@ -0,0 +1,93 @@
+"""
+Batch retrieval: top-k documents for many queries at once
+
+Every backend turns the N queries into one (queries x terms) matrix and
+scores them in one go:
+- inverted index: each query is tokenized with the index analyzer, then the
+  vocabulary lookup and IDF weighting run once over all tokens; one sparse
+  (queries x terms) @ (terms x documents) product against the document matrix
+  the index keeps after its first batch
+- sparse TF-IDF retriever: one vectorizer transform and one sparse product
+  against the CSR corpus matrix
+- Chroma: one vectorizer transform and one collection.query call with all N
+  query vectors
+- hybrid: the inverted index product plus one embedding call for the N queries
+
+Scores are TF-IDF cosine similarities on every backend (the same scale the
+pre-grader thresholds use). Documents sharing no term with a query are not
+returned, so a query may get fewer than k results; the hybrid backend also
+returns chunks only its dense index found, with a score of None.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.ingetsion.sparse_retriever import with_score
+
+
+def _default_k(store, k):
+    if k is not None:
+        return k
+    if hasattr(store, "k"):
+        return store.k
+    return getattr(store, "search_kwargs", {}).get("k", 4)
+
+
+def _chroma_search_batch(vectorstore, queries: List[str], k: int) -> List[List[Tuple[Document, float]]]:
+    embedding = vectorstore.embeddings
+    query_matrix = embedding.embed_queries_sparse(queries)
+    results = vectorstore._collection.query(
+        query_embeddings=query_matrix.toarray(),
+        n_results=k,
+        include=["documents", "metadatas"],
+    )
+    candidates = [
+        (row, Document(id=doc_id, page_content=text, metadata=metadata or {}))
+        for row, (ids, texts, metadatas) in enumerate(zip(results["ids"], results["documents"], results["metadatas"]))
+        for doc_id, text, metadata in zip(ids, texts, metadatas)
+    ]
+    if not candidates:
+        return [[] for _ in queries]
+    # Exact cosine of each hit to its query (rows are L2-normalized), whatever distance the collection uses
+    rows = np.array([row for row, _ in candidates])
+    doc_matrix = embedding.embed_documents_sparse([doc.page_content for _, doc in candidates])
+    scores = np.asarray(doc_matrix.multiply(query_matrix[rows]).sum(axis=1)).ravel()
+
+    hits = [[] for _ in queries]
+    for (row, doc), score in zip(candidates, scores):
+        if score > 0:
+            hits[row].append((doc, float(score)))
+    return hits
+
+
+def search_batch(queries: List[str], k: int = None, store=None) -> List[List[Tuple[Document, float]]]:
+    """
+    (document, score) pairs, best first, for each query.
+
+    store defaults to the shared vector store from create_vectorstore(); k defaults to the store's own k.
+    """
+    if store is None:
+        from src.ingetsion.retriever import create_vectorstore
+        store = create_vectorstore()
+    k = _default_k(store, k)
+    queries = list(queries)
+    if not queries:
+        return []
+    # Before the index check: the hybrid retriever also holds an inverted index
+    if hasattr(store, "similarity_search_batch"):
+        return store.similarity_search_batch(queries, k)
+    if hasattr(store, "index"):
+        return store.index.search_batch(queries, k)
+    if hasattr(store, "vectorstore"):
+        return _chroma_search_batch(store.vectorstore, queries, k)
+    raise TypeError(f"No batch retrieval for {type(store).__name__}")
+
+
+def retrieve_batch(queries: List[str], k: int = None, store=None) -> List[List[Document]]:
+    """Like retriever.invoke for each query: documents with their score in metadata["score"]"""
+    return [
+        [with_score(doc, score) if score is not None else doc for doc, score in hits]
+        for hits in search_batch(queries, k=k, store=store)
+    ]
@@ -1,7 +1,7 @@
-from langchain_community.document_loaders import WebBaseLoader
+from langchain_core.documents import Document
+from src.ingetsion.web_fetcher import fetch_urls, iter_fetch_urls, DEFAULT_CACHE_DIR
+import threading
 import urllib3
-import ssl
-import time
 
 # Disable SSL warnings for corporate networks
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -61,51 +61,102 @@ urls_full = [
 # Default URLs
 urls = urls_full
 
-def load_web_documents(urls_to_use=None, use_minimal_set=False):
+def html_to_document(html, url):
+    """Convert a fetched page to a Document the same way WebBaseLoader does"""
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html, "html.parser")
+    metadata = {"source": url}
+    if title := soup.find("title"):
+        metadata["title"] = title.get_text()
+    if description := soup.find("meta", attrs={"name": "description"}):
+        metadata["description"] = description.get("content", "No description found.")
+    if html_tag := soup.find("html"):
+        metadata["language"] = html_tag.get("lang", "No language found.")
+    return Document(page_content=soup.get_text(), metadata=metadata)
+
+def load_web_documents(urls_to_use=None, max_workers=8, per_host_interval=0.25,
+                       cache_dir=DEFAULT_CACHE_DIR, max_age=None):
     """
     Load web documents from URLs with SSL handling.
     
+    Pages are fetched concurrently and kept in an on-disk HTTP cache, so pages
+    that did not change since the last run only cost a 304 response.
+    
     Args:
         urls_to_use: Custom list of URLs to load. If None, uses default comprehensive set.
-        use_minimal_set: If True, uses minimal URL set for testing/quota limits.
+        max_workers: Number of pages fetched in parallel.
+        per_host_interval: Minimum seconds between requests to the same host (to be respectful).
+        cache_dir: HTTP cache directory, or None to disable the cache.
+        max_age: Seconds a cached page is reused without asking the server. None always revalidates.
     """
     if urls_to_use is None:
         urls_to_use = urls
     
-    docs = []
-    successful_loads = 0
     print(f"Loading {len(urls_to_use)} documentation pages...")
     
-    for i, url in enumerate(urls_to_use, 1):
-        try:
-            print(f"[{i}/{len(urls_to_use)}] Loading: {url}")
-            
-            # Configure WebBaseLoader with SSL settings
-            loader = WebBaseLoader(
-                url,
-                requests_kwargs={
-                    "verify": False,  # Disable SSL verification for corporate networks
-                    "timeout": 30,
-                    "headers": {
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                    }
-                }
-            )
-            
-            loaded_docs = loader.load()
-            if loaded_docs:
-                docs.extend(loaded_docs)
-                successful_loads += 1
-                print(f"   Success: {len(loaded_docs)} documents ({len(docs)} total)")
+    completed = 0
+    print_lock = threading.Lock()
+    
+    def report(result):
+        nonlocal completed
+        with print_lock:
+            completed += 1
+            prefix = f"[{completed}/{len(urls_to_use)}]"
+            if result.error:
+                print(f"{prefix} Failed: {result.url} - {result.error[:100]}...")
+            elif result.stale:
+                print(f"{prefix} Stale (unreachable, cached copy): {result.url}")
+            elif result.from_cache:
+                print(f"{prefix} Cached ({result.status}): {result.url}")
             else:
-                print(f"   Warning: No content found")
-            
-            # Small delay to be respectful
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f"   Failed: {str(e)[:100]}...")
-    
-    print(f"\nSuccessfully loaded {successful_loads}/{len(urls_to_use)} URLs")
+                print(f"{prefix} Loaded: {result.url}")
+    
+    results = fetch_urls(
+        urls_to_use,
+        max_workers=max_workers,
+        per_host_interval=per_host_interval,
+        cache_dir=cache_dir,
+        max_age=max_age,
+        on_result=report,
+    )
+    
+    docs = []
+    successful_loads = 0
+    from_cache = 0
+    # Keep the documents in URL order regardless of completion order
+    for result in results:
+        if result.error:
+            continue
+        doc = html_to_document(result.html, result.url)
+        if not doc.page_content.strip():
+            print(f"   Warning: No content found at {result.url}")
+        docs.append(doc)
+        successful_loads += 1
+        from_cache += result.from_cache
+    
+    print(f"\nSuccessfully loaded {successful_loads}/{len(urls_to_use)} URLs ({from_cache} unchanged, served from cache)")
     print(f"Total documents loaded: {len(docs)}")
-    return docs
\ No newline at end of file
+    return docs
+
+def iter_web_documents(urls_to_use=None, max_workers=8, per_host_interval=0.25,
+                       cache_dir=DEFAULT_CACHE_DIR, max_age=None):
+    """
+    Yield (document, fetch result) pairs as pages arrive, in completion order.
+    
+    Failed fetches are reported and skipped. Used by the streaming ingestion pipeline.
+    """
+    if urls_to_use is None:
+        urls_to_use = urls
+    
+    for result in iter_fetch_urls(
+        urls_to_use,
+        max_workers=max_workers,
+        per_host_interval=per_host_interval,
+        cache_dir=cache_dir,
+        max_age=max_age,
+    ):
+        if result.error:
+            print(f"   Failed: {result.url} - {result.error[:100]}...")
+            continue
+        yield html_to_document(result.html, result.url), result
@@ -0,0 +1,69 @@
+"""
+Retrieval evaluation over labelled questions
+
+    python -m src.ingetsion.evaluation questions.jsonl --k 4
+
+Each JSONL line is {"question": "...", "sources": ["expected source", ...]}.
+Questions are retrieved with retrieve_batch, batch_size at a time, and scored
+by hit rate@k (some expected source is in the top k) and mean reciprocal rank.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Allow running as a script as well as with -m
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.ingetsion.batch_retriever import retrieve_batch
+
+
+def load_examples(path) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate_retrieval(examples: List[Dict], k: int = 4, batch_size: int = 256, store=None) -> Dict:
+    """Hit rate@k and MRR of the retriever on examples with expected sources"""
+    hits = 0
+    reciprocal_ranks = 0.0
+    started = time.perf_counter()
+    for start in range(0, len(examples), batch_size):
+        batch = examples[start:start + batch_size]
+        results = retrieve_batch([example["question"] for example in batch], k=k, store=store)
+        for example, documents in zip(batch, results):
+            expected = set(example["sources"])
+            ranks = [rank for rank, doc in enumerate(documents, 1) if doc.metadata.get("source") in expected]
+            if ranks:
+                hits += 1
+                reciprocal_ranks += 1 / ranks[0]
+    seconds = time.perf_counter() - started
+    n = len(examples)
+    return {
+        "questions": n,
+        "k": k,
+        "hit_rate": hits / n if n else 0.0,
+        "mrr": reciprocal_ranks / n if n else 0.0,
+        "seconds": seconds,
+        "questions_per_second": n / seconds if seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval on labelled questions")
+    parser.add_argument("path", help="JSONL file with question and sources fields")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    report = evaluate_retrieval(load_examples(args.path), k=args.k, batch_size=args.batch_size)
+    print(f"📊 Retrieval on {report['questions']} questions: hit rate@{report['k']} {report['hit_rate']:.1%}, "
+          f"MRR {report['mrr']:.3f} ({report['questions_per_second']:.0f} questions/s)")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Hybrid lexical + dense retrieval with reciprocal-rank fusion
+
+The sparse TF-IDF inverted index finds chunks sharing the query's exact terms;
+a dense index (MiniLM sentence embeddings by default) finds paraphrases and
+other wordings of the same thing. Each ranks its top HYBRID_CANDIDATES chunks
+and the two rankings are fused with weighted reciprocal-rank fusion:
+
+    rrf(d) = sparse_weight / (rrf_k + sparse_rank(d)) + dense_weight / (rrf_k + dense_rank(d))
+
+RRF only uses ranks, so the TF-IDF cosines and the embedding cosines never
+need to be put on one scale. The query embedding (the slow part) runs on a
+worker thread while the sparse scoring runs on the caller's.
+
+metadata["score"] stays the TF-IDF cosine the pre-grader thresholds are tuned
+for. Chunks only the dense index found have no score, so the pre-grader sends
+them to the LLM grader instead of rejecting them for lacking the query terms.
+
+The dense vectors live in a "dense" subdirectory of the inverted index and
+are keyed by chunk id: opening the store embeds only the chunks added since
+the last sync and drops the deleted ones.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.ingetsion.index_format import _replace_file, _save_array
+from src.ingetsion.sparse_retriever import top_k_indices, top_k_per_row, with_score
+
+SPARSE_WEIGHT = float(os.getenv("HYBRID_SPARSE_WEIGHT", "1.0"))
+DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0"))
+# 60 is the constant from the original RRF paper; larger values flatten the rank weights
+RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Chunks each index contributes to the fusion
+CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+PARALLEL = os.getenv("HYBRID_PARALLEL", "true").lower() in ("1", "true", "yes")
+
+DENSE_DIRECTORY = "dense"
+DENSE_MANIFEST_FILE = "dense.json"
+# Chunks embedded per embed_documents call when syncing
+EMBED_BATCH_SIZE = 256
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid-dense")
+    return _executor
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], weights: Sequence[float],
+                           rrf_k: int = RRF_K) -> Dict[int, float]:
+    """Weighted RRF score of every item in any of the rankings (best first, ranks start at 1)"""
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        # A zero weight switches a ranking off rather than adding its items at score 0
+        if weight <= 0:
+            continue
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + weight / (rrf_k + rank)
+    return fused
+
+
+def _embedding_name(embedding) -> str:
+    return getattr(embedding, "model_name", None) or type(embedding).__name__
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class DenseIndex:
+    """L2-normalized chunk embeddings, row-aligned with the inverted index documents"""
+
+    def __init__(self, vectors: np.ndarray, chunk_ids: List[str], embedding):
+        self.vectors = vectors
+        self.chunk_ids = chunk_ids
+        self.embedding = embedding
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    @staticmethod
+    def directory(persist_directory: str) -> str:
+        return os.path.join(persist_directory, DENSE_DIRECTORY)
+
+    @classmethod
+    def _load_rows(cls, persist_directory: str, embedding) -> Dict[str, np.ndarray]:
+        """Stored vectors by chunk id, or {} if they are missing or from another model"""
+        directory = cls.directory(persist_directory)
+        try:
+            with open(os.path.join(directory, DENSE_MANIFEST_FILE), encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("model") != _embedding_name(embedding):
+                print(f"Dense index was built with {manifest.get('model')}, re-embedding all chunks")
+                return {}
+            vectors = np.load(os.path.join(directory, "vectors.npy"))
+            chunk_ids = np.load(os.path.join(directory, "chunk_ids.npy")).tolist()
+        except (OSError, ValueError):
+            return {}
+        return dict(zip(chunk_ids, vectors))
+
+    @classmethod
+    def sync(cls, persist_directory: str, documents: Sequence[Document], embedding) -> "DenseIndex":
+        """
+        Open the dense index of persist_directory, aligned with documents.
+
+        Only documents without a stored vector are embedded; vectors of documents
+        no longer present are dropped. The index is saved when anything changed.
+        """
+        stored = cls._load_rows(persist_directory, embedding)
+        chunk_ids = [doc.metadata.get("chunk_id") or str(i) for i, doc in enumerate(documents)]
+        missing = [i for i, chunk_id in enumerate(chunk_ids) if chunk_id not in stored]
+
+        new_vectors = {}
+        if missing:
+            print(f"Embedding {len(missing)} chunks for the dense index ({len(stored)} stored)...")
+            # The EmbeddingEngine returns an array directly instead of nested lists
+            embed = getattr(embedding, "embed_array", embedding.embed_documents)
+            for start in range(0, len(missing), EMBED_BATCH_SIZE):
+                batch = missing[start:start + EMBED_BATCH_SIZE]
+                vectors = embed([documents[i].page_content for i in batch])
+                for i, vector in zip(batch, vectors):
+                    new_vectors[i] = np.asarray(vector, dtype=np.float32)
+
+        rows = [new_vectors[i] if i in new_vectors else stored[chunk_id] for i, chunk_id in enumerate(chunk_ids)]
+        vectors = _normalize(np.vstack(rows).astype(np.float32)) if rows else np.empty((0, 0), dtype=np.float32)
+        index = cls(vectors, chunk_ids, embedding)
+        if missing or len(stored) != len(chunk_ids):
+            index.save(persist_directory)
+        return index
+
+    def save(self, persist_directory: str):
+        """Write the vectors and chunk ids; the manifest is written last"""
+        directory = self.directory(persist_directory)
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, DENSE_MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        _save_array(directory, "vectors", self.vectors)
+        _save_array(directory, "chunk_ids", np.asarray(self.chunk_ids, dtype=np.str_))
+        manifest = {"model": _embedding_name(self.embedding), "n_documents": len(self),
+                    "dimension": int(self.vectors.shape[1]) if len(self) else 0}
+        _replace_file(manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+
+    def query_vectors(self, queries: List[str]) -> np.ndarray:
+        if len(queries) == 1:
+            vectors = [self.embedding.embed_query(queries[0])]
+        else:
+            vectors = self.embedding.embed_documents(queries)
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+    def scores(self, query_vectors: np.ndarray) -> np.ndarray:
+        """(queries x documents) cosine similarities"""
+        if not len(self):
+            return np.zeros((len(query_vectors), 0), dtype=np.float32)
+        return query_vectors @ self.vectors.T
+
+
+class HybridRetriever(BaseRetriever):
+    """Sparse TF-IDF and dense retrieval fused with reciprocal-rank fusion"""
+
+    index: Any
+    dense: Any
+    k: int = 4
+    sparse_weight: float = SPARSE_WEIGHT
+    dense_weight: float = DENSE_WEIGHT
+    rrf_k: int = RRF_K
+    candidates: int = CANDIDATES
+    parallel: bool = PARALLEL
+
+    def _sparse_hits(self, queries: List[str], candidates: int) -> List[List[Tuple[int, float]]]:
+        """(document position, TF-IDF cosine) of the top candidates for each query"""
+        if len(queries) == 1:
+            # Walking one query's postings touches only the documents sharing its terms
+            scores = self.index.scores(queries[0])
+            return [[(int(i), float(scores[i])) for i in top_k_indices(scores, candidates) if scores[i] > 0]]
+        return top_k_per_row(self.index.query_matrix(queries) @ self.index.doc_matrix().T, candidates)
+
+    def _fuse(self, sparse_hits: List[Tuple[int, float]], dense_scores: np.ndarray, k: int,
+              candidates: int) -> List[Tuple[Document, Any]]:
+        """Fuse the top candidates of both rankings and keep the best k"""
+        sparse_ranking = [position for position, _ in sparse_hits]
+        dense_ranking = [int(i) for i in top_k_indices(dense_scores, candidates)]
+        fused = reciprocal_rank_fusion([sparse_ranking, dense_ranking],
+                                       [self.sparse_weight, self.dense_weight], self.rrf_k)
+        # Ties keep the sparse order, then the dense order
+        order = {}
+        for position in sparse_ranking + dense_ranking:
+            order.setdefault(position, len(order))
+        best = sorted(fused, key=lambda position: (-fused[position], order[position]))[:k]
+
+        sparse_scores = dict(sparse_hits)
+        hits = []
+        for position in best:
+            doc = self.index.documents[position]
+            metadata = {**doc.metadata, "dense_score": float(dense_scores[position]),
+                        "rrf_score": fused[position]}
+            hits.append((Document(page_content=doc.page_content, metadata=metadata),
+                         sparse_scores.get(position)))
+        return hits
+
+    def similarity_search_batch(self, queries: List[str], k: int = None) -> List[List[Tuple[Document, Any]]]:
+        """(document, TF-IDF score or None for dense-only hits), best fused first, for each query"""
+        k = self.k if k is None else k
+        # Both rankings are cut at the same depth, and never shallower than k
+        candidates = max(self.candidates, k)
+        if self.parallel:
+            dense_future = _get_executor().submit(self.dense.query_vectors, queries)
+            sparse_hits = self._sparse_hits(queries, candidates)
+            query_vectors = dense_future.result()
+        else:
+            query_vectors = self.dense.query_vectors(queries)
+            sparse_hits = self._sparse_hits(queries, candidates)
+        dense_scores = self.dense.scores(query_vectors)
+        return [self._fuse(hits, scores, k, candidates) for hits, scores in zip(sparse_hits, dense_scores)]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [with_score(doc, score) if score is not None else doc
+                for doc, score in self.similarity_search_batch([query])[0]]
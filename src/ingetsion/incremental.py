@@ -0,0 +1,235 @@
+"""
+Incremental re-indexing keyed on content hashes
+
+A manifest next to the vector store records a content hash per source URL and
+the ids of the chunks it produced. A refresh only re-splits and re-embeds the
+sources whose content changed, upserts the chunks that are new, and deletes the
+chunks of sources that changed or disappeared.
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+
+MANIFEST_FILE = "ingest_manifest.json"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def source_hash(source_docs):
+    """Content hash of all documents loaded from one source"""
+    return content_hash("\0".join(doc.page_content for doc in source_docs))
+
+
+def assign_chunk_ids(chunks):
+    """
+    Give every chunk a deterministic id derived from its source and content.
+
+    Identical chunks within one source are told apart by their occurrence number,
+    so re-splitting an unchanged page always reproduces the same ids. The id is
+    stored both as Document.id (used by Chroma's upsert) and in metadata["chunk_id"]
+    (persisted by the inverted index).
+    """
+    occurrences = defaultdict(int)
+    for chunk in chunks:
+        source = chunk.metadata.get("source", "")
+        key = (source, chunk.page_content)
+        chunk_id = content_hash(f"{source}\n{occurrences[key]}\n{chunk.page_content}")[:32]
+        occurrences[key] += 1
+        chunk.id = chunk_id
+        chunk.metadata["chunk_id"] = chunk_id
+    return chunks
+
+
+def load_manifest(persist_directory):
+    path = os.path.join(persist_directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"sources": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(persist_directory, manifest):
+    os.makedirs(persist_directory, exist_ok=True)
+    path = os.path.join(persist_directory, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def plan_update(docs, manifest, sources=None):
+    """
+    Compare fetched documents with the manifest.
+
+    Args:
+        docs: Freshly loaded documents (one or more per source)
+        manifest: Manifest from load_manifest()
+        sources: Every source that should be in the index. Sources listed here but
+            missing from docs (e.g. a failed fetch) are left untouched; indexed sources
+            not listed here are removed. None removes nothing: an indexed source missing
+            from docs may just have failed to fetch.
+
+    Returns:
+        (changed_docs, removed_sources, source_hashes)
+    """
+    docs_by_source = defaultdict(list)
+    for doc in docs:
+        docs_by_source[doc.metadata.get("source", "")].append(doc)
+    source_hashes = {source: source_hash(source_docs) for source, source_docs in docs_by_source.items()}
+    indexed = manifest["sources"]
+    changed_docs = [
+        doc
+        for source, source_docs in docs_by_source.items()
+        if indexed.get(source, {}).get("hash") != source_hashes[source]
+        for doc in source_docs
+    ]
+    removed_sources = []
+    if sources is not None:
+        expected = set(sources)
+        removed_sources = [source for source in indexed if source not in expected]
+    return changed_docs, removed_sources, source_hashes
+
+
+def incremental_update(docs, sources=None, backend=None, persist_directory=None, split=None,
+                       background_refit=True):
+    """
+    Bring the vector store in line with docs, touching only what changed.
+
+    Args:
+        docs: Loaded (unsplit) documents, e.g. from load_web_documents()
+        sources: Full list of expected sources, see plan_update()
+        backend: "chroma", "inverted_index" or "hybrid" (defaults like create_vectorstore)
+        persist_directory: Store directory (defaults to the backend's directory)
+        split: Function splitting documents into chunks (defaults to split_texts)
+        background_refit: If new chunks degrade vocabulary coverage, refit and re-embed
+            in a background thread (True) or before returning (False)
+
+    Returns:
+        Dict with counts of changed/removed sources and added/deleted/kept chunks
+    """
+    from src.ingetsion.retriever import get_backend, DEFAULT_PERSIST_DIRECTORIES
+
+    start = time.perf_counter()
+    backend = get_backend(backend)
+    if persist_directory is None:
+        persist_directory = DEFAULT_PERSIST_DIRECTORIES[backend]
+    if split is None:
+        from src.ingetsion.text_splitter import split_texts
+        split = split_texts
+
+    manifest = load_manifest(persist_directory)
+    changed_docs, removed_sources, source_hashes = plan_update(docs, manifest, sources)
+    changed_sources = sorted({doc.metadata.get("source", "") for doc in changed_docs})
+    print(f"{len(changed_sources)} changed/new sources, {len(removed_sources)} removed sources, "
+          f"{len(source_hashes) - len(changed_sources)} unchanged")
+
+    # Only changed sources are re-split
+    new_chunks = assign_chunk_ids(split(changed_docs)) if changed_docs else []
+    new_ids = {chunk.id for chunk in new_chunks}
+
+    previous_ids = set()
+    for source in changed_sources + removed_sources:
+        previous_ids.update(manifest["sources"].get(source, {}).get("chunk_ids", []))
+    delete_ids = previous_ids - new_ids
+    # Chunks of a changed page that are byte-identical keep their vectors
+    add_chunks = [chunk for chunk in new_chunks if chunk.id not in previous_ids]
+
+    from src.ingetsion.vectorizer_refit import check_vocabulary_coverage
+
+    embedding = apply_changes(backend, persist_directory, add_chunks, delete_ids)
+
+    for source in removed_sources:
+        manifest["sources"].pop(source, None)
+    chunk_ids_by_source = defaultdict(list)
+    for chunk in new_chunks:
+        chunk_ids_by_source[chunk.metadata.get("source", "")].append(chunk.id)
+    for source in changed_sources:
+        manifest["sources"][source] = {
+            "hash": source_hashes[source],
+            "chunk_ids": chunk_ids_by_source[source],
+        }
+    manifest["updated_at"] = time.time()
+    save_manifest(persist_directory, manifest)
+
+    stats = {
+        "changed_sources": len(changed_sources),
+        "removed_sources": len(removed_sources),
+        "added_chunks": len(add_chunks),
+        "deleted_chunks": len(delete_ids),
+        "kept_chunks": len(new_ids & previous_ids),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    print(f"Incremental update: +{stats['added_chunks']} / -{stats['deleted_chunks']} chunks "
+          f"in {stats['seconds']}s")
+
+    if embedding is not None and add_chunks:
+        stats["refit_scheduled"] = check_vocabulary_coverage(
+            embedding, add_chunks, backend, persist_directory, background=background_refit
+        ) is not None
+    return stats
+
+
+def apply_changes(backend, persist_directory, add_chunks, delete_ids):
+    """
+    Upsert add_chunks and delete delete_ids in the store.
+
+    Returns:
+        The embedding (at its current vectorizer version) used for the new chunks, or None
+    """
+    from src.ingetsion.vectorizer_refit import index_write_lock
+
+    with index_write_lock:
+        # The hybrid dense index catches up with the inverted index when the store is opened
+        if backend in ("inverted_index", "hybrid"):
+            return _apply_to_inverted_index(persist_directory, add_chunks, delete_ids)
+        return _apply_to_chroma(persist_directory, add_chunks, delete_ids)
+
+
+def _apply_to_chroma(persist_directory, add_chunks, delete_ids):
+    from src.ingetsion.retriever import create_embedding, open_chroma, tag_vectorizer_version
+
+    embedding = create_embedding(persist_directory)
+    if not embedding.load_cache():
+        if not add_chunks:
+            return None
+        # First build: one corpus-wide fit creates the first vectorizer version
+        embedding.fit([chunk.page_content for chunk in add_chunks])
+    vectorstore = open_chroma(persist_directory, embedding)
+    if delete_ids:
+        vectorstore.delete(ids=sorted(delete_ids))
+    if add_chunks:
+        # Upsert keyed on Document.id, so re-running never duplicates chunks
+        vectorstore.add_documents(tag_vectorizer_version(add_chunks, embedding))
+    return embedding
+
+
+def _apply_to_inverted_index(persist_directory, add_chunks, delete_ids):
+    from src.ingetsion.inverted_index import TfidfInvertedIndex
+    from src.ingetsion.retriever import create_embedding
+
+    embedding = create_embedding(persist_directory)
+    embedding.load_cache()
+    if TfidfInvertedIndex.exists(persist_directory):
+        existing = TfidfInvertedIndex.load(persist_directory)
+        if not add_chunks and not delete_ids:
+            return embedding
+        if existing.vectorizer_version is not None and existing.vectorizer_version == embedding.version:
+            # Only the new chunks are embedded; existing postings are reused
+            existing.update(embedding, add_chunks, delete_ids).save(persist_directory)
+            return embedding
+        # Index predates vectorizer artifacts: rebuild once from its stored chunk texts
+        documents = [doc for doc in existing.documents if doc.metadata.get("chunk_id") not in delete_ids]
+        documents += add_chunks
+    else:
+        documents = list(add_chunks)
+    if not documents:
+        print("No chunks to index")
+        return None
+    embedding.fit([doc.page_content for doc in documents])
+    TfidfInvertedIndex.build(documents, embedding).save(persist_directory)
+    return embedding
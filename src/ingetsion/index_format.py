@@ -0,0 +1,191 @@
+"""
+Versioned, memory-mapped on-disk format for the TF-IDF inverted index
+
+Everything a query needs is stored as flat arrays that are opened with
+mmap, so a process can answer its first query without unpickling anything
+and several worker processes on one host share the same physical pages.
+
+Layout of an index directory:
+    manifest.json          format name/version, counts, analyzer settings and the
+                           version of the vectorizer artifact the weights came from
+    vocabulary.npy         sorted fixed-width unicode terms (term id = position)
+    idf.npy                float32 IDF weight per term
+    postings_indptr.npy    int64, postings of term t are [indptr[t], indptr[t + 1])
+    postings_doc_ids.npy   int32 document ids, ascending within a term
+    postings_weights.npy   float32 L2-normalized TF-IDF weights
+    texts.bin              UTF-8 chunk texts, concatenated
+    texts_offsets.npy      int64 byte offsets into texts.bin (n_documents + 1)
+    metadata.bin           UTF-8 JSON metadata per chunk, concatenated
+    metadata_offsets.npy   int64 byte offsets into metadata.bin (n_documents + 1)
+"""
+
+import json
+import os
+import re
+from collections.abc import Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+FORMAT_NAME = "tfidf-inverted-index"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+
+class IndexFormatError(RuntimeError):
+    """Raised when an index directory is missing, corrupt or from another format version"""
+
+
+def analyzer_params(vectorizer):
+    """Extract the analyzer settings needed to tokenize queries without sklearn"""
+    unsupported = (
+        vectorizer.analyzer != "word"
+        or vectorizer.tokenizer is not None
+        or vectorizer.preprocessor is not None
+        or vectorizer.strip_accents is not None
+    )
+    if unsupported:
+        raise ValueError("Only word analyzers with the default tokenizer can be stored in the index format")
+    stop_words = vectorizer.get_stop_words()
+    return {
+        "lowercase": vectorizer.lowercase,
+        "token_pattern": vectorizer.token_pattern,
+        "stop_words": sorted(stop_words) if stop_words else [],
+        "ngram_range": list(vectorizer.ngram_range),
+    }
+
+
+def build_analyzer(params):
+    """Pure-Python equivalent of TfidfVectorizer.build_analyzer() for word n-grams"""
+    token_re = re.compile(params["token_pattern"])
+    stop_words = frozenset(params["stop_words"])
+    min_n, max_n = params["ngram_range"]
+    lowercase = params["lowercase"]
+
+    def analyze(text):
+        if lowercase:
+            text = text.lower()
+        tokens = [token for token in token_re.findall(text) if token not in stop_words]
+        if max_n == 1:
+            return tokens
+        # Same n-gram order as sklearn's _word_ngrams
+        ngrams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            for i in range(len(tokens) - n + 1):
+                ngrams.append(" ".join(tokens[i:i + n]))
+        return ngrams
+
+    return analyze
+
+
+def _replace_file(path, write):
+    """Write a file next to its destination and rename it into place.
+
+    Renaming keeps the old inode alive, so processes that still have the previous
+    version memory-mapped never see a truncated file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _save_array(directory, name, array):
+    _replace_file(os.path.join(directory, f"{name}.npy"), lambda f: np.save(f, array))
+
+
+def _write_blobs(directory, name, values):
+    """Write strings as one UTF-8 blob plus an offsets array"""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    _replace_file(os.path.join(directory, f"{name}.bin"), lambda f: f.writelines(encoded))
+    _save_array(directory, f"{name}_offsets", offsets)
+
+
+def _open_blob(directory, name):
+    path = os.path.join(directory, f"{name}.bin")
+    # np.memmap cannot map an empty file
+    blob = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.empty(0, dtype=np.uint8)
+    return blob, np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode="r")
+
+
+def write_index(directory, documents, vocabulary, idf, params, indptr, doc_ids, weights,
+                vectorizer_version=None):
+    """Write an index in the current format version; the manifest is written last"""
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        # Invalidate the old index before overwriting its arrays
+        os.remove(manifest_path)
+
+    _save_array(directory, "vocabulary", np.asarray(vocabulary, dtype=np.str_))
+    _save_array(directory, "idf", np.asarray(idf, dtype=np.float32))
+    _save_array(directory, "postings_indptr", np.asarray(indptr, dtype=np.int64))
+    _save_array(directory, "postings_doc_ids", np.asarray(doc_ids, dtype=np.int32))
+    _save_array(directory, "postings_weights", np.asarray(weights, dtype=np.float32))
+    _write_blobs(directory, "texts", [doc.page_content for doc in documents])
+    _write_blobs(directory, "metadata", [json.dumps(doc.metadata) for doc in documents])
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "format_version": FORMAT_VERSION,
+        "n_documents": len(documents),
+        "n_terms": len(vocabulary),
+        "n_postings": int(len(doc_ids)),
+        "analyzer": params,
+        "vectorizer_version": vectorizer_version,
+    }
+    _replace_file(manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+
+
+def read_manifest(directory):
+    """Read and validate the manifest of an index directory"""
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise IndexFormatError(f"No index manifest found in {directory}")
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME or manifest.get("format_version") != FORMAT_VERSION:
+        raise IndexFormatError(
+            f"Index in {directory} has format {manifest.get('format')} v{manifest.get('format_version')}, "
+            f"expected {FORMAT_NAME} v{FORMAT_VERSION}. Rebuild it with rebuild_vectorstore_clean.py"
+        )
+    return manifest
+
+
+def open_index(directory):
+    """Memory-map an index directory; returns (manifest, arrays dict, MappedDocuments)"""
+    manifest = read_manifest(directory)
+    arrays = {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        for name in ("vocabulary", "idf", "postings_indptr", "postings_doc_ids", "postings_weights")
+    }
+    documents = MappedDocuments(*_open_blob(directory, "texts"), *_open_blob(directory, "metadata"))
+    if len(documents) != manifest["n_documents"]:
+        raise IndexFormatError(f"Index in {directory} is corrupt: document count does not match manifest")
+    return manifest, arrays, documents
+
+
+class MappedDocuments(Sequence):
+    """Read-only sequence of Documents decoded on access from memory-mapped blobs"""
+
+    def __init__(self, texts, text_offsets, metadata, metadata_offsets):
+        self._texts = texts
+        self._text_offsets = text_offsets
+        self._metadata = metadata
+        self._metadata_offsets = metadata_offsets
+
+    def __len__(self):
+        return len(self._text_offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("document index out of range")
+        text = self._texts[self._text_offsets[i]:self._text_offsets[i + 1]].tobytes().decode("utf-8")
+        metadata = self._metadata[self._metadata_offsets[i]:self._metadata_offsets[i + 1]].tobytes()
+        return Document(page_content=text, metadata=json.loads(metadata))
@@ -0,0 +1,243 @@
+"""
+In-process inverted index over TF-IDF vectors
+Exact top-k cosine retrieval without Chroma: each vocabulary term keeps a
+postings list of (document id, weight), and a query only touches the postings
+of its own terms. Indexes are stored in the memory-mapped format from
+src.ingetsion.index_format, so loading one does not unpickle anything.
+"""
+
+import os
+from collections import Counter
+from typing import Any, List, Tuple
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix, vstack
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.ingetsion import index_format
+from src.ingetsion.sparse_retriever import top_k_indices, top_k_per_row, with_score
+
+
+class TfidfInvertedIndex:
+    """Term-major postings over a sorted TF-IDF vocabulary"""
+
+    def __init__(self, documents, vocabulary, idf, indptr, doc_ids, weights, analyzer_params,
+                 vectorizer_version=None):
+        self.documents = documents
+        # Version of the vectorizer artifact the postings were computed with
+        self.vectorizer_version = vectorizer_version
+        # Term id is the position in the sorted vocabulary
+        self.vocabulary = vocabulary
+        self.idf = idf
+        # Postings for term t live in doc_ids/weights[indptr[t]:indptr[t + 1]]
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.analyzer_params = analyzer_params
+        self._analyzer = index_format.build_analyzer(analyzer_params)
+        # Document-term matrix for batch scoring, built from the postings on first use
+        self._doc_matrix = None
+
+    @classmethod
+    def build(cls, documents: List[Document], embedding):
+        """Embed the documents and invert the document-term matrix"""
+        texts = [doc.page_content for doc in documents]
+        doc_matrix = embedding.embed_documents_sparse(texts)
+        vectorizer = embedding.vectorizer
+
+        # Renumber terms in sorted order so queries can binary-search the vocabulary
+        terms = sorted(vectorizer.vocabulary_)
+        column_order = _column_order(vectorizer, terms)
+        return cls._from_matrix(
+            list(documents),
+            doc_matrix[:, column_order],
+            np.array(terms, dtype=np.str_),
+            vectorizer.idf_[column_order].astype(np.float32),
+            index_format.analyzer_params(vectorizer),
+            embedding.version,
+        )
+
+    @classmethod
+    def _from_matrix(cls, documents, doc_matrix, vocabulary, idf, params, vectorizer_version):
+        # CSC of the document-term matrix is exactly the term -> documents postings
+        postings = doc_matrix.tocsc()
+        postings.sort_indices()
+        return cls(
+            documents,
+            vocabulary,
+            idf,
+            postings.indptr.astype(np.int64),
+            postings.indices.astype(np.int32),
+            postings.data.astype(np.float32),
+            params,
+            vectorizer_version,
+        )
+
+    def doc_matrix(self):
+        """
+        The (documents x terms) sparse matrix over the postings.
+
+        Built once per index: postings never change in place, update() returns
+        a new index with its own matrix.
+        """
+        if self._doc_matrix is None:
+            self._doc_matrix = csc_matrix(
+                (np.asarray(self.weights), np.asarray(self.doc_ids), np.asarray(self.indptr)),
+                shape=(len(self.documents), len(self.vocabulary)),
+            )
+        return self._doc_matrix
+
+    def update(self, embedding, add_documents: List[Document] = (), delete_ids=()):
+        """
+        Return a new index with documents added and/or removed by metadata["chunk_id"].
+
+        Only the added documents are embedded; existing rows are reused as-is, so
+        the embedding must be the vectorizer version this index was built with.
+        """
+        if embedding.version != self.vectorizer_version:
+            raise ValueError(
+                f"Index was built with vectorizer {self.vectorizer_version}, "
+                f"got {embedding.version}; rebuild or refit instead"
+            )
+        delete_ids = set(delete_ids)
+        keep = [i for i, doc in enumerate(self.documents) if doc.metadata.get("chunk_id") not in delete_ids]
+        documents = [self.documents[i] for i in keep]
+        doc_matrix = self.doc_matrix()[keep]
+        if add_documents:
+            vectorizer = embedding.vectorizer
+            new_rows = embedding.embed_documents_sparse([doc.page_content for doc in add_documents])
+            new_rows = new_rows[:, _column_order(vectorizer, self.vocabulary)]
+            doc_matrix = vstack([doc_matrix.tocsr(), new_rows.astype(np.float32)])
+            documents += list(add_documents)
+        return self._from_matrix(
+            documents,
+            doc_matrix,
+            np.asarray(self.vocabulary),
+            np.asarray(self.idf),
+            self.analyzer_params,
+            self.vectorizer_version,
+        )
+
+    def __len__(self):
+        return len(self.documents)
+
+    def query_vector(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (term ids, L2-normalized TF-IDF weights) for a query"""
+        counts = Counter(self._analyzer(query))
+        if not counts or len(self.vocabulary) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        terms = np.array(list(counts), dtype=np.str_)
+        positions = np.searchsorted(self.vocabulary, terms)
+        positions[positions == len(self.vocabulary)] = 0
+        known = self.vocabulary[positions] == terms
+        if not known.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        term_ids = positions[known]
+        term_counts = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))[known]
+        weights = term_counts * self.idf[term_ids]
+        return term_ids, weights / np.linalg.norm(weights)
+
+    def scores(self, query: str) -> np.ndarray:
+        """Cosine similarity of the query to every document"""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term_id, query_weight in zip(*self.query_vector(query)):
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # Document ids are unique within a postings list, so fancy-index add is safe
+            scores[self.doc_ids[start:end]] += query_weight * self.weights[start:end]
+        return scores
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """Return the exact top-k documents by cosine similarity, skipping zero scores"""
+        scores = self.scores(query)
+        return [
+            (self.documents[i], float(scores[i]))
+            for i in top_k_indices(scores, k)
+            if scores[i] > 0
+        ]
+
+    def query_matrix(self, queries: List[str]) -> csr_matrix:
+        """
+        (queries x terms) matrix of L2-normalized query vectors.
+
+        Each query is tokenized with the index analyzer; the vocabulary lookup,
+        IDF weighting and normalization then run once over the tokens of all queries.
+        """
+        tokens = [self._analyzer(query) for query in queries]
+        shape = (len(queries), len(self.vocabulary))
+        terms = np.array([token for query_tokens in tokens for token in query_tokens], dtype=np.str_)
+        if not len(terms) or not len(self.vocabulary):
+            return csr_matrix(shape, dtype=np.float32)
+        rows = np.repeat(np.arange(len(queries)), [len(query_tokens) for query_tokens in tokens])
+        positions = np.searchsorted(self.vocabulary, terms)
+        positions[positions == len(self.vocabulary)] = 0
+        known = self.vocabulary[positions] == terms
+        # Duplicate (query, term) pairs are summed into term counts
+        matrix = csr_matrix(
+            (np.ones(int(known.sum()), dtype=np.float32), (rows[known], positions[known])), shape=shape
+        )
+        matrix.sum_duplicates()
+        matrix.data *= np.asarray(self.idf)[matrix.indices]
+        row_lengths = np.diff(matrix.indptr)
+        norms = np.sqrt(np.add.reduceat(matrix.data ** 2, matrix.indptr[:-1][row_lengths > 0]))
+        matrix.data /= np.repeat(norms, row_lengths[row_lengths > 0])
+        return matrix
+
+    def search_batch(self, queries: List[str], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """search() for many queries at once, scored with a single sparse matrix product"""
+        if not queries:
+            return []
+        # (queries x terms) @ (terms x documents): only documents sharing a term get a score
+        scores = self.query_matrix(queries) @ self.doc_matrix().T
+        return [[(self.documents[i], score) for i, score in row] for row in top_k_per_row(scores, k)]
+
+    def save(self, directory: str):
+        """Persist the index in the memory-mapped on-disk format"""
+        index_format.write_index(
+            directory,
+            self.documents,
+            self.vocabulary,
+            self.idf,
+            self.analyzer_params,
+            self.indptr,
+            self.doc_ids,
+            self.weights,
+            vectorizer_version=self.vectorizer_version,
+        )
+
+    @classmethod
+    def load(cls, directory: str):
+        """Memory-map an index saved with save(); arrays stay on disk until touched"""
+        manifest, arrays, documents = index_format.open_index(directory)
+        return cls(
+            documents,
+            arrays["vocabulary"],
+            arrays["idf"],
+            arrays["postings_indptr"],
+            arrays["postings_doc_ids"],
+            arrays["postings_weights"],
+            manifest["analyzer"],
+            manifest.get("vectorizer_version"),
+        )
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, index_format.MANIFEST_FILE))
+
+
+def _column_order(vectorizer, terms):
+    """Vectorizer column index of each term, in the given term order"""
+    return np.array([vectorizer.vocabulary_[term] for term in terms], dtype=np.int64)
+
+
+class InvertedIndexRetriever(BaseRetriever):
+    """LangChain retriever backed by a TfidfInvertedIndex"""
+
+    index: Any
+    k: int = 4
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [with_score(doc, score) for doc, score in self.index.search(query, self.k)]
@@ -0,0 +1,261 @@
+"""
+Streaming ingestion pipeline: fetch -> split -> embed + insert
+
+Each stage is a generator running in its own thread, connected to the next
+one by a bounded queue. Peak memory is bounded by the queue sizes and the
+insert batch size instead of the whole corpus, and chunks become queryable
+batch by batch while later pages are still being fetched. Unchanged pages
+(same content hash as in the ingest manifest) are skipped before splitting.
+
+The first batch into an empty store fixes the TF-IDF vocabulary, so a build
+from scratch refits the vectorizer on every chunk once all batches are in.
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional
+
+from src.ingetsion import incremental
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """Progress and throughput of one pipeline stage"""
+    name: str
+    unit: str
+    items: int = 0
+    # Seconds the stage sat blocked because the next stage was behind
+    blocked_seconds: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+    _last_report: float = 0.0
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self):
+        return self.items / self.elapsed if self.elapsed > 0 else 0.0
+
+    def add(self, count=1, report_every=2.0):
+        self.items += count
+        now = time.perf_counter()
+        if now - self._last_report >= report_every:
+            self._last_report = now
+            print(f"   [{self.name}] {self.items} {self.unit} ({self.throughput:.1f} {self.unit}/s)")
+
+    def summary(self):
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "unit": self.unit,
+            "seconds": round(self.elapsed, 3),
+            "per_second": round(self.throughput, 1),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+        }
+
+
+class _StageError:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def buffered(iterable: Iterable, maxsize: int, stats: StageStats = None) -> Iterator:
+    """Run an iterable in a background thread and hand its items over through a bounded queue"""
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        if stats is not None:
+            stats.blocked_seconds += time.perf_counter() - start
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                put(item)
+        except BaseException as e:
+            put(_StageError(e))
+        finally:
+            if stats is not None:
+                stats.finished_at = time.perf_counter()
+            put(_DONE)
+
+    threading.Thread(target=produce, name=f"ingest-{stats.name if stats else 'stage'}", daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        # Consumer stopped early (or failed): let the producer thread exit
+        stop.set()
+
+
+def fetch_stage(urls, stats, **fetch_kwargs):
+    """Yield documents as their pages arrive"""
+    from src.ingetsion.document_loaders import iter_web_documents
+
+    for doc, _ in iter_web_documents(urls, **fetch_kwargs):
+        stats.add()
+        yield doc
+
+
+def split_stage(docs, manifest, seen_sources, stats, split):
+    """
+    Yield (source, hash, chunks, previous chunk ids) for every page whose content changed.
+
+    Unchanged pages are only recorded in seen_sources.
+    """
+    for doc in docs:
+        source = doc.metadata.get("source", "")
+        seen_sources.add(source)
+        doc_hash = incremental.source_hash([doc])
+        previous = manifest["sources"].get(source, {})
+        if previous.get("hash") == doc_hash:
+            continue
+        chunks = incremental.assign_chunk_ids(split([doc]))
+        stats.add(len(chunks))
+        yield source, doc_hash, chunks, previous.get("chunk_ids", [])
+
+
+def index_stage(changes, backend, persist_directory, manifest, stats, batch_size):
+    """Embed and upsert chunks in batches; returns every chunk that was added"""
+    added: List = []
+    batch, delete_ids = [], set()
+
+    def flush():
+        if batch or delete_ids:
+            incremental.apply_changes(backend, persist_directory, list(batch), set(delete_ids))
+            stats.add(len(batch))
+            added.extend(batch)
+            batch.clear()
+            delete_ids.clear()
+            incremental.save_manifest(persist_directory, manifest)
+
+    for source, doc_hash, chunks, previous_ids in changes:
+        previous_ids = set(previous_ids)
+        delete_ids.update(previous_ids - {chunk.id for chunk in chunks})
+        batch.extend(chunk for chunk in chunks if chunk.id not in previous_ids)
+        # The manifest is saved with the batch that contains the source's chunks
+        manifest["sources"][source] = {"hash": doc_hash, "chunk_ids": [chunk.id for chunk in chunks]}
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return added
+
+
+def run_ingestion_pipeline(
+    urls: List[str] = None,
+    backend: str = None,
+    persist_directory: str = None,
+    split=None,
+    batch_size: int = 64,
+    queue_size: int = 16,
+    max_workers: int = 8,
+    remove_missing: bool = True,
+    background_refit: bool = False,
+    **fetch_kwargs,
+):
+    """
+    Stream pages from the web into the vector store.
+
+    Args:
+        urls: URLs to ingest (defaults to the full documentation list)
+        backend: "chroma", "inverted_index" or "hybrid" (defaults like create_vectorstore)
+        persist_directory: Store directory (defaults to the backend's directory)
+        split: Function splitting a list of documents into chunks (defaults to split_texts)
+        batch_size: Chunks embedded and inserted per batch
+        queue_size: Capacity of the queues between stages
+        max_workers: Concurrent page fetches
+        remove_missing: Delete chunks of indexed sources that are no longer in urls
+        background_refit: Refit the vectorizer in the background (True) or before returning.
+            A build into an empty store always refits before returning
+        **fetch_kwargs: Passed to iter_web_documents (per_host_interval, cache_dir, max_age)
+
+    Returns:
+        Dict with per-stage statistics
+    """
+    from src.ingetsion.document_loaders import urls_full
+    from src.ingetsion.retriever import get_backend, DEFAULT_PERSIST_DIRECTORIES
+    from src.ingetsion.vectorizer_refit import check_vocabulary_coverage, refit_and_reindex
+
+    if urls is None:
+        urls = urls_full
+    backend = get_backend(backend)
+    if persist_directory is None:
+        persist_directory = DEFAULT_PERSIST_DIRECTORIES[backend]
+    if split is None:
+        from src.ingetsion.text_splitter import split_texts
+        split = split_texts
+
+    print(f"Streaming {len(urls)} pages into the {backend} store "
+          f"(batch size {batch_size}, queue size {queue_size})...")
+    manifest = incremental.load_manifest(persist_directory)
+    # On an empty store the first batch fixes the vocabulary for the whole build
+    fresh = not manifest["sources"]
+    seen_sources = set()
+    fetch_stats = StageStats("fetch", "pages")
+    split_stats = StageStats("split", "chunks")
+    index_stats = StageStats("index", "chunks")
+
+    docs = buffered(fetch_stage(urls, fetch_stats, max_workers=max_workers, **fetch_kwargs), queue_size, fetch_stats)
+    changes = buffered(split_stage(docs, manifest, seen_sources, split_stats, split), queue_size, split_stats)
+    added = index_stage(changes, backend, persist_directory, manifest, index_stats, batch_size)
+    index_stats.finished_at = time.perf_counter()
+
+    removed_sources = []
+    if remove_missing:
+        expected = set(urls)
+        removed_sources = [source for source in manifest["sources"] if source not in expected]
+        removed_ids = {
+            chunk_id for source in removed_sources for chunk_id in manifest["sources"][source]["chunk_ids"]
+        }
+        for source in removed_sources:
+            del manifest["sources"][source]
+        if removed_ids:
+            incremental.apply_changes(backend, persist_directory, [], removed_ids)
+    manifest["updated_at"] = time.time()
+    incremental.save_manifest(persist_directory, manifest)
+
+    refit = None
+    if added and fresh:
+        # A new store always gets a vectorizer fitted on the whole corpus, not on its first batch
+        print("Refitting the vectorizer on the full corpus...")
+        refit = refit_and_reindex(backend, persist_directory)
+    elif added:
+        from src.ingetsion.retriever import create_embedding
+        embedding = create_embedding(persist_directory)
+        embedding.load_cache()
+        # Refit if the new chunks drifted from the vocabulary of the indexed corpus
+        refit = check_vocabulary_coverage(embedding, added, backend, persist_directory,
+                                          background=background_refit)
+
+    stages = [stats.summary() for stats in (fetch_stats, split_stats, index_stats)]
+    print("\nIngestion summary:")
+    for stage in stages:
+        print(f"   {stage['stage']:>5}: {stage['items']} {stage['unit']} in {stage['seconds']}s "
+              f"({stage['per_second']} {stage['unit']}/s, blocked {stage['blocked_seconds']}s)")
+    print(f"   {len(seen_sources)} pages seen, {len(removed_sources)} removed sources")
+    return {
+        "stages": stages,
+        "pages_seen": len(seen_sources),
+        "removed_sources": len(removed_sources),
+        "refit": refit is not None,
+    }
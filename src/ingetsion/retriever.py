@@ -1,70 +1,244 @@
-from langchain_chroma import Chroma
 import os
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 _vectorstore_cache = None
+# (backend, absolute persist directory) the cached store was opened with
+_vectorstore_key = None
+# Only one thread opens or builds the store (e.g. a warm-up thread and the first query)
+_vectorstore_lock = threading.Lock()
 
-def create_vectorstore(texts=None, persist_directory="./chroma_db", force_reload=False):
+# Available retriever backends: "chroma" (dense HNSW), "inverted_index" (exact sparse TF-IDF)
+# or "hybrid" (the inverted index fused with dense MiniLM embeddings)
+DEFAULT_BACKEND = "chroma"
+DEFAULT_PERSIST_DIRECTORIES = {
+    "chroma": "./chroma_db",
+    "inverted_index": "./tfidf_index",
+    "hybrid": "./hybrid_index",
+}
+
+def get_backend(backend=None):
+    """Resolve the retriever backend from the argument or the VECTORSTORE_BACKEND env var"""
+    backend = backend or os.getenv("VECTORSTORE_BACKEND", DEFAULT_BACKEND)
+    if backend not in DEFAULT_PERSIST_DIRECTORIES:
+        raise ValueError(
+            f"Unknown vector store backend '{backend}'. "
+            f"Choose one of: {', '.join(DEFAULT_PERSIST_DIRECTORIES)}"
+        )
+    return backend
+
+def vectorizer_dir(persist_directory):
+    """Versioned vectorizer artifacts are stored alongside the index"""
+    return os.path.join(persist_directory, "vectorizer")
+
+def create_embedding(persist_directory):
+    """TF-IDF embeddings whose fitted vectorizer is versioned in the store directory"""
+    # Import embedding here to avoid Python 3.13 compatibility issues
+    from src.llms.offline_embeddings import OfflineTfIdfEmbeddings
+    return OfflineTfIdfEmbeddings(max_features=5000, artifact_dir=vectorizer_dir(persist_directory))
+
+def index_version(backend=None, persist_directory=None):
+    """
+    Identifier that changes whenever the stored index changes (None if there is no index).
+
+    Combines the current vectorizer version with the modification times of the
+    ingest manifest and the inverted index manifest, so it is cheap to poll.
+    """
+    from src.ingetsion.incremental import MANIFEST_FILE as INGEST_MANIFEST_FILE
+    from src.ingetsion.index_format import MANIFEST_FILE as INDEX_MANIFEST_FILE
+
+    backend = get_backend(backend)
+    if persist_directory is None:
+        persist_directory = DEFAULT_PERSIST_DIRECTORIES[backend]
+    parts = []
+    try:
+        # offline_embeddings.CURRENT_FILE, read directly to avoid importing sklearn
+        with open(os.path.join(vectorizer_dir(persist_directory), "CURRENT"), encoding="utf-8") as f:
+            parts.append(f.read().strip())
+    except OSError:
+        parts.append("")
+    for name in (INGEST_MANIFEST_FILE, INDEX_MANIFEST_FILE):
+        try:
+            parts.append(str(os.stat(os.path.join(persist_directory, name)).st_mtime_ns))
+        except OSError:
+            parts.append("")
+    return ":".join(parts) if any(parts) else None
+
+def chroma_collection_name(version):
+    """Chroma keeps one collection per vectorizer version; stores without artifacts use the default"""
+    return f"tfidf_{version}" if version else "langchain"
+
+def open_chroma(persist_directory, embedding, version=None):
+    """Open the Chroma collection holding vectors of the given (default: current) vectorizer version"""
+    # Imported lazily so the inverted index backend never pays chromadb's startup cost
+    from langchain_chroma import Chroma
+
+    if version is None:
+        version = embedding.current_version()
+    return Chroma(
+        collection_name=chroma_collection_name(version),
+        persist_directory=persist_directory,
+        embedding_function=embedding
+    )
+
+def tag_vectorizer_version(chunks, embedding):
+    """Record which vectorizer version a chunk's stored vector was computed with"""
+    for chunk in chunks:
+        chunk.metadata["vectorizer_version"] = embedding.version
+    return chunks
+
+def _cache_matches(backend, persist_directory):
+    """Whether the cached store can serve a call; arguments left as None accept any cached store"""
+    if _vectorstore_cache is None or _vectorstore_key is None:
+        return _vectorstore_cache is not None
+    cached_backend, cached_directory = _vectorstore_key
+    if backend is not None and get_backend(backend) != cached_backend:
+        return False
+    return persist_directory is None or os.path.abspath(persist_directory) == cached_directory
+
+def create_vectorstore(texts=None, persist_directory=None, force_reload=False, backend=None):
     """
     Create or load a vector store.
-    
+
     Args:
         texts: Optional list of documents to add. If None and store doesn't exist, will load from URLs.
-        persist_directory: Directory to persist the vector store
+        persist_directory: Directory to persist the vector store. Defaults to the backend's directory.
         force_reload: If True, forces reloading the vector store even if cached
-    
+        backend: "chroma", "inverted_index" or "hybrid". Defaults to the VECTORSTORE_BACKEND env var, then "chroma".
+
+    Without backend and persist_directory the shared store opened last is returned;
+    a backend or directory other than the cached store's opens that store instead.
+
     Returns:
         A retriever instance
     """
-    global _vectorstore_cache
-    
+    global _vectorstore_cache, _vectorstore_key
+
     # Return cached vectorstore if available and not forcing reload
-    if _vectorstore_cache is not None and not force_reload:
+    if not force_reload and _cache_matches(backend, persist_directory):
         return _vectorstore_cache
-    
-    # Import embedding here to avoid Python 3.13 compatibility issues
-    from src.llms.offline_embeddings import OfflineTfIdfEmbeddings
-    
-    # Use offline TF-IDF embeddings (no internet required)
-    embedding = OfflineTfIdfEmbeddings(max_features=5000)
-    
+
+    with _vectorstore_lock:
+        if not force_reload and _cache_matches(backend, persist_directory):
+            return _vectorstore_cache
+
+        backend = get_backend(backend)
+        if persist_directory is None:
+            persist_directory = DEFAULT_PERSIST_DIRECTORIES[backend]
+
+        # Use offline TF-IDF embeddings (no internet required), versioned alongside the index
+        embedding = create_embedding(persist_directory)
+
+        if texts:
+            # Deterministic chunk ids make re-adding the same chunks an upsert, not a duplicate
+            from src.ingetsion.incremental import assign_chunk_ids
+            assign_chunk_ids(texts)
+
+        if backend == "inverted_index":
+            _vectorstore_cache = _create_inverted_index(texts, persist_directory, embedding)
+        elif backend == "hybrid":
+            _vectorstore_cache = _create_hybrid(texts, persist_directory, embedding)
+        else:
+            _vectorstore_cache = _create_chroma(texts, persist_directory, embedding)
+        _vectorstore_key = (backend, os.path.abspath(persist_directory))
+        return _vectorstore_cache
+
+def _load_texts_from_urls():
+    print("Vector store not found. Loading documents from URLs...")
+    from src.ingetsion.text_splitter import split_texts
+    return split_texts()
+
+def _create_inverted_index(texts, persist_directory, embedding):
+    """Build or load the in-process TF-IDF inverted index"""
+    from src.ingetsion.inverted_index import InvertedIndexRetriever, TfidfInvertedIndex
+    from src.ingetsion.vectorizer_refit import check_vocabulary_coverage
+
+    if TfidfInvertedIndex.exists(persist_directory) and texts is None:
+        print("Loading existing inverted index...")
+        index = TfidfInvertedIndex.load(persist_directory)
+        print(f"Loaded inverted index with {len(index)} documents")
+        return InvertedIndexRetriever(index=index)
+
+    if TfidfInvertedIndex.exists(persist_directory):
+        existing = TfidfInvertedIndex.load(persist_directory)
+        print(f"Adding {len(texts)} new documents to inverted index with {len(existing)} documents...")
+        embedding.load_cache()
+        if embedding.version == existing.vectorizer_version:
+            # Only the new chunks are embedded, with the index's own vectorizer version
+            index = existing.update(embedding, texts, delete_ids={doc.id for doc in texts})
+            index.save(persist_directory)
+            print(f"Inverted index now has {len(index)} documents")
+            check_vocabulary_coverage(embedding, texts, "inverted_index", persist_directory)
+            return InvertedIndexRetriever(index=index)
+        # No matching vectorizer artifact (older index): fit once on the whole corpus
+        new_ids = {doc.id for doc in texts}
+        texts = [doc for doc in existing.documents if doc.metadata.get("chunk_id") not in new_ids] + list(texts)
+    elif texts is None:
+        texts = _load_texts_from_urls()
+
+    print(f"Creating inverted index with {len(texts)} documents...")
+    # Corpus-wide fit, saved as a new vectorizer version
+    embedding.fit([doc.page_content for doc in texts])
+    index = TfidfInvertedIndex.build(texts, embedding)
+    index.save(persist_directory)
+    print(f"Created inverted index with {len(index)} documents (vectorizer {embedding.version})")
+    return InvertedIndexRetriever(index=index)
+
+def _create_hybrid(texts, persist_directory, embedding):
+    """Build or load the inverted index, then bring its dense index up to date"""
+    from src.ingetsion.hybrid_retriever import DenseIndex, HybridRetriever
+    from src.llms.registry import get_dense_embedding
+
+    sparse = _create_inverted_index(texts, persist_directory, embedding)
+    dense = DenseIndex.sync(persist_directory, sparse.index.documents, get_dense_embedding())
+    print(f"Dense index has {len(dense)} documents")
+    return HybridRetriever(index=sparse.index, dense=dense)
+
+def _create_chroma(texts, persist_directory, embedding):
+    """Build or load the persistent Chroma collection"""
+    from langchain_chroma import Chroma
+    from src.ingetsion.vectorizer_refit import check_vocabulary_coverage
+
     # Check if persistent vector store already exists
     if os.path.exists(persist_directory):
         print("Loading existing vector store...")
-        vectorstore = Chroma(
-            persist_directory=persist_directory,
-            embedding_function=embedding
-        )
+        fitted = embedding.load_cache()
+        vectorstore = open_chroma(persist_directory, embedding)
+        if not fitted and vectorstore._collection.count():
+            # Store built before versioned vectorizer artifacts: fit one on its stored chunks
+            from src.ingetsion.vectorizer_refit import refit_and_reindex
+            refit_and_reindex("chroma", persist_directory)
+            embedding.load_cache()
+            vectorstore = open_chroma(persist_directory, embedding)
         existing_count = vectorstore._collection.count()
         print(f"Loaded vector store with {existing_count} documents")
-        
+
         # Only add new documents if explicitly provided
         if texts is not None and len(texts) > 0:
             print(f"Adding {len(texts)} new documents to vector store...")
-            vectorstore.add_documents(texts)
+            vectorstore.add_documents(tag_vectorizer_version(texts, embedding))
             new_count = vectorstore._collection.count()
             print(f"Vector store now has {new_count} documents (added {new_count - existing_count} new documents)")
-        
-        _vectorstore_cache = vectorstore.as_retriever()
-        return _vectorstore_cache
-    
+            check_vocabulary_coverage(embedding, texts, "chroma", persist_directory)
+
+        return vectorstore.as_retriever()
+
     # If vector store doesn't exist and no texts provided, load from URLs
     if texts is None:
-        print("Vector store not found. Loading documents from URLs...")
-        from src.ingetsion.text_splitter import split_texts
-        texts = split_texts()
-    
+        from src.ingetsion.incremental import assign_chunk_ids
+        texts = assign_chunk_ids(_load_texts_from_urls())
+
     print(f"Creating new vector store with {len(texts)} documents...")
+    # Corpus-wide fit, saved as a new vectorizer version
+    embedding.fit([doc.page_content for doc in texts])
     vectorstore = Chroma.from_documents(
-        documents=texts,
+        documents=tag_vectorizer_version(texts, embedding),
         embedding=embedding,
+        collection_name=chroma_collection_name(embedding.version),
         persist_directory=persist_directory
     )
-    print(f"Created vector store with {len(texts)} documents")
-    _vectorstore_cache = vectorstore.as_retriever()
-    return _vectorstore_cache
-
-    
\ No newline at end of file
+    print(f"Created vector store with {len(texts)} documents (vectorizer {embedding.version})")
+    return vectorstore.as_retriever()
@@ -1,13 +1,34 @@
+import asyncio
+from functools import partial
+from typing import Optional
+from langchain_core.retrievers import BaseRetriever
 from langchain_classic.tools.retriever import create_retriever_tool
 from src.ingetsion.retriever import create_vectorstore
 
-def get_retriever_tool():
+class LazyVectorstoreRetriever(BaseRetriever):
+    """Opens the vector store on the first query instead of when the graph is built"""
+    backend: Optional[str] = None
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        # create_vectorstore caches the opened store, so only the first query pays for it
+        return create_vectorstore(backend=self.backend).invoke(query)
+
+    async def _aget_relevant_documents(self, query, *, run_manager):
+        # Opening the store blocks, so it happens off the event loop; the query itself is awaited
+        loop = asyncio.get_running_loop()
+        store = await loop.run_in_executor(None, partial(create_vectorstore, backend=self.backend))
+        return await store.ainvoke(query)
+
+def get_retriever_tool(lazy=True, retriever=None):
     try:
-        retriever = create_vectorstore()
+        if retriever is None:
+            retriever = LazyVectorstoreRetriever() if lazy else create_vectorstore()
         retriever_tool = create_retriever_tool(
             retriever=retriever,
             name="document_retriever",
             description="Search for information about LangChain and LangGraph from documentation.",
+            # The ToolMessage carries the documents themselves so they can be graded one by one
+            response_format="content_and_artifact",
         )
         return retriever_tool
     except Exception as e:
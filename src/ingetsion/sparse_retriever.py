@@ -0,0 +1,92 @@
+"""
+Sparse TF-IDF retriever
+Keeps the corpus as a CSR matrix and scores queries with a sparse dot product,
+so no dense 5000-float vectors are ever materialized.
+"""
+
+from typing import Any, List, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+def with_score(doc: Document, score: float) -> Document:
+    """Copy of doc whose metadata carries its retrieval score (read by the pre-grader)"""
+    return Document(id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "score": score})
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    # Stable sort so ties keep corpus order
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def top_k_per_row(scores, k: int) -> List[List[Tuple[int, float]]]:
+    """(column, score) of the k highest positive scores in each row of a sparse CSR matrix"""
+    scores = scores.tocsr()
+    # Ascending columns within a row keep ties in corpus order
+    scores.sort_indices()
+    rows = []
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        row_scores, columns = scores.data[start:end], scores.indices[start:end]
+        rows.append([
+            (int(columns[i]), float(row_scores[i]))
+            for i in top_k_indices(row_scores, k)
+            if row_scores[i] > 0
+        ])
+    return rows
+
+
+class SparseTfidfRetriever(BaseRetriever):
+    """Retriever over TF-IDF vectors stored as a sparse CSR matrix"""
+
+    embedding: Any
+    documents: List[Document]
+    doc_matrix: Any
+    k: int = 4
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], embedding, k: int = 4):
+        """Embed the documents sparsely and build a retriever over them"""
+        texts = [doc.page_content for doc in documents]
+        doc_matrix = embedding.embed_documents_sparse(texts)
+        return cls(embedding=embedding, documents=documents, doc_matrix=doc_matrix, k=k)
+
+    def similarity_search_with_score(self, query: str, k: int = None) -> List[Tuple[Document, float]]:
+        """
+        Return the top-k documents with their cosine similarity to the query.
+
+        Documents sharing no term with the query are left out, as in similarity_search_batch.
+        """
+        k = self.k if k is None else k
+        query_vector = self.embedding.embed_query_sparse(query)
+        # Rows are L2-normalized, so the dot product is the cosine similarity
+        scores = (self.doc_matrix @ query_vector.T).toarray().ravel()
+        return [(self.documents[i], float(scores[i])) for i in top_k_indices(scores, k) if scores[i] > 0]
+
+    def similarity_search_batch(self, queries: List[str], k: int = None) -> List[List[Tuple[Document, float]]]:
+        """
+        Top-k documents for each query: one vectorizer transform and one sparse product.
+
+        Documents sharing no term with a query are left out rather than padded with zero scores.
+        """
+        k = self.k if k is None else k
+        if not queries:
+            return []
+        scores = self.embedding.embed_queries_sparse(queries) @ self.doc_matrix.T
+        return [[(self.documents[i], score) for i, score in row] for row in top_k_per_row(scores, k)]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [with_score(doc, score) for doc, score in self.similarity_search_with_score(query)]
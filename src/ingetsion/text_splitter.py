@@ -1,16 +1,201 @@
 
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from src.ingetsion.document_loaders import load_web_documents, urls
 
-def split_texts(docs=None, use_minimal_url_set=False):
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+ENCODING_NAME = "gpt2"  # Same default as from_tiktoken_encoder
+# Below this many documents a process pool costs more than it saves
+PARALLEL_MIN_DOCS = 32
+
+# Break levels at a cut point, strongest first: paragraph, line, word
+_PARAGRAPH, _LINE, _WORD = 3, 2, 1
+
+
+def get_splitter_mode(mode=None):
+    """Resolve the splitter mode: "recursive" (default) or "token" (TEXT_SPLITTER_MODE env var)"""
+    mode = mode or os.getenv("TEXT_SPLITTER_MODE", "recursive")
+    if mode not in ("recursive", "token"):
+        raise ValueError(f"Unknown text splitter mode: {mode}")
+    return mode
+
+
+@lru_cache(maxsize=None)
+def get_encoder(encoding_name=ENCODING_NAME):
+    """tiktoken encoder shared by every split in this process"""
+    import tiktoken
+    return tiktoken.get_encoding(encoding_name)
+
+
+@lru_cache(maxsize=None)
+def _recursive_splitter(chunk_size, chunk_overlap):
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+
+
+# Offset tables by encoding name; built once and handed to the worker processes
+_char_tables = {}
+
+
+def _token_char_tables(encoder):
+    """Per token id: characters it starts, and whether it begins inside a UTF-8 character"""
+    tables = _char_tables.get(encoder.name)
+    if tables is None:
+        tables = _char_tables[encoder.name] = _build_token_char_tables(encoder)
+    return tables
+
+
+def _build_token_char_tables(encoder):
+    # Walks the whole vocabulary in Python, so it should run once per process tree
+    char_counts = np.zeros(encoder.n_vocab, dtype=np.int64)
+    continues = np.zeros(encoder.n_vocab, dtype=np.int64)
+    for token in range(encoder.n_vocab):
+        try:
+            token_bytes = encoder.decode_single_token_bytes(token)
+        except KeyError:
+            continue
+        char_counts[token] = sum(1 for c in token_bytes if not 0x80 <= c < 0xC0)
+        continues[token] = bool(token_bytes) and 0x80 <= token_bytes[0] < 0xC0
+    return char_counts, continues
+
+
+def token_offsets(encoder, tokens):
+    """Character offset of every token in the decoded text (same as decode_with_offsets)"""
+    char_counts, continues = _token_char_tables(encoder)
+    tokens = np.asarray(tokens, dtype=np.int64)
+    ends = np.cumsum(char_counts[tokens])
+    return np.maximum(0, ends - char_counts[tokens] - continues[tokens])
+
+
+def _break_levels(text, offsets):
+    """Break level of a cut just before each offset"""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    # Pad so offsets - 2 .. offsets + 1 are always valid
+    newline = np.concatenate(([False, False], codes == 10, [False, False]))
+    space = np.concatenate(([False, False], (codes == 32) | (codes == 9), [False, False]))
+    at = offsets + 2
+    levels = np.zeros(len(offsets), dtype=np.int8)
+    levels[space[at] | space[at - 1]] = _WORD
+    levels[newline[at] | newline[at - 1]] = _LINE
+    levels[(newline[at] & newline[at + 1]) | (newline[at - 1] & newline[at - 2])] = _PARAGRAPH
+    return levels
+
+
+def token_windows(text, encoder, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Split text into (start_index, chunk) pairs of at most chunk_size tokens.
+
+    The text is tokenized once; chunks are cut on token offsets, preferring the
+    last paragraph, line or word break in the second half of the window, and
+    consecutive chunks share about chunk_overlap tokens.
+    """
+    tokens = encoder.encode_ordinary(text)
+    if not tokens:
+        return []
+    text = encoder.decode(tokens)
+    n_tokens = len(tokens)
+    offsets = np.append(token_offsets(encoder, tokens), len(text))
+    levels = _break_levels(text, offsets)
+
+    chunks = []
+    start = 0
+    while start < n_tokens:
+        end = min(start + chunk_size, n_tokens)
+        if end < n_tokens:
+            # Back off to the last of the strongest break points that keep the chunk at least half full
+            lowest = start + chunk_size // 2 + 1
+            if lowest <= end:
+                window = levels[lowest:end + 1]
+                strongest = window.max()
+                if strongest:
+                    end = lowest + int(np.flatnonzero(window == strongest)[-1])
+        chunk = text[offsets[start]:offsets[end]]
+        stripped = chunk.lstrip()
+        if stripped.strip():
+            chunks.append((int(offsets[start]) + len(chunk) - len(stripped), stripped.rstrip()))
+        if end >= n_tokens:
+            break
+        start = max(end - chunk_overlap, start + 1)
+        # Start the overlap on a word boundary when there is one nearby
+        breaks = np.flatnonzero(levels[start:end])
+        if len(breaks):
+            start += int(breaks[0])
+    return chunks
+
+
+def _split_documents_by_tokens(docs, encoder, chunk_size, chunk_overlap):
+    splits = []
+    for doc in docs:
+        for start_index, chunk in token_windows(doc.page_content, encoder, chunk_size, chunk_overlap):
+            metadata = dict(doc.metadata)
+            metadata["start_index"] = start_index
+            splits.append(Document(page_content=chunk, metadata=metadata))
+    return splits
+
+
+_worker_encoder = None
+
+
+def _init_worker(encoding, tables):
+    # The offset tables come from the parent instead of being rebuilt in every worker
+    global _worker_encoder
+    _worker_encoder = get_encoder(encoding) if isinstance(encoding, str) else encoding
+    _char_tables[_worker_encoder.name] = tables
+
+
+def _split_batch(docs, chunk_size, chunk_overlap):
+    return _split_documents_by_tokens(docs, _worker_encoder, chunk_size, chunk_overlap)
+
+
+def split_texts(docs=None, use_minimal_url_set=False, mode=None, workers=None,
+                chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, encoding=ENCODING_NAME):
+    """
+    Split documents into ~chunk_size-token chunks.
+
+    Args:
+        docs: Documents to split (loads the full URL list if None)
+        mode: "recursive" (RecursiveCharacterTextSplitter) or "token" (tokenize once,
+            cut on token offsets); defaults to the TEXT_SPLITTER_MODE env var
+        workers: Worker processes for token mode (None = one per CPU for large corpora,
+            1 = serial); chunks come out identical and in the same order either way
+        encoding: tiktoken encoding name or Encoding object used in token mode
+    """
     if docs is None:
         # Load documents from the comprehensive URL list
         docs = load_web_documents(urls)
-    
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=1000,
-        chunk_overlap=200,
-    )
-    docs_splits =  text_splitter.split_documents(docs)
-    return docs_splits
 
+    if get_splitter_mode(mode) == "recursive":
+        return _recursive_splitter(chunk_size, chunk_overlap).split_documents(docs)
+
+    docs = list(docs)
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(docs) >= PARALLEL_MIN_DOCS else 1
+    workers = min(workers, len(docs))
+    encoder = get_encoder(encoding) if isinstance(encoding, str) else encoding
+    if workers <= 1:
+        return _split_documents_by_tokens(docs, encoder, chunk_size, chunk_overlap)
+
+    # Contiguous batches keep the output in document order
+    batch_size = -(-len(docs) // (workers * 4))
+    batches = [docs[i:i + batch_size] for i in range(0, len(docs), batch_size)]
+    docs_splits = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(encoding, _token_char_tables(encoder))) as executor:
+        for splits in executor.map(
+            _split_batch,
+            batches,
+            [chunk_size] * len(batches),
+            [chunk_overlap] * len(batches),
+        ):
+            docs_splits.extend(splits)
+    return docs_splits
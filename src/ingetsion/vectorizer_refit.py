@@ -0,0 +1,163 @@
+"""
+Refit the TF-IDF vectorizer and re-embed the stored chunks
+
+New batches are embedded with the current vectorizer version, which keeps
+updates cheap but drops terms the vocabulary has never seen. When a batch's
+vocabulary coverage falls well below what the vectorizer had on its own
+corpus, a refit on the full stored corpus is scheduled in the background.
+The new version only becomes current once every chunk has been re-embedded,
+so queries never mix vectors from two vocabularies.
+
+The background refit runs on a daemon thread. At interpreter exit it is asked
+to stop at its next safe point (before the index files are swapped, or between
+Chroma batches) and joined, so shutdown neither waits for a full re-embedding
+nor leaves a half-written index behind.
+"""
+
+import atexit
+import threading
+
+# Batch coverage this far below the fit-time baseline triggers a refit
+COVERAGE_TOLERANCE = 0.1
+# Chunks re-embedded per Chroma insert during a refit
+REINDEX_BATCH_SIZE = 256
+
+# Serializes index writers in this process (incremental updates and refits)
+index_write_lock = threading.Lock()
+_refit_thread = None
+# Set at interpreter exit: a running refit gives up before its next write
+_stop_refit = threading.Event()
+
+
+def _cancelled(old_version):
+    if _stop_refit.is_set():
+        print(f"Refit cancelled at shutdown; vectorizer {old_version} stays current")
+        return True
+    return False
+
+
+def refit_and_reindex(backend=None, persist_directory=None):
+    """
+    Fit a new vectorizer version on every stored chunk and re-embed them.
+
+    Returns:
+        The new current version (unchanged if the refit produced the same vocabulary)
+    """
+    from src.ingetsion.retriever import get_backend, DEFAULT_PERSIST_DIRECTORIES, create_embedding
+
+    backend = get_backend(backend)
+    if persist_directory is None:
+        persist_directory = DEFAULT_PERSIST_DIRECTORIES[backend]
+
+    with index_write_lock:
+        embedding = create_embedding(persist_directory)
+        # Dense vectors do not depend on the TF-IDF vocabulary, so hybrid refits only the inverted index
+        if backend in ("inverted_index", "hybrid"):
+            return _refit_inverted_index(persist_directory, embedding)
+        return _refit_chroma(persist_directory, embedding)
+
+
+def _refit_inverted_index(persist_directory, embedding):
+    from src.ingetsion.inverted_index import TfidfInvertedIndex
+
+    documents = list(TfidfInvertedIndex.load(persist_directory).documents)
+    old_version = embedding.current_version()
+    version = embedding.fit([doc.page_content for doc in documents], make_current=False)
+    if version == old_version or _cancelled(old_version):
+        return old_version
+    print(f"Re-embedding {len(documents)} chunks with vectorizer {version}...")
+    index = TfidfInvertedIndex.build(documents, embedding)
+    if _cancelled(old_version):
+        return old_version
+    # The index carries its own vocabulary and IDF, so swapping its files is the switch-over
+    index.save(persist_directory)
+    embedding.activate()
+    print(f"Vectorizer {version} is now current (was {old_version})")
+    return version
+
+
+def _refit_chroma(persist_directory, embedding):
+    from langchain_core.documents import Document
+    from src.ingetsion.retriever import open_chroma, tag_vectorizer_version
+
+    embedding.load_cache()
+    old_version = embedding.current_version()
+    stored = open_chroma(persist_directory, embedding).get(include=["documents", "metadatas"])
+    documents = [
+        Document(id=chunk_id, page_content=text, metadata=metadata or {})
+        for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+    ]
+    version = embedding.fit([doc.page_content for doc in documents], make_current=False)
+    if version == old_version:
+        return version
+
+    print(f"Re-embedding {len(documents)} chunks with vectorizer {version}...")
+    # Vectors of the new version go into their own collection; readers keep using
+    # the old one until CURRENT flips
+    vectorstore = open_chroma(persist_directory, embedding, version=version)
+    tag_vectorizer_version(documents, embedding)
+    for start in range(0, len(documents), REINDEX_BATCH_SIZE):
+        # The half-filled collection of an abandoned version is never made current
+        if _cancelled(old_version):
+            return old_version
+        vectorstore.add_documents(documents[start:start + REINDEX_BATCH_SIZE])
+    embedding.activate()
+    print(f"Vectorizer {version} is now current (was {old_version})")
+    _drop_stale_collections(persist_directory, keep={version, old_version})
+    return version
+
+
+def _drop_stale_collections(persist_directory, keep):
+    """Delete collections older than the previous version (running processes may still use it)"""
+    import chromadb
+    from src.ingetsion.retriever import chroma_collection_name
+
+    keep_names = {chroma_collection_name(version) for version in keep}
+    client = chromadb.PersistentClient(path=persist_directory)
+    for collection in client.list_collections():
+        name = getattr(collection, "name", collection)
+        if name.startswith("tfidf_") and name not in keep_names:
+            client.delete_collection(name)
+
+
+def start_background_refit(backend=None, persist_directory=None):
+    """Run refit_and_reindex in a background thread unless one is already running"""
+    global _refit_thread
+    if _refit_thread is not None and _refit_thread.is_alive():
+        return _refit_thread
+    _refit_thread = threading.Thread(
+        target=refit_and_reindex,
+        args=(backend, persist_directory),
+        name="tfidf-refit",
+        daemon=True,
+    )
+    _refit_thread.start()
+    return _refit_thread
+
+
+@atexit.register
+def _stop_background_refit():
+    """Let a running refit reach its next safe point, then wait for it"""
+    _stop_refit.set()
+    if _refit_thread is not None and _refit_thread.is_alive():
+        print("Waiting for the background vectorizer refit to stop...")
+        _refit_thread.join()
+
+
+def check_vocabulary_coverage(embedding, chunks, backend, persist_directory,
+                              tolerance=COVERAGE_TOLERANCE, background=True):
+    """
+    Schedule a refit when a new batch is poorly covered by the current vocabulary.
+
+    Returns:
+        The refit thread (background=True), the new version (background=False), or None
+    """
+    texts = [chunk.page_content for chunk in chunks]
+    if not embedding.needs_refit(texts, tolerance=tolerance):
+        return None
+    baseline = embedding.artifact_info.get("baseline_coverage", 0)
+    print(f"Vocabulary coverage of new chunks dropped to {embedding.coverage(texts):.0%} "
+          f"(fit corpus: {baseline:.0%}); refitting vectorizer...")
+    if background:
+        return start_background_refit(backend, persist_directory)
+    return refit_and_reindex(backend, persist_directory)
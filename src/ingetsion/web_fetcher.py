@@ -0,0 +1,237 @@
+"""
+Concurrent web fetcher with per-host rate limiting and an on-disk HTTP cache
+Cached pages are revalidated with ETag / Last-Modified, so an unchanged page
+costs a 304 (or no request at all while it is younger than max_age). When the
+server cannot be reached, the cached copy is served stale with a warning.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CACHE_DIR = "./.http_cache"
+
+DEFAULT_REQUESTS_KWARGS = {
+    "verify": False,  # Disable SSL verification for corporate networks
+    "timeout": 30,
+    "headers": {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+    },
+}
+
+
+@dataclass
+class FetchResult:
+    """Outcome of fetching one URL"""
+    url: str
+    html: Optional[str] = None
+    status: Optional[int] = None
+    from_cache: bool = False
+    # Served from the cache because the server could not be reached
+    stale: bool = False
+    error: Optional[str] = None
+
+
+class HttpCache:
+    """On-disk cache of response bodies plus their validators (ETag / Last-Modified)"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + ".json", base + ".body"
+
+    def get(self, url: str) -> Optional[dict]:
+        """Return the cached entry (with its body as text) or None"""
+        meta_path, body_path = self._paths(url)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                entry = json.load(f)
+            with open(body_path, "rb") as f:
+                entry["html"] = f.read().decode(entry.get("encoding") or "utf-8", errors="replace")
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, url: str, body: bytes, encoding: str, etag: str = None, last_modified: str = None):
+        meta_path, body_path = self._paths(url)
+        # Body first, metadata last: a reader never sees metadata without its body
+        self._write(body_path, body)
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "encoding": encoding,
+            "fetched_at": time.time(),
+        }
+        self._write(meta_path, json.dumps(entry).encode("utf-8"))
+
+    def touch(self, url: str):
+        """Mark a cached entry as freshly validated (after a 304)"""
+        meta_path, _ = self._paths(url)
+        with open(meta_path, encoding="utf-8") as f:
+            entry = json.load(f)
+        entry["fetched_at"] = time.time()
+        self._write(meta_path, json.dumps(entry).encode("utf-8"))
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class HostRateLimiter:
+    """Spaces out request starts to the same host by at least min_interval seconds"""
+
+    def __init__(self, min_interval: float = 0.25):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url: str):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def create_session(max_workers: int) -> requests.Session:
+    """Session with a connection pool large enough for every worker"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_url(url, session, cache=None, rate_limiter=None, max_age=None, requests_kwargs=None) -> FetchResult:
+    """
+    Fetch one URL through the cache.
+
+    Args:
+        max_age: Seconds a cached page is served without contacting the server.
+            None always revalidates with a conditional request.
+    """
+    requests_kwargs = dict(DEFAULT_REQUESTS_KWARGS if requests_kwargs is None else requests_kwargs)
+    headers = dict(requests_kwargs.pop("headers", {}) or {})
+
+    cached = cache.get(url) if cache is not None else None
+    if cached is not None:
+        if max_age is not None and time.time() - cached["fetched_at"] < max_age:
+            return FetchResult(url, html=cached["html"], status=200, from_cache=True)
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        if rate_limiter is not None:
+            rate_limiter.wait(url)
+        response = session.get(url, headers=headers, **requests_kwargs)
+        if response.status_code == 304 and cached is not None:
+            cache.touch(url)
+            return FetchResult(url, html=cached["html"], status=304, from_cache=True)
+        response.raise_for_status()
+        # Same encoding detection as WebBaseLoader(autoset_encoding=True)
+        response.encoding = response.apparent_encoding
+        encoding = response.encoding or "utf-8"
+        if cache is not None:
+            cache.put(
+                url,
+                response.content,
+                encoding,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        return FetchResult(url, html=response.text, status=response.status_code)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if cached is None:
+            return FetchResult(url, error=str(e))
+        print(f"Warning: {url} unreachable ({type(e).__name__}), serving the cached copy")
+        return FetchResult(url, html=cached["html"], from_cache=True, stale=True)
+    except Exception as e:
+        return FetchResult(url, error=str(e))
+
+
+def fetch_urls(
+    urls: List[str],
+    max_workers: int = 8,
+    per_host_interval: float = 0.25,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    max_age: Optional[float] = None,
+    requests_kwargs: Optional[dict] = None,
+    on_result=None,
+) -> List[FetchResult]:
+    """
+    Fetch URLs concurrently with a bounded worker pool.
+
+    Args:
+        urls: URLs to fetch
+        max_workers: Size of the worker pool
+        per_host_interval: Minimum seconds between request starts to the same host
+        cache_dir: Directory for the HTTP cache, or None to disable caching
+        max_age: Seconds a cached page is trusted without revalidation (None = always revalidate)
+        requests_kwargs: Extra arguments for requests (defaults to DEFAULT_REQUESTS_KWARGS)
+        on_result: Optional callback called with each FetchResult as it completes
+
+    Returns:
+        FetchResults in the same order as urls
+    """
+    cache = HttpCache(cache_dir) if cache_dir else None
+    rate_limiter = HostRateLimiter(per_host_interval)
+    session = create_session(max_workers)
+
+    def fetch(url):
+        result = fetch_url(url, session, cache, rate_limiter, max_age, requests_kwargs)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(fetch, urls))
+    finally:
+        session.close()
+
+
+def iter_fetch_urls(
+    urls: List[str],
+    max_workers: int = 8,
+    per_host_interval: float = 0.25,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    max_age: Optional[float] = None,
+    requests_kwargs: Optional[dict] = None,
+):
+    """Like fetch_urls, but yields FetchResults as soon as each one completes"""
+    cache = HttpCache(cache_dir) if cache_dir else None
+    rate_limiter = HostRateLimiter(per_host_interval)
+    session = create_session(max_workers)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(fetch_url, url, session, cache, rate_limiter, max_age, requests_kwargs)
+                for url in urls
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+    finally:
+        session.close()
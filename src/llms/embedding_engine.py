@@ -0,0 +1,219 @@
+"""
+Batched, cached CPU embedding engine for sentence-transformers models
+
+Rebuilding the dense index used to re-embed every chunk at the model's
+default batch size. The engine changes three things:
+
+1. a persistent cache maps the SHA-1 of a text to its vector, so a rebuild
+   only embeds texts the model has never seen. Vectors are stored as float16
+   (EMBEDDING_CACHE_DTYPE) in append-only .npy shards, one directory per model
+2. texts are sorted by length and cut into batches of similar length, each
+   holding at most EMBEDDING_BATCH_TOKENS padded tokens and EMBEDDING_MAX_BATCH
+   texts, so short chunks are not padded to the length of long ones
+3. EMBEDDING_THREADS sets the number of torch CPU threads
+
+Token counts are estimated at four characters per token, capped at the model's
+max_seq_length where the rest is truncated anyway.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import uuid
+from typing import Dict, Iterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "8192"))
+MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+# 0 keeps torch's default (one thread per core)
+THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+# Once there are this many shards, the next flush merges them all into one
+MAX_SHARDS = 16
+
+_SHARD_RE = re.compile(r"^(shard-[0-9a-f]+)\.keys\.npy$")
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def set_threads(threads: int):
+    """Set the number of torch CPU threads (0 leaves the default)"""
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+
+
+class EmbeddingCache:
+    """
+    Text hash -> vector store of one model, persisted as append-only shards
+
+    Every flush writes a shard under a new random name, so processes sharing
+    the directory never overwrite each other's shards.
+    """
+
+    def __init__(self, directory: str, dtype: str = CACHE_DTYPE):
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"Unsupported embedding cache dtype '{dtype}', use float16 or float32")
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self._rows: Dict[bytes, np.ndarray] = {}
+        self._pending: Dict[bytes, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _shards(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(match.group(1) for match in map(_SHARD_RE.match, os.listdir(self.directory)) if match)
+
+    def _shard_path(self, name: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{name}.{kind}.npy")
+
+    def _read_shard(self, name: str) -> Dict[bytes, np.ndarray]:
+        try:
+            keys = np.load(self._shard_path(name, "keys"))
+            # Read fully rather than mapped, so compaction can delete the old shard files
+            vectors = np.load(self._shard_path(name, "vectors"))
+        except (OSError, ValueError):
+            return {}
+        # A shard whose write was interrupted has mismatched arrays
+        if len(keys) != len(vectors):
+            return {}
+        return dict(zip((row.tobytes() for row in keys), vectors))
+
+    def _load(self):
+        for name in self._shards():
+            self._rows.update(self._read_shard(name))
+
+    def get(self, key: bytes):
+        return self._rows.get(key)
+
+    def put(self, key: bytes, vector: np.ndarray):
+        vector = np.asarray(vector, dtype=self.dtype)
+        with self._lock:
+            self._rows[key] = vector
+            self._pending[key] = vector
+
+    def flush(self):
+        """Write vectors added since the last flush as a new shard (or compact all shards)"""
+        from src.ingetsion.index_format import _save_array
+
+        with self._lock:
+            if not self._pending:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            shards = self._shards()
+            if len(shards) >= MAX_SHARDS:
+                # Compact: one shard with every vector replaces the old ones, including
+                # shards other processes wrote after this cache was loaded
+                for old in shards:
+                    self._rows.update(self._read_shard(old))
+                merged = self._rows
+            else:
+                merged = self._pending
+            # (n x 20) bytes: a numpy "S20" string would drop a digest's trailing zero bytes
+            keys = np.frombuffer(b"".join(merged), dtype=np.uint8).reshape(len(merged), -1)
+            vectors = np.vstack(list(merged.values())).astype(self.dtype)
+            name = f"shard-{uuid.uuid4().hex}"
+            # Keys are written last, so a shard without them is ignored
+            _save_array(self.directory, f"{name}.vectors", vectors)
+            _save_array(self.directory, f"{name}.keys", keys)
+            if merged is self._rows:
+                for old in shards:
+                    for kind in ("keys", "vectors"):
+                        # Another process may have compacted the same shard already
+                        try:
+                            os.remove(self._shard_path(old, kind))
+                        except FileNotFoundError:
+                            pass
+            self._pending = {}
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    Embeddings over a sentence-transformers style model (anything with encode())
+
+    Document embeddings go through the cache and length-bucketed batches;
+    query embeddings are computed directly.
+    """
+
+    def __init__(self, model, model_name: str, cache_dir: str = CACHE_DIR, dtype: str = CACHE_DTYPE,
+                 batch_tokens: int = BATCH_TOKENS, max_batch: int = MAX_BATCH):
+        self.model = model
+        self.model_name = model_name
+        self.batch_tokens = batch_tokens
+        self.max_batch = max_batch
+        self.max_tokens = getattr(model, "max_seq_length", None) or 512
+        self.cache = None
+        if cache_dir:
+            self.cache = EmbeddingCache(os.path.join(cache_dir, re.sub(r"[^\w.-]+", "_", model_name)), dtype)
+        self.stats = {"texts": 0, "cache_hits": 0, "embedded": 0, "batches": 0}
+
+    def estimate_tokens(self, text: str) -> int:
+        return min(self.max_tokens, max(1, len(text) // 4))
+
+    def batches(self, texts: List[str]) -> Iterator[List[int]]:
+        """Indices of texts in batches of similar length, longest first"""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batch = []
+        for i in order:
+            # The first text of a batch is its longest, so it sets the padded length
+            padded = self.estimate_tokens(texts[batch[0]]) if batch else self.estimate_tokens(texts[i])
+            if batch and (len(batch) >= self.max_batch or (len(batch) + 1) * padded > self.batch_tokens):
+                yield batch
+                batch = []
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(texts, batch_size=len(texts), normalize_embeddings=True,
+                              convert_to_numpy=True, show_progress_bar=False),
+            dtype=np.float32,
+        )
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """(texts x dimension) float32 embeddings, embedding only texts missing from the cache"""
+        keys = [text_key(text) for text in texts]
+        vectors: Dict[bytes, np.ndarray] = {}
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                # Duplicate texts are embedded once
+                missing.setdefault(key, text)
+
+        missing_keys, missing_texts = list(missing), list(missing.values())
+        for batch in self.batches(missing_texts):
+            for i, vector in zip(batch, self._encode([missing_texts[i] for i in batch])):
+                vectors[missing_keys[i]] = vector
+                if self.cache is not None:
+                    self.cache.put(missing_keys[i], vector)
+            self.stats["batches"] += 1
+        if self.cache is not None:
+            self.cache.flush()
+
+        self.stats["texts"] += len(texts)
+        self.stats["embedded"] += len(missing)
+        self.stats["cache_hits"] += len(texts) - sum(1 for key in keys if key in missing)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack([vectors[key] for key in keys]).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
@@ -0,0 +1,258 @@
+"""
+Deterministic local chat model for offline runs, load tests and profiling
+
+Stands in for Gemini without network or an API key (LLM_PROVIDER=fake):
+
+- with tools bound it calls the first tool with the user's question, and
+  answers in text once a tool result is in the conversation
+- structured output (GradeDocuments, ChunkGrades) grades a document relevant
+  when it shares a content word with the question
+- answers repeat the context sentences that best match the question
+- invoke, ainvoke, stream and astream all work; streaming yields one chunk per word
+
+The same prompt always gets the same response. Latency is injected per call
+(FAKE_LLM_LATENCY_MS, plus or minus up to FAKE_LLM_JITTER_MS drawn from a
+seeded generator) and per generated token (FAKE_LLM_TOKEN_MS), so the graph
+can be driven with realistic delay profiles. Token counts are reported in
+usage_metadata, counting words and punctuation as tokens. Each model counts
+its calls and the most calls it had running at once (calls, max_in_flight).
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from src.llms.tokens import count_tokens
+
+_WORD = re.compile(r"\w+")
+_PIECE = re.compile(r"\S+\s*|\s+")
+_STOPWORDS = {
+    "what", "which", "when", "where", "does", "with", "from", "that", "this", "there",
+    "their", "about", "into", "your", "have", "explain", "tell", "work", "works",
+}
+MAX_ANSWER_SENTENCES = 3
+
+
+def _text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+def _terms(text: str) -> set:
+    return {w for w in _WORD.findall(text.lower()) if len(w) > 3 and w not in _STOPWORDS}
+
+
+def _between(text: str, start: str, end: Optional[str] = None) -> str:
+    """The text after start (and before end), or "" when start is missing"""
+    index = text.find(start)
+    if index < 0:
+        return ""
+    text = text[index + len(start):]
+    if end is not None and end in text:
+        text = text[:text.find(end)]
+    return text.strip()
+
+
+def _is_relevant(question: str, document: str) -> bool:
+    return bool(_terms(question) & _terms(document))
+
+
+def _grade_documents(prompt: str) -> dict:
+    document = _between(prompt, "retrieved document:", "Here is the user question:")
+    question = _between(prompt, "Here is the user question:", "\n")
+    return {"binary_score": "yes" if _is_relevant(question, document) else "no"}
+
+
+def _chunk_grades(prompt: str) -> dict:
+    question = _between(prompt, "Here is the user question:", "\n")
+    listing = _between(prompt, "each starting with its number in brackets:", "If a document contains")
+    parts = re.split(r"(?:^|\n\n)\[(\d+)\] ", listing)
+    relevant = [int(number) for number, document in zip(parts[1::2], parts[2::2])
+                if _is_relevant(question, document)]
+    return {"relevant": relevant}
+
+
+def _default_args(parameters: dict) -> dict:
+    """Empty values of the right type for a schema the fake does not know"""
+    defaults = {"string": "", "boolean": False, "integer": 0, "number": 0, "array": [], "object": {}}
+    properties = parameters.get("properties") or {}
+    return {name: defaults.get(spec.get("type"), None) for name, spec in properties.items()}
+
+
+def _answer(prompt: str) -> str:
+    """The context sentences that share the most words with the question"""
+    context = _between(prompt, "Context:", "\n\nQuestion:")
+    question = _between(prompt, "\n\nQuestion:")
+    terms = _terms(question)
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", context) if s.strip()]
+    ranked = sorted(range(len(sentences)), key=lambda i: (-len(terms & _terms(sentences[i])), i))
+    best = sorted(i for i in ranked[:MAX_ANSWER_SENTENCES] if terms & _terms(sentences[i]))
+    if not best:
+        return "I don't know: the context does not cover the question."
+    return " ".join(sentences[i] for i in best)
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model with tool calling, structured output, streaming and latency injection"""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    token_latency: float = 0.0
+    seed: int = 0
+
+    _rng: Any = PrivateAttr(default=None)
+    _rng_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+    _in_flight: int = PrivateAttr(default=0)
+    _max_in_flight: int = PrivateAttr(default=0)
+    _stats_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-deterministic"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    @property
+    def max_in_flight(self) -> int:
+        """Most calls that were running at the same time"""
+        return self._max_in_flight
+
+    @contextmanager
+    def _track(self):
+        with self._stats_lock:
+            self._calls += 1
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        try:
+            yield
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _delay(self, output_tokens: int = 0) -> float:
+        """Seconds this call takes: latency with seeded jitter, plus per-token time when not streaming"""
+        with self._rng_lock:
+            if self._rng is None:
+                self._rng = random.Random(self.seed)
+            jitter = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.latency + jitter) + output_tokens * self.token_latency
+
+    def _respond(self, messages: List[BaseMessage], tools=None, tool_choice=None) -> AIMessage:
+        prompt = _text(messages[-1]) if messages else ""
+        prompt_tokens = sum(count_tokens(_text(message)) for message in messages)
+        tool_calls = []
+        content = ""
+
+        functions = [tool["function"] for tool in tools or []]
+        schemas = {function["name"]: function for function in functions}
+        if tool_choice == "any" or (tool_choice and tool_choice in schemas):
+            # Structured output: fill in the (first) schema from the prompt
+            function = schemas.get(tool_choice) or functions[0]
+            if function["name"] == "GradeDocuments":
+                args = _grade_documents(prompt)
+            elif function["name"] == "ChunkGrades":
+                args = _chunk_grades(prompt)
+            else:
+                args = _default_args(function.get("parameters") or {})
+            tool_calls.append({"name": function["name"], "args": args})
+        elif functions and not any(isinstance(message, ToolMessage) for message in messages):
+            # Router: look the question up before answering
+            tool_calls.append({"name": functions[0]["name"], "args": {"query": prompt}})
+        elif "Formulate an improved question" in prompt:
+            content = _between(prompt, "\n---------\n", "\n---------\n")
+        elif "\n\nQuestion:" in prompt:
+            content = _answer(prompt)
+        else:
+            content = f"This is a deterministic answer to: {prompt.strip()}"
+
+        # Ids derive from the prompt (not hash(), which changes between processes)
+        key = zlib.crc32(f"{len(messages)}:{prompt}".encode("utf-8"))
+        for i, call in enumerate(tool_calls):
+            call["id"] = f"call_{key:08x}_{i}"
+        completion_tokens = count_tokens(content) + sum(count_tokens(json.dumps(c["args"])) for c in tool_calls)
+        return AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, tool_choice=None, **kwargs) -> ChatResult:
+        with self._track():
+            message = self._respond(messages, tools, tool_choice)
+            time.sleep(self._delay(message.usage_metadata["output_tokens"]))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, tool_choice=None, **kwargs) -> ChatResult:
+        with self._track():
+            message = self._respond(messages, tools, tool_choice)
+            await asyncio.sleep(self._delay(message.usage_metadata["output_tokens"]))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        """Tool calls as one chunk, text as one chunk per word; usage rides on the last chunk"""
+        if message.tool_calls:
+            chunks = [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ])]
+        else:
+            chunks = [AIMessageChunk(content=piece) for piece in _PIECE.findall(message.content)] or [AIMessageChunk(content="")]
+        chunks[-1].usage_metadata = message.usage_metadata
+        return chunks
+
+    def _stream(self, messages, stop=None, run_manager=None, tools=None, tool_choice=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        with self._track():
+            time.sleep(self._delay())
+            for i, chunk in enumerate(self._chunks(self._respond(messages, tools, tool_choice))):
+                if i and self.token_latency:
+                    time.sleep(self.token_latency)
+                if run_manager and chunk.content:
+                    run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+                yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, tools=None, tool_choice=None, **kwargs):
+        with self._track():
+            await asyncio.sleep(self._delay())
+            for i, chunk in enumerate(self._chunks(self._respond(messages, tools, tool_choice))):
+                if i and self.token_latency:
+                    await asyncio.sleep(self.token_latency)
+                if run_manager and chunk.content:
+                    await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+                yield ChatGenerationChunk(message=chunk)
+
+
+def create_fake_llm(**overrides):
+    """FakeChatModel configured from FAKE_LLM_* environment variables"""
+    settings = {
+        "latency": float(os.getenv("FAKE_LLM_LATENCY_MS", "0")) / 1000,
+        "jitter": float(os.getenv("FAKE_LLM_JITTER_MS", "0")) / 1000,
+        "token_latency": float(os.getenv("FAKE_LLM_TOKEN_MS", "0")) / 1000,
+        "seed": int(os.getenv("FAKE_LLM_SEED", "0")),
+    }
+    settings.update(overrides)
+    return FakeChatModel(**settings)
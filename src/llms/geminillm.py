@@ -1,5 +1,3 @@
-# Import ChatGoogleGenerativeAI class for Google Gemini integration
-from langchain_google_genai import ChatGoogleGenerativeAI
 # Import load_dotenv function to load environment variables from .env file
 from dotenv import load_dotenv
 import os
@@ -12,6 +10,8 @@ os.environ['GRPC_VERBOSITY'] = 'ERROR'
 
 # Define function to create and configure Gemini LLM instance
 def create_geminillm():
+    # Import here so importing the graph does not load the Gemini SDK
+    from langchain_google_genai import ChatGoogleGenerativeAI
     # Create ChatGoogleGenerativeAI instance with specific configuration
     geminillm = ChatGoogleGenerativeAI(
         # Specify the Gemini model version to use
@@ -1,13 +1,18 @@
 # Free alternative embedding using HuggingFace
-from langchain_huggingface import HuggingFaceEmbeddings
 from dotenv import load_dotenv
 load_dotenv()
 
-def create_huggingface_embeddings():
-    """Create HuggingFace embeddings - free alternative to Google embeddings"""
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+def create_huggingface_embeddings(cache_dir=None, threads=None):
+    """Create HuggingFace embeddings - free alternative to Google embeddings (batched and cached on CPU)"""
+    from sentence_transformers import SentenceTransformer
+    from src.llms import embedding_engine
+
+    embedding_engine.set_threads(embedding_engine.THREADS if threads is None else threads)
+    model = SentenceTransformer(MODEL_NAME, device="cpu")
+    return embedding_engine.EmbeddingEngine(
+        model,
+        MODEL_NAME,
+        cache_dir=embedding_engine.CACHE_DIR if cache_dir is None else cache_dir,
     )
-    return embeddings
\ No newline at end of file
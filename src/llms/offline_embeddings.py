@@ -4,16 +4,27 @@ This avoids SSL certificate issues with external services
 """
 
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
+from scipy.sparse import csr_matrix
+import hashlib
+import json
 import pickle
 import os
+import time
 from typing import List
 
+# Pointer file naming the vectorizer version the stored vectors were built with
+CURRENT_FILE = "CURRENT"
+
 class OfflineTfIdfEmbeddings:
-    """Simple TF-IDF based embeddings that work offline"""
+    """
+    Simple TF-IDF based embeddings that work offline
+    
+    Fitting produces a versioned artifact. With an artifact_dir (the index's
+    "vectorizer" folder), every fit is saved as vectorizer-<version>.pkl plus a
+    JSON sidecar, and CURRENT names the version the stored vectors belong to.
+    """
     
-    def __init__(self, max_features=5000):
+    def __init__(self, max_features=5000, artifact_dir=None):
         self.vectorizer = TfidfVectorizer(
             max_features=max_features,
             stop_words='english',
@@ -21,43 +32,145 @@ class OfflineTfIdfEmbeddings:
             ngram_range=(1, 2)
         )
         self.is_fitted = False
-        self.cache_file = "tfidf_embeddings.pkl"
+        self.artifact_dir = artifact_dir
+        self.version = None
+        self.artifact_info = {}
+        
+    def fit(self, texts: List[str], make_current=True):
+        """
+        Fit the vectorizer on the full corpus and record it as a new version.
         
-    def fit(self, texts: List[str]):
-        """Fit the vectorizer on the given texts"""
+        Args:
+            texts: Corpus to fit on (all chunks, not just a new batch)
+            make_current: Point CURRENT at the new version. Pass False while the
+                stored vectors are being re-embedded, then call activate().
+        
+        Returns:
+            The version id of the fitted vectorizer
+        """
         self.vectorizer.fit(texts)
         self.is_fitted = True
-        # Cache the fitted vectorizer
-        with open(self.cache_file, 'wb') as f:
+        self.version = self._compute_version()
+        self.artifact_info = {
+            "version": self.version,
+            "fitted_at": time.time(),
+            "n_documents": len(texts),
+            "n_terms": len(self.vectorizer.vocabulary_),
+            # Reference point for detecting vocabulary degradation on new batches
+            "baseline_coverage": self.coverage(texts),
+        }
+        if self.artifact_dir:
+            self.save_artifact()
+            if make_current:
+                self.activate()
+        return self.version
+    
+    def _compute_version(self):
+        """Content hash of the fitted vocabulary and IDF weights"""
+        digest = hashlib.sha256()
+        for term, index in sorted(self.vectorizer.vocabulary_.items()):
+            digest.update(f"{term}\t{index}\n".encode("utf-8"))
+        digest.update(self.vectorizer.idf_.tobytes())
+        return digest.hexdigest()[:12]
+    
+    def _artifact_path(self, version, extension):
+        return os.path.join(self.artifact_dir, f"vectorizer-{version}.{extension}")
+    
+    def save_artifact(self):
+        """Write vectorizer-<version>.pkl and its JSON sidecar to artifact_dir"""
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        with open(self._artifact_path(self.version, "pkl"), 'wb') as f:
             pickle.dump(self.vectorizer, f)
+        with open(self._artifact_path(self.version, "json"), 'w', encoding="utf-8") as f:
+            json.dump(self.artifact_info, f, indent=2)
+    
+    def activate(self):
+        """Point CURRENT at this version (atomically)"""
+        path = os.path.join(self.artifact_dir, CURRENT_FILE)
+        with open(path + ".tmp", 'w', encoding="utf-8") as f:
+            f.write(self.version)
+        os.replace(path + ".tmp", path)
+    
+    def current_version(self):
+        """Version named by CURRENT in artifact_dir, or None"""
+        if not self.artifact_dir:
+            return None
+        path = os.path.join(self.artifact_dir, CURRENT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip() or None
+    
+    def load_version(self, version):
+        """Load a specific vectorizer version from artifact_dir"""
+        with open(self._artifact_path(version, "pkl"), 'rb') as f:
+            self.vectorizer = pickle.load(f)
+        with open(self._artifact_path(version, "json"), encoding="utf-8") as f:
+            self.artifact_info = json.load(f)
+        self.version = version
+        self.is_fitted = True
     
     def load_cache(self):
-        """Load cached vectorizer if available"""
-        if os.path.exists(self.cache_file):
-            with open(self.cache_file, 'rb') as f:
-                self.vectorizer = pickle.load(f)
-                self.is_fitted = True
-                return True
-        return False
+        """Load the current vectorizer artifact if available"""
+        version = self.current_version()
+        if version is None:
+            return False
+        self.load_version(version)
+        return True
     
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embed multiple documents"""
+    def coverage(self, texts: List[str]) -> float:
+        """Fraction of the texts' words that are in the vocabulary (bigrams are too sparse to judge by)"""
+        analyzer = self.vectorizer.build_analyzer()
+        vocabulary = self.vectorizer.vocabulary_
+        total = known = 0
+        for text in texts:
+            terms = [term for term in analyzer(text) if " " not in term]
+            total += len(terms)
+            known += sum(term in vocabulary for term in terms)
+        return known / total if total else 1.0
+    
+    def needs_refit(self, texts: List[str], tolerance=0.1) -> bool:
+        """True when a new batch is covered noticeably worse than the corpus the vectorizer was fit on"""
         if not self.is_fitted:
-            if not self.load_cache():
-                # If no cache, fit on the texts themselves
-                self.fit(texts)
-        
-        # Transform texts to vectors
-        vectors = self.vectorizer.transform(texts)
+            return True
+        baseline = self.artifact_info.get("baseline_coverage")
+        if baseline is None or not texts:
+            return False
+        return self.coverage(texts) < baseline - tolerance
+    
+    def _ensure_fitted(self, texts: List[str] = None):
+        """Make sure the vectorizer is fitted, fitting on texts if no cache exists"""
+        if self.is_fitted:
+            return
+        if self.load_cache():
+            return
+        if texts is None:
+            raise RuntimeError("Vectorizer not fitted. Call embed_documents first.")
+        # If no cache, fit on the texts themselves
+        self.fit(texts)
+    
+    def embed_documents_sparse(self, texts: List[str]) -> csr_matrix:
+        """Embed multiple documents as a sparse CSR matrix (rows are L2-normalized)"""
+        self._ensure_fitted(texts)
+        return self.vectorizer.transform(texts).tocsr()
+    
+    def embed_query_sparse(self, text: str) -> csr_matrix:
+        """Embed a single query as a 1 x n_features sparse CSR matrix"""
+        self._ensure_fitted()
+        return self.vectorizer.transform([text]).tocsr()
+    
+    def embed_queries_sparse(self, texts: List[str]) -> csr_matrix:
+        """Embed many queries with one transform call, as an n_queries x n_features CSR matrix"""
+        self._ensure_fitted()
+        return self.vectorizer.transform(texts).tocsr()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed multiple documents as dense vectors (for dense backends like Chroma)"""
+        vectors = self.embed_documents_sparse(texts)
         # Convert sparse matrix to dense and then to list
         return vectors.toarray().tolist()
     
     def embed_query(self, text: str) -> List[float]:
-        """Embed a single query"""
-        if not self.is_fitted:
-            if not self.load_cache():
-                raise RuntimeError("Vectorizer not fitted. Call embed_documents first.")
-        
-        # Transform single text
-        vector = self.vectorizer.transform([text])
-        return vector.toarray()[0].tolist()
\ No newline at end of file
+        """Embed a single query as a dense vector (for dense backends like Chroma)"""
+        vector = self.embed_query_sparse(text)
+        return vector.toarray()[0].tolist()
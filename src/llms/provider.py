@@ -0,0 +1,39 @@
+"""
+Pluggable chat model providers
+
+LLM_PROVIDER picks the model every node uses: "gemini" (default) or "fake",
+the deterministic offline stand-in in fake_llm.py. Other providers can be
+added with register_provider(name, factory).
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _gemini():
+    from src.llms.geminillm import create_geminillm
+    return create_geminillm()
+
+
+def _fake():
+    from src.llms.fake_llm import create_fake_llm
+    return create_fake_llm()
+
+
+PROVIDERS = {"gemini": _gemini, "fake": _fake}
+
+
+def register_provider(name, factory):
+    """Make a chat model factory selectable with LLM_PROVIDER=name"""
+    PROVIDERS[name.lower()] = factory
+
+
+def create_llm(provider=None):
+    """A new chat model from the given provider, else LLM_PROVIDER"""
+    name = (provider or os.getenv("LLM_PROVIDER", "gemini")).strip().lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{name}'. Choose one of: {', '.join(sorted(PROVIDERS))}")
+    return PROVIDERS[name]()
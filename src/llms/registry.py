@@ -0,0 +1,100 @@
+"""
+Shared registry of models and tools used by the graph nodes
+
+Every entry is created on first use and then reused for the life of the
+process, so a graph step no longer pays for building a client, a retriever
+tool or a bound tool schema. One shared chat model also means one client and
+one connection pool for all nodes.
+"""
+
+import threading
+
+_lock = threading.RLock()
+_instances = {}
+
+
+def _get_or_create(key, factory):
+    instance = _instances.get(key)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(key)
+            if instance is None:
+                instance = factory()
+                _instances[key] = instance
+    return instance
+
+
+def get_llm():
+    """The shared chat model from the configured provider (LLM_PROVIDER)"""
+    from src.llms.provider import create_llm
+    return _get_or_create("llm", create_llm)
+
+
+def get_retriever_tool():
+    """The shared document retriever tool"""
+    from src.ingetsion.retriever_tool import get_retriever_tool as create_retriever_tool
+    return _get_or_create("retriever_tool", create_retriever_tool)
+
+
+def get_tool_calling_llm():
+    """The shared chat model with the retriever tool schema bound once"""
+    return _get_or_create("tool_calling_llm", lambda: get_llm().bind_tools([get_retriever_tool()]))
+
+
+def get_grader_llm():
+    """The shared chat model with GradeDocuments structured output"""
+    from src.models.grader import GradeDocuments
+    return _get_or_create("grader_llm", lambda: get_llm().with_structured_output(GradeDocuments))
+
+
+def get_chunk_grader_llm():
+    """The shared chat model with ChunkGrades structured output (batched grading)"""
+    from src.models.grader import ChunkGrades
+    return _get_or_create("chunk_grader_llm", lambda: get_llm().with_structured_output(ChunkGrades))
+
+
+def get_dense_embedding():
+    """The shared sentence embedding model of the hybrid retriever"""
+    def create():
+        # sentence-transformers is only imported when the hybrid backend is used
+        from src.llms.huggingface_embeddings import create_huggingface_embeddings
+        return create_huggingface_embeddings()
+
+    return _get_or_create("dense_embedding", create)
+
+
+def register(key, instance):
+    """Use a prebuilt instance for a registry entry (e.g. a stub model in tests)"""
+    with _lock:
+        _instances[key] = instance
+
+
+def warm_up(background=True):
+    """
+    Open the vector store and build the shared models ahead of the first question.
+
+    Importing the graph stays cheap; this moves the remaining start-up cost off
+    the first request. Failures are reported and retried on first use.
+    """
+    def warm():
+        try:
+            from src.ingetsion.retriever import create_vectorstore
+            create_vectorstore()
+            get_tool_calling_llm()
+            get_grader_llm()
+            get_chunk_grader_llm()
+        except Exception as e:
+            print(f"Warm-up failed, will retry on first use: {e}")
+
+    if not background:
+        warm()
+        return None
+    thread = threading.Thread(target=warm, name="registry-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def reset_registry():
+    """Drop every shared instance (e.g. after the vector store was rebuilt)"""
+    with _lock:
+        _instances.clear()
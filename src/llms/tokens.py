@@ -0,0 +1,15 @@
+"""
+Token count estimate shared by the fake chat model and the run instrumentation
+
+Counts words and punctuation marks as tokens: close enough to a subword
+tokenizer for budgets and usage reports, and needs no model vocabulary.
+"""
+
+import re
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count: words and punctuation"""
+    return len(_TOKEN.findall(text))
@@ -15,7 +15,11 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 try:
-    from src.graph.simple_graph_builder import simple_graph as graph
+    from src.graph.simple_graph_builder import simple_graph
+    from src.graph.answer_cache import CachedGraph
+    from src.graph.streaming import stream_answer
+    from src.graph.instrumentation import breakdown_rows
+    from src.llms.registry import warm_up
     from langchain_core.messages import HumanMessage
     import json
 except ImportError as e:
@@ -23,8 +27,14 @@ except ImportError as e:
     print("Please make sure all dependencies are installed and the graph is properly built.")
     sys.exit(1)
 
+# Repeated and near-duplicate questions are answered without running the graph
+graph = CachedGraph(simple_graph)
+
 def main():
     """Main CLI interface for the RAG system"""
+    # Open the vector store and clients while the user types the first question
+    warm_up()
+    
     print("=" * 60)
     print("🤖 RAG Question Answering System")
     print("Ask questions about LangChain and LangGraph documentation!")
@@ -59,13 +69,30 @@ def main():
             # Create the input for the graph
             input_messages = [HumanMessage(content=user_input)]
             
-            # Run the graph
-            result = graph.invoke({"messages": input_messages})
+            # Run the graph, printing node progress and the answer as it is generated
+            answering = False
+            for event, value in stream_answer(graph, {"messages": input_messages}):
+                if event == "node":
+                    print(f"   ↳ {value}")
+                elif event == "token":
+                    if not answering:
+                        print("\n🤖 Assistant: ", end="", flush=True)
+                        answering = True
+                    print(value, end="", flush=True)
+                elif event == "done":
+                    info = value
             
-            # Extract and display the response
-            if result and "messages" in result and result["messages"]:
-                response = result["messages"][-1].content
-                print(f"\n🤖 Assistant: {response}")
+            # Answers that produced no tokens (e.g. errors) are printed whole
+            if not answering and info["answer"]:
+                print(f"\n🤖 Assistant: {info['answer']}", end="")
+            if info["answer"]:
+                print(f"\n   (first token {info['ttft']:.2f}s, total {info['total']:.2f}s)")
+                if info["cache"]:
+                    print(f"   (answered from cache, {info['cache']} match)")
+                for row in breakdown_rows(info["trace"]):
+                    print(f"   {row['node']}: {row['seconds']:.2f}s (LLM {row['llm_seconds']:.2f}s, "
+                          f"{row['llm_calls']} calls, {row['prompt_tokens']}+{row['completion_tokens']} tokens, "
+                          f"{row['chunks']} chunks)")
             else:
                 print("\n❌ I'm sorry, I couldn't generate a response. Please try again.")
             
@@ -123,8 +150,27 @@ def interactive_mode():
         print("\nFull traceback:")
         traceback.print_exc()
 
+def batch_mode(argv):
+    """Answer a file of questions and write the results as JSONL (see src/graph/batch_runner.py)"""
+    import argparse
+    from src.graph.batch_runner import DEFAULT_PARALLELISM, run_batch_file
+    
+    parser = argparse.ArgumentParser(prog="main.py --batch", description="Batch question answering")
+    parser.add_argument("input", help="JSONL or CSV file with a 'question' field (and optionally 'id')")
+    parser.add_argument("--output", help="JSONL results file (default: <input>.answers.jsonl); resumed if it exists")
+    parser.add_argument("--graph", choices=["simple", "full"], default="simple",
+                        help="simple_graph (default, as in the CLI) or the full graph with grading")
+    parser.add_argument("--parallelism", type=int, default=DEFAULT_PARALLELISM,
+                        help="Questions in flight at once")
+    args = parser.parse_args(argv)
+    
+    warm_up()
+    run_batch_file(args.input, args.output, graph=args.graph, parallelism=args.parallelism)
+
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "--debug":
         interactive_mode()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        batch_mode(sys.argv[2:])
     else:
         main()
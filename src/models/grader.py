@@ -1,7 +1,5 @@
+from typing import List
 from pydantic import BaseModel, Field
-from src.llms.geminillm import create_geminillm
-
-grader_model = create_geminillm()
 
 GRADE_PROMPT = (
     "You are a grader assessing relevance of a retrieved document to a user question. \n "
@@ -17,3 +15,16 @@ class GradeDocuments(BaseModel):
         description="Relevance score: 'yes' if relevant, or 'no' if not relevant"
     )
 
+BATCH_GRADE_PROMPT = (
+    "You are a grader assessing relevance of retrieved documents to a user question. \n "
+    "Here is the user question: {question} \n\n"
+    "Here are the retrieved documents, each starting with its number in brackets: \n\n {documents} \n\n"
+    "If a document contains keyword(s) or semantic meaning related to the user question, grade it as relevant. \n"
+    "Return the numbers of all relevant documents, or an empty list if none of them is relevant."
+)
+
+class ChunkGrades(BaseModel):
+    """Grade each retrieved document for relevance, by number."""
+    relevant: List[int] = Field(
+        description="Numbers of the documents that are relevant to the question"
+    )
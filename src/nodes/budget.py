@@ -0,0 +1,72 @@
+"""
+Per-question budget for the retrieve -> grade -> rewrite loop
+
+A question may be rewritten at most MAX_REWRITES times, and the whole run may
+make at most MAX_LLM_CALLS LLM calls and take at most MAX_QUESTION_SECONDS.
+A rewrite that retrieves exactly the same chunks as an earlier attempt ends
+the loop as well, since rewriting again would only repeat it. Once the loop
+ends, generate_answer answers best-effort from the strongest retrieval so far.
+"""
+
+import hashlib
+import os
+import time
+from typing import Literal, Optional
+
+from src.states.graphstate import GraphState
+
+MAX_REWRITES = int(os.getenv("MAX_REWRITES", "2"))
+MAX_LLM_CALLS = int(os.getenv("MAX_LLM_CALLS", "10"))
+MAX_QUESTION_SECONDS = float(os.getenv("MAX_QUESTION_SECONDS", "60"))
+# LLM calls another attempt needs at least: rewrite, route/retrieve, answer
+CALLS_PER_RETRY = 3
+
+
+def chunk_key(doc):
+    """Stable identity of a retrieved chunk"""
+    key = doc.id or doc.metadata.get("chunk_id")
+    if key:
+        return key
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:16]
+
+
+def note_retrieval(state: GraphState, docs):
+    """
+    State update recording this retrieval's chunk set.
+
+    Flags the retrieval as repeated when an earlier attempt returned the same
+    chunks, and keeps the chunks of the best-scoring attempt for a best-effort answer.
+    """
+    chunk_set = sorted(chunk_key(doc) for doc in docs)
+    update = {
+        "retrieved_chunk_sets": [chunk_set],
+        "repeated_retrieval": bool(docs) and chunk_set in (state.get("retrieved_chunk_sets") or []),
+    }
+    top_score = max((doc.metadata.get("score") or 0.0 for doc in docs), default=0.0)
+    if docs and (not state.get("best_documents") or top_score > (state.get("best_score") or 0.0)):
+        update["best_documents"] = list(docs)
+        update["best_score"] = top_score
+    return update
+
+
+def stop_reason(state: GraphState) -> Optional[str]:
+    """Why another rewrite is not allowed, or None if the budget allows one"""
+    if state.get("repeated_retrieval"):
+        return "the rewrite retrieved the same chunks as before"
+    if (state.get("rewrite_count") or 0) >= MAX_REWRITES:
+        return f"reached the limit of {MAX_REWRITES} rewrites"
+    if (state.get("llm_calls") or 0) + CALLS_PER_RETRY > MAX_LLM_CALLS:
+        return f"another attempt would exceed {MAX_LLM_CALLS} LLM calls"
+    started_at = state.get("started_at")
+    if started_at is not None and time.time() - started_at >= MAX_QUESTION_SECONDS:
+        return f"exceeded the {MAX_QUESTION_SECONDS:.0f}s time budget"
+    return None
+
+
+def route_rewrite(state: GraphState) -> Literal["rewrite_question", "generate_answer"]:
+    """Rewrite while the budget allows it, otherwise answer best-effort."""
+    reason = stop_reason(state)
+    if reason is None:
+        return "rewrite_question"
+    print(f"Not rewriting the question: {reason}; answering with the best context found")
+    return "generate_answer"
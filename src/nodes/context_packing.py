@@ -0,0 +1,192 @@
+"""
+Context packing for generate_answer
+
+Retrieved chunks overlap (CHUNK_OVERLAP tokens between neighbours) and often
+repeat each other, so pasting them into the prompt verbatim wastes tokens. The
+chunks are packed into a compact context instead:
+
+1. overlapping chunks from the same source are merged into one passage
+   (by their start_index when the splitter recorded it, else by matching text)
+2. passages that are near-duplicates of a more relevant one are dropped
+   (word-shingle Jaccard similarity >= CONTEXT_DUPLICATE_SIMILARITY, or contained in it)
+3. passages are ordered by relevance (metadata["score"], else retrieval rank)
+   and added until CONTEXT_TOKEN_BUDGET is reached; the last one is cut at a
+   sentence or word boundary to fit
+"""
+
+import os
+import re
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+from src.llms.tokens import count_tokens
+
+TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+DUPLICATE_SIMILARITY = float(os.getenv("CONTEXT_DUPLICATE_SIMILARITY", "0.8"))
+# Shortest shared text that counts as an overlap when chunks have no offsets
+MIN_OVERLAP_CHARS = 40
+# A cut passage shorter than this is left out instead
+MIN_PASSAGE_TOKENS = 50
+SHINGLE_SIZE = 3
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class _Passage:
+    def __init__(self, doc: Document, relevance, rank):
+        self.text = doc.page_content.strip()
+        self.source = doc.metadata.get("source")
+        self.start = doc.metadata.get("start_index")
+        self.relevance = relevance
+        self.rank = rank
+        self.chunks = 1
+
+    @property
+    def end(self):
+        return None if self.start is None else self.start + len(self.text)
+
+
+def _relevance(docs: List[Document]):
+    """Retrieval scores when every chunk has one, else the retrieval order"""
+    scores = [doc.metadata.get("score") for doc in docs]
+    if all(score is not None for score in scores):
+        return [float(score) for score in scores]
+    return [-rank for rank in range(len(docs))]
+
+
+def _text_overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of first that is a prefix of second (0 when shorter than MIN_OVERLAP_CHARS)"""
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    position = first.find(probe)
+    while position != -1:
+        length = len(first) - position
+        if second.startswith(first[position:]) and length < len(second):
+            return length
+        position = first.find(probe, position + 1)
+    return 0
+
+
+def _overlap(first: _Passage, second: _Passage) -> int:
+    """Characters of second already at the end of first, or 0 when second does not continue first"""
+    if first.start is not None and second.start is not None:
+        if not first.start < second.start < first.end < second.end:
+            return 0
+        length = first.end - second.start
+        if first.text.endswith(second.text[:length]):
+            return length
+    return _text_overlap(first.text, second.text)
+
+
+def _merge_overlapping(passages: List[_Passage]) -> Tuple[List[_Passage], int]:
+    """Merge chunks that continue each other within a source; returns (passages, merges)"""
+    merges = 0
+    merged = True
+    while merged:
+        merged = False
+        for first in passages:
+            for second in passages:
+                if first is second or first.source != second.source:
+                    continue
+                length = _overlap(first, second)
+                if length:
+                    first.text += second.text[length:]
+                    first.relevance = max(first.relevance, second.relevance)
+                    first.rank = min(first.rank, second.rank)
+                    first.chunks += second.chunks
+                    passages.remove(second)
+                    merges += 1
+                    merged = True
+                    break
+            if merged:
+                break
+    return passages, merges
+
+
+def _shingles(text: str) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _drop_duplicates(passages: List[_Passage], similarity) -> Tuple[List[_Passage], int]:
+    """Keep passages (most relevant first) that are not near-duplicates of one already kept"""
+    kept = []
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        duplicate = False
+        for other, other_shingles in kept:
+            if passage.text in other.text:
+                duplicate = True
+            else:
+                union = len(shingles | other_shingles)
+                duplicate = union > 0 and len(shingles & other_shingles) / union >= similarity
+            if duplicate:
+                break
+        if not duplicate:
+            kept.append((passage, shingles))
+    return [passage for passage, _ in kept], len(passages) - len(kept)
+
+
+def _truncate(text: str, tokens: int) -> str:
+    """text cut to about tokens tokens, at the last sentence end, else word break, that fits"""
+    if count_tokens(text) <= tokens:
+        return text
+    # Longest prefix within the budget (the count only grows with the prefix)
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= tokens:
+            low = middle
+        else:
+            high = middle - 1
+    limit = low
+    cut = text[:limit]
+    sentence = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("\n\n"))
+    if sentence > limit // 2:
+        return cut[:sentence + 1].rstrip()
+    word = cut.rfind(" ")
+    return cut[:word].rstrip() if word > 0 else cut
+
+
+def pack_context(docs: List[Document], token_budget=None, similarity=None) -> Tuple[str, Dict]:
+    """
+    Pack retrieved chunks into a context of at most token_budget (estimated) tokens.
+
+    Returns:
+        (context text with passages separated by blank lines, stats)
+    """
+    token_budget = TOKEN_BUDGET if token_budget is None else token_budget
+    similarity = DUPLICATE_SIMILARITY if similarity is None else similarity
+    docs = [doc for doc in docs if doc.page_content.strip()]
+    stats = {"chunks": len(docs), "tokens_in": sum(count_tokens(doc.page_content) for doc in docs),
+             "merged": 0, "duplicates": 0, "truncated": 0, "passages": 0, "tokens_out": 0}
+    if not docs:
+        return "", stats
+
+    passages = [_Passage(doc, relevance, rank) for rank, (doc, relevance) in enumerate(zip(docs, _relevance(docs)))]
+    passages, stats["merged"] = _merge_overlapping(passages)
+    passages.sort(key=lambda passage: (-passage.relevance, passage.rank))
+    passages, stats["duplicates"] = _drop_duplicates(passages, similarity)
+
+    packed = []
+    remaining = token_budget
+    for passage in passages:
+        tokens = count_tokens(passage.text)
+        if tokens <= remaining:
+            packed.append(passage.text)
+            remaining -= tokens
+            continue
+        # Cut the passage to the space left, unless that would leave only a fragment
+        if remaining >= MIN_PASSAGE_TOKENS or not packed:
+            packed.append(_truncate(passage.text, remaining))
+            stats["truncated"] += 1
+        break
+
+    context = "\n\n".join(packed)
+    stats["passages"] = len(packed)
+    stats["tokens_out"] = count_tokens(context)
+    return context, stats
@@ -1,41 +1,99 @@
-from src.llms.geminillm import create_geminillm
+from src.llms.registry import get_llm
+from src.nodes.context_packing import pack_context
+from src.nodes.grader import retrieved_documents
 from src.states.graphstate import GraphState
 
+SYSTEM_PROMPT = (
+    "You are a helpful assistant for question-answering tasks. "
+    "Use the following pieces of retrieved context to answer the question clearly and concisely. "
+    "Provide a well-structured, human-readable response. "
+    "If you don't know the answer, just say that you don't know. "
+    "Format your response in clear paragraphs with proper spacing."
+)
+BEST_EFFORT_PROMPT = (
+    " The context was not confirmed to be relevant: answer from the parts that are, "
+    "and say so if it does not cover the question."
+)
 
-def generate_answer(state: GraphState):
-    """ Generate an answer"""
-    from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
+
+def _answer_messages(state: GraphState):
+    """Prompt messages for the answer, or None when there is no context to answer from"""
+    from langchain_core.messages import SystemMessage, HumanMessage
     
     question = state["messages"][0].content
     
-    # Check if we have valid context
-    if len(state["messages"]) > 1 and state["messages"][-1].content:
-        context = state["messages"][-1].content
+    # Check if we have valid context: the graded chunks, else the best retrieval
+    # seen once the rewrite budget ran out, else the raw retrieval result
+    best_effort = False
+    docs = None
+    if state.get("documents"):
+        docs = state["documents"]
+    elif state.get("context"):
+        context = state["context"]
+    elif state.get("best_documents"):
+        docs = state["best_documents"]
+        best_effort = True
+    elif len(state["messages"]) > 1 and state["messages"][-1].content:
+        docs = retrieved_documents(state)
     else:
         context = "No relevant context found."
     
+    if docs is not None:
+        # Merge overlapping chunks, drop duplicates and keep the most relevant within the token budget
+        context, stats = pack_context(docs)
+        print(f"Context: {stats['chunks']} chunks -> {stats['passages']} passages, "
+              f"~{stats['tokens_in']} -> ~{stats['tokens_out']} tokens "
+              f"({stats['merged']} merged, {stats['duplicates']} duplicates dropped)")
+    
     # Skip if context is empty or just whitespace
     if not context.strip():
-        return {"messages": [AIMessage(content="I'm sorry, I couldn't find relevant information to answer your question.")]}
+        return None
     
     # Build the user message with context and question
     user_message = f"Context: {context}\n\nQuestion: {question}"
     
-    llm = create_geminillm()
+    # Use system message + human message pattern for better results
+    system_prompt = SYSTEM_PROMPT + (BEST_EFFORT_PROMPT if best_effort else "")
+    return [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=user_message)
+    ]
+
+
+def _no_context():
+    from langchain_core.messages import AIMessage
+    return {"messages": [AIMessage(content="I'm sorry, I couldn't find relevant information to answer your question.")],
+            "generation_error": ""}
+
+
+def _answer(response=None, error=None):
+    from langchain_core.messages import AIMessage
+    if error is not None:
+        # The message keeps interactive users informed; generation_error marks the answer as failed
+        return {"messages": [AIMessage(content=f"I encountered an error while generating the response: {str(error)}")],
+                "generation_error": f"{type(error).__name__}: {error}"}
+    return {"messages": [AIMessage(content=response.content)], "llm_calls": 1, "generation_error": ""}
+
+
+def generate_answer(state: GraphState):
+    """ Generate an answer"""
+    messages = _answer_messages(state)
+    if messages is None:
+        return _no_context()
+    
+    try:
+        return _answer(get_llm().invoke(messages))
+    except Exception as e:
+        return _answer(error=e)
+
+
+async def agenerate_answer(state: GraphState):
+    """ Async version of generate_answer"""
+    messages = _answer_messages(state)
+    if messages is None:
+        return _no_context()
     
     try:
-        # Use system message + human message pattern for better results
-        system_prompt = (
-            "You are a helpful assistant for question-answering tasks. "
-            "Use the following pieces of retrieved context to answer the question clearly and concisely. "
-            "Provide a well-structured, human-readable response. "
-            "If you don't know the answer, just say that you don't know. "
-            "Format your response in clear paragraphs with proper spacing."
-        )
-        response = llm.invoke([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_message)
-        ])
-        return {"messages": [AIMessage(content=response.content)]}
+        return _answer(await get_llm().ainvoke(messages))
     except Exception as e:
-        return {"messages": [AIMessage(content=f"I encountered an error while generating the response: {str(e)}")]}
+        return _answer(error=e)
@@ -1,19 +1,8 @@
-from src.ingetsion.retriever_tool import get_retriever_tool
-from src.llms.geminillm import create_geminillm
+import time
+from src.llms.registry import get_tool_calling_llm
 from langchain_core.messages import SystemMessage
 
-geminillm = create_geminillm()
-
-def generate_query_or_respond(state):
-    """Call the model to generate a response based on the current state. Given
-    the question, it will decide to retrieve using the retriever tool, or simply respond to the user.
-    """
-    
-    retriever_tool = get_retriever_tool()
-    
-    # Add system message to guide the LLM's behavior
-    system_prompt = SystemMessage(
-        content="""You are a helpful AI assistant with expertise in LangChain and LangGraph.
+SYSTEM_PROMPT = """You are a helpful AI assistant with expertise in LangChain and LangGraph.
 
 **Response Strategy:**
 
@@ -34,16 +23,36 @@ def generate_query_or_respond(state):
 - "What is StateGraph in LangGraph?" → Use document_retriever tool
 
 Provide helpful, accurate responses. Only decline if the question is harmful or completely outside your capabilities."""
+
+
+def _prompt_messages(state):
+    # Add system message to guide the LLM's behavior
+    system_prompt = SystemMessage(
+        content=SYSTEM_PROMPT
     )
     
     # Prepend system message to the conversation
-    messages = [system_prompt] + state["messages"]
-    
-    response = (
-        geminillm
-        .bind_tools([retriever_tool])
-        .invoke(messages)
-    )
-    return {"messages": [response]}
+    return [system_prompt] + state["messages"]
+
+
+def _update(state, response):
+    update = {"messages": [response], "llm_calls": 1}
+    # The time budget counts from the first step of the run
+    if state.get("started_at") is None:
+        update["started_at"] = time.time()
+    return update
+
+
+def generate_query_or_respond(state):
+    """Call the model to generate a response based on the current state. Given
+    the question, it will decide to retrieve using the retriever tool, or simply respond to the user.
+    """
+    # The tool schema is bound once and the client is shared across steps
+    response = get_tool_calling_llm().invoke(_prompt_messages(state))
+    return _update(state, response)
 
 
+async def agenerate_query_or_respond(state):
+    """Async version of generate_query_or_respond"""
+    response = await get_tool_calling_llm().ainvoke(_prompt_messages(state))
+    return _update(state, response)
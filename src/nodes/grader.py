@@ -1,24 +1,134 @@
-﻿from typing import Literal
+﻿import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal
+import os
+from langchain_core.documents import Document
 from src.states.graphstate import GraphState
-from src.models.grader import grader_model, GradeDocuments, GRADE_PROMPT
+from src.models.grader import GRADE_PROMPT, BATCH_GRADE_PROMPT
+from src.llms.registry import get_grader_llm, get_chunk_grader_llm
+from src.nodes.pregrader import pregrade_stats
+from src.nodes.budget import route_rewrite
 
-def grade_documents(
+# Per-chunk LLM calls in flight at once when grading concurrently
+GRADER_CONCURRENCY = 4
+
+def retrieved_documents(state: GraphState) -> List[Document]:
+    """Documents from the last retrieval: the ToolMessage artifact, or its text as one chunk"""
+    message = state["messages"][-1]
+    artifact = getattr(message, "artifact", None)
+    if artifact:
+        return list(artifact)
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return [Document(page_content=content)] if content.strip() else []
+
+def _batch_prompt(question: str, docs: List[Document]):
+    listing = "\n\n".join(f"[{i}] {doc.page_content}" for i, doc in enumerate(docs, 1))
+    return [{"role": "user", "content": BATCH_GRADE_PROMPT.format(question=question, documents=listing)}]
+
+def _batch_grades(response, docs: List[Document]) -> List[bool]:
+    relevant = set(response.relevant)
+    return [i in relevant for i in range(1, len(docs) + 1)]
+
+def _chunk_prompt(question: str, doc: Document):
+    return [{"role": "user", "content": GRADE_PROMPT.format(question=question, context=doc.page_content)}]
+
+def _is_relevant(response) -> bool:
+    return response.binary_score.strip().lower() == "yes"
+
+def grade_chunks_batched(question: str, docs: List[Document]) -> List[bool]:
+    """Grade every chunk with a single structured-output call"""
+    response = get_chunk_grader_llm().invoke(_batch_prompt(question, docs))
+    return _batch_grades(response, docs)
+
+def grade_chunks_concurrently(question: str, docs: List[Document], max_workers=GRADER_CONCURRENCY) -> List[bool]:
+    """Grade each chunk with its own call, at most max_workers at a time"""
+    def grade(doc):
+        return _is_relevant(get_grader_llm().invoke(_chunk_prompt(question, doc)))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(docs)))) as executor:
+        return list(executor.map(grade, docs))
+
+async def agrade_chunks_batched(question: str, docs: List[Document]) -> List[bool]:
+    """Async version of grade_chunks_batched"""
+    response = await get_chunk_grader_llm().ainvoke(_batch_prompt(question, docs))
+    return _batch_grades(response, docs)
+
+async def agrade_chunks_concurrently(question: str, docs: List[Document], max_workers=GRADER_CONCURRENCY) -> List[bool]:
+    """Async version of grade_chunks_concurrently: at most max_workers calls awaited at a time"""
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def grade(doc):
+        async with semaphore:
+            return _is_relevant(await get_grader_llm().ainvoke(_chunk_prompt(question, doc)))
+
+    return list(await asyncio.gather(*(grade(doc) for doc in docs)))
+
+def _to_grade(state: GraphState):
+    """(question, chunks already accepted, chunks that still need an LLM verdict)"""
+    question = state["messages"][0].content
+    # After the pre-grader only its ambiguous chunks need an LLM verdict
+    pending = state.get("pending_documents")
+    accepted = list(state.get("documents") or []) if pending is not None else []
+    docs = pending if pending is not None else retrieved_documents(state)
+    return question, accepted, docs
+
+def _graded_update(accepted, docs, grades, llm_calls):
+    pregrade_stats.observe(docs, grades)
+    relevant = accepted + [doc for doc, is_relevant in zip(docs, grades) if is_relevant]
+    return {
+        "documents": relevant,
+        "pending_documents": [],
+        "context": "\n\n".join(doc.page_content for doc in relevant),
+        "llm_calls": llm_calls,
+    }
+
+def _concurrent_mode():
+    # GRADER_MODE=concurrent grades chunk by chunk; batch falls back to it if the batched call fails
+    return os.getenv("GRADER_MODE", "batch") == "concurrent"
+
+def grade_documents(state: GraphState):
+    """Grade the retrieved chunks one by one and keep only the relevant ones."""
+    question, accepted, docs = _to_grade(state)
+    grades = []
+    llm_calls = 0
+    if docs:
+        if _concurrent_mode():
+            grades = grade_chunks_concurrently(question, docs)
+            llm_calls = len(docs)
+        else:
+            try:
+                llm_calls = 1
+                grades = grade_chunks_batched(question, docs)
+            except Exception as e:
+                print(f"Batched grading failed ({e}), grading chunks individually")
+                grades = grade_chunks_concurrently(question, docs)
+                llm_calls += len(docs)
+    return _graded_update(accepted, docs, grades, llm_calls)
+
+async def agrade_documents(state: GraphState):
+    """Async version of grade_documents."""
+    question, accepted, docs = _to_grade(state)
+    grades = []
+    llm_calls = 0
+    if docs:
+        if _concurrent_mode():
+            grades = await agrade_chunks_concurrently(question, docs)
+            llm_calls = len(docs)
+        else:
+            try:
+                llm_calls = 1
+                grades = await agrade_chunks_batched(question, docs)
+            except Exception as e:
+                print(f"Batched grading failed ({e}), grading chunks individually")
+                grades = await agrade_chunks_concurrently(question, docs)
+                llm_calls += len(docs)
+    return _graded_update(accepted, docs, grades, llm_calls)
+
+def route_after_grading(
     state: GraphState,
 ) -> Literal["generate_answer", "rewrite_question"]:
-    """Determine whether the retrieved documents are relevant to the question."""
-    question = state["messages"][0].content
-    context = state["messages"][-1].content
-
-    prompt = GRADE_PROMPT.format(question=question, context=context)
-    response = (
-        grader_model
-        .with_structured_output(GradeDocuments).invoke(  
-            [{"role": "user", "content": prompt}]
-        )
-    )
-    score = response.binary_score
-
-    if score == "yes":
+    """Answer from the relevant chunks, or rewrite the question when none survived grading."""
+    if state.get("documents"):
         return "generate_answer"
     else:
-        return "rewrite_question"
+        return route_rewrite(state)
@@ -0,0 +1,197 @@
+"""
+Local pre-grading of retrieved chunks, before any LLM grading call
+
+Each chunk is classified from its TF-IDF similarity to the question and the
+fraction of the question's terms it contains:
+- relevant: score >= HIGH_SCORE and coverage >= HIGH_COVERAGE
+- irrelevant: score < LOW_SCORE or coverage < LOW_COVERAGE
+- ambiguous: everything in between
+
+When no chunk is ambiguous the LLM grader is skipped: the graph goes straight
+to generate_answer (some chunk is relevant) or rewrite_question (none is, and
+the rewrite budget in src/nodes/budget.py allows another attempt).
+Ambiguous chunks go to grade_documents, whose verdicts are recorded so the
+thresholds can be re-calibrated with calibrate_thresholds().
+"""
+
+import os
+import re
+import threading
+from collections import deque
+from typing import Literal
+
+from src.states.graphstate import GraphState
+from src.nodes.budget import note_retrieval, route_rewrite
+
+HIGH_SCORE = float(os.getenv("PREGRADE_HIGH_SCORE", "0.3"))
+LOW_SCORE = float(os.getenv("PREGRADE_LOW_SCORE", "0.05"))
+HIGH_COVERAGE = float(os.getenv("PREGRADE_HIGH_COVERAGE", "0.75"))
+LOW_COVERAGE = float(os.getenv("PREGRADE_LOW_COVERAGE", "0.5"))
+
+# Same token pattern as the TF-IDF vectorizer
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+
+class PreGradeStats:
+    """Counts of pre-grading decisions plus the LLM verdicts on ambiguous chunks"""
+
+    def __init__(self, max_observations=2000):
+        self._lock = threading.Lock()
+        self.retrievals = 0
+        self.skipped = 0
+        self.chunks = {"relevant": 0, "irrelevant": 0, "ambiguous": 0}
+        # (score, coverage, LLM said relevant) for chunks the LLM graded
+        self.observations = deque(maxlen=max_observations)
+
+    def record(self, labels, skipped):
+        with self._lock:
+            self.retrievals += 1
+            self.skipped += int(skipped)
+            for label in labels:
+                self.chunks[label] += 1
+
+    def observe(self, docs, grades):
+        with self._lock:
+            for doc, is_relevant in zip(docs, grades):
+                score = doc.metadata.get("score")
+                if score is not None:
+                    self.observations.append((score, doc.metadata.get("query_coverage", 0.0), bool(is_relevant)))
+
+    @property
+    def skip_rate(self):
+        return self.skipped / self.retrievals if self.retrievals else 0.0
+
+    def summary(self):
+        with self._lock:
+            return {
+                "retrievals": self.retrievals,
+                "llm_grading_skipped": self.skipped,
+                "skip_rate": self.skip_rate,
+                "chunks": dict(self.chunks),
+                "observations": len(self.observations),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.retrievals = 0
+            self.skipped = 0
+            self.chunks = {"relevant": 0, "irrelevant": 0, "ambiguous": 0}
+            self.observations.clear()
+
+
+pregrade_stats = PreGradeStats()
+
+
+def _store():
+    from src.ingetsion.retriever import create_vectorstore
+    return create_vectorstore()
+
+
+def _stop_words(store):
+    """Stop words of the store's analyzer, read without importing sklearn where possible"""
+    if hasattr(store, "index"):
+        return frozenset(store.index.analyzer_params["stop_words"])
+    embedding = getattr(getattr(store, "vectorstore", None), "embeddings", None)
+    if embedding is not None and hasattr(embedding, "vectorizer"):
+        return frozenset(embedding.vectorizer.get_stop_words() or ())
+    return frozenset()
+
+
+def query_terms(text, stop_words=frozenset()):
+    return {term for term in _TOKEN_RE.findall(text.lower()) if term not in stop_words}
+
+
+def _fill_missing_scores(question, docs, store):
+    """Compute TF-IDF cosine scores for retrievers that do not report them (Chroma)"""
+    missing = [doc for doc in docs if doc.metadata.get("score") is None]
+    embedding = getattr(getattr(store, "vectorstore", None), "embeddings", None)
+    if not missing or embedding is None or not getattr(embedding, "is_fitted", False):
+        return
+    doc_matrix = embedding.embed_documents_sparse([doc.page_content for doc in missing])
+    # Rows are L2-normalized, so the dot product is the cosine similarity
+    scores = (doc_matrix @ embedding.embed_query_sparse(question).T).toarray().ravel()
+    for doc, score in zip(missing, scores):
+        doc.metadata["score"] = float(score)
+
+
+def classify(doc, terms, high_score=None, low_score=None, high_coverage=None, low_coverage=None):
+    """Label one scored chunk "relevant", "irrelevant" or "ambiguous" and record its coverage"""
+    high_score = HIGH_SCORE if high_score is None else high_score
+    low_score = LOW_SCORE if low_score is None else low_score
+    high_coverage = HIGH_COVERAGE if high_coverage is None else high_coverage
+    low_coverage = LOW_COVERAGE if low_coverage is None else low_coverage
+
+    coverage = len(terms & set(_TOKEN_RE.findall(doc.page_content.lower()))) / len(terms) if terms else 0.0
+    doc.metadata["query_coverage"] = coverage
+    score = doc.metadata.get("score")
+    if score is None:
+        return "ambiguous"
+    if score < low_score or (terms and coverage < low_coverage):
+        return "irrelevant"
+    if score >= high_score and coverage >= high_coverage:
+        return "relevant"
+    return "ambiguous"
+
+
+def pregrade_documents(state: GraphState):
+    """Accept or reject clear-cut chunks locally; leave the ambiguous ones for the LLM grader."""
+    from src.nodes.grader import retrieved_documents
+
+    question = state["messages"][0].content
+    docs = retrieved_documents(state)
+    store = _store() if docs else None
+    if docs:
+        _fill_missing_scores(question, docs, store)
+    terms = query_terms(question, _stop_words(store) if store is not None else frozenset())
+
+    labels = [classify(doc, terms) for doc in docs]
+    relevant = [doc for doc, label in zip(docs, labels) if label == "relevant"]
+    pending = [doc for doc, label in zip(docs, labels) if label == "ambiguous"]
+    pregrade_stats.record(labels, skipped=not pending)
+    print(f"Pre-grader: {len(relevant)} relevant, {labels.count('irrelevant')} irrelevant, "
+          f"{len(pending)} ambiguous (LLM grading skipped for {pregrade_stats.skip_rate:.0%} of retrievals)")
+    return {
+        "documents": relevant,
+        "pending_documents": pending,
+        "context": "\n\n".join(doc.page_content for doc in relevant),
+        **note_retrieval(state, docs),
+    }
+
+
+def route_after_pregrading(
+    state: GraphState,
+) -> Literal["grade_documents", "generate_answer", "rewrite_question"]:
+    """Ambiguous chunks go to the LLM grader; otherwise the local verdict decides."""
+    if state.get("pending_documents"):
+        return "grade_documents"
+    if state.get("documents"):
+        return "generate_answer"
+    return route_rewrite(state)
+
+
+def calibrate_thresholds(observations=None, target_precision=0.95, min_support=20):
+    """
+    Suggest (high_score, low_score) from the LLM verdicts on ambiguous chunks.
+
+    high_score is the lowest score above which at least target_precision of the
+    graded chunks were relevant, low_score the highest score below which at
+    least target_precision were irrelevant. Either is None without enough data.
+    """
+    observations = sorted(pregrade_stats.observations if observations is None else observations)
+    scores = [score for score, _, _ in observations]
+    verdicts = [is_relevant for _, _, is_relevant in observations]
+
+    high = None
+    for i in range(len(observations) - min_support + 1):
+        above = verdicts[i:]
+        if sum(above) / len(above) >= target_precision:
+            high = scores[i]
+            break
+
+    low = None
+    for i in range(len(observations), min_support - 1, -1):
+        below = verdicts[:i]
+        if (len(below) - sum(below)) / len(below) >= target_precision:
+            low = scores[i - 1]
+            break
+    return high, low
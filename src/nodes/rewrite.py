@@ -1,7 +1,5 @@
 from src.states.graphstate import GraphState
-from src.llms.geminillm import create_geminillm
-
-llm = create_geminillm()
+from src.llms.registry import get_llm
 
 REWRITE_PROMPT = (
     "look at the input and try to reason about the underlying semantic intent / meaning. \n"
@@ -13,12 +11,34 @@ REWRITE_PROMPT = (
 )
 
 
-def rewrite_question(state: GraphState):
-    """ Rewrite the original user question"""
-    from langchain_core.messages import HumanMessage
+def _rewrite_prompt(state: GraphState):
+    # Build on the previous rewrite instead of starting over from the original
+    question = state.get("query") or state["messages"][0].content
+    return [{"role":"user", "content": REWRITE_PROMPT.format(question=question)}]
+
+
+def _rewrite_update(state: GraphState, response):
+    from langchain_core.messages import HumanMessage, RemoveMessage
     
     messages = state["messages"]
-    questoin = messages[0].content
-    prompt = REWRITE_PROMPT.format(question=questoin)
-    response = llm.invoke([{"role":"user", "content": prompt}])
-    return {"messages" : [HumanMessage(content=response.content)]}
\ No newline at end of file
+    # Keep the user's question and only the newest rewrite: the earlier tool
+    # call, retrieval and rewrite are dropped so the history stays bounded
+    stale = [RemoveMessage(id=message.id) for message in messages[1:] if message.id]
+    return {
+        "messages": stale + [HumanMessage(content=response.content)],
+        "query": response.content,
+        "rewrite_count": (state.get("rewrite_count") or 0) + 1,
+        "llm_calls": 1,
+    }
+
+
+def rewrite_question(state: GraphState):
+    """ Rewrite the latest version of the user question"""
+    response = get_llm().invoke(_rewrite_prompt(state))
+    return _rewrite_update(state, response)
+
+
+async def arewrite_question(state: GraphState):
+    """ Async version of rewrite_question"""
+    response = await get_llm().ainvoke(_rewrite_prompt(state))
+    return _rewrite_update(state, response)
\ No newline at end of file
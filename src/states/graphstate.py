@@ -1,6 +1,7 @@
 from langgraph.graph.message import add_messages
 from typing_extensions import TypedDict, Annotated
 from typing import List
+import operator
 
 
 class GraphState(TypedDict):
@@ -9,5 +10,18 @@ class GraphState(TypedDict):
     """
     messages: Annotated[List, add_messages]
     documents: List = []
+    # Chunks the local pre-grader could not decide on, awaiting the LLM grader
+    pending_documents: List = []
+    # The question as last rewritten (messages[0] stays the user's question)
     query: str = ""
     context: str = ""
+    # Loop budget bookkeeping, see src/nodes/budget.py
+    rewrite_count: int = 0
+    llm_calls: Annotated[int, operator.add] = 0
+    started_at: float = None
+    retrieved_chunk_sets: Annotated[List, operator.add] = []
+    repeated_retrieval: bool = False
+    best_documents: List = []
+    best_score: float = 0.0
+    # Set when generate_answer fell back to an error message instead of an LLM answer
+    generation_error: str = ""
@@ -0,0 +1,138 @@
+"""
+Test the semantic answer cache in front of the graph
+"""
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+from src.graph import answer_cache
+from src.graph.answer_cache import AnswerCache, CachedGraph
+from src.ingetsion.retriever import create_vectorstore
+from test_offline_rag import create_sample_documents
+import tempfile
+import time
+
+class CountingGraph:
+    """Stands in for the compiled graph: answers by echoing the question"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, inputs, config=None, **kwargs):
+        self.calls += 1
+        question = inputs["messages"][-1].content
+        return {"messages": inputs["messages"] + [AIMessage(content=f"Answer {self.calls} to: {question}")]}
+
+class FailingGraph:
+    """Answers like generate_answer does when the LLM call raised"""
+
+    def invoke(self, inputs, config=None, **kwargs):
+        return {"messages": inputs["messages"] + [AIMessage(content="The model is unavailable right now.")],
+                "generation_error": "TimeoutError: LLM request timed out"}
+
+def ask(graph, question):
+    return graph.invoke({"messages": [HumanMessage(content=question)]})
+
+def test_answer_cache_hits():
+    """Test exact and near-duplicate hits, misses and the metrics"""
+    print("🧪 Testing Semantic Answer Cache")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        inner = CountingGraph()
+        graph = CachedGraph(inner, AnswerCache(backend="inverted_index", persist_directory=directory))
+
+        first = ask(graph, "What is LangGraph?")
+        assert first["cache"] is None and inner.calls == 1
+
+        # Same question after normalization
+        result = ask(graph, "  what is   langgraph ")
+        assert result["cache"] == "exact" and inner.calls == 1
+        assert result["messages"][-1].content == first["messages"][-1].content
+
+        # Different wording, same TF-IDF vector
+        result = ask(graph, "What's LangGraph??")
+        assert result["cache"] == "similar" and inner.calls == 1
+
+        # A different question misses
+        result = ask(graph, "How do vector stores work?")
+        assert result["cache"] is None and inner.calls == 2
+
+        # Conversations with history bypass the cache
+        graph.invoke({"messages": [HumanMessage(content="What is LangGraph?"), AIMessage(content="..."),
+                                   HumanMessage(content="What is LangGraph?")]})
+        assert inner.calls == 3
+
+        stats = graph.cache.stats()
+        assert stats["exact_hits"] == 1 and stats["similar_hits"] == 1 and stats["misses"] == 2
+        assert stats["hit_rate"] == 0.5
+        print(f"✓ Cache stats: {stats}")
+
+def test_similar_hits_keep_question_words_and_negation():
+    """Test that questions differing only in a stop word the vectorizer drops do not share an answer"""
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        cache = AnswerCache(backend="inverted_index", persist_directory=directory)
+        pairs = [
+            ("what is langgraph", "where is langgraph"),
+            ("langgraph does not require langchain", "langgraph does require langchain"),
+            ("langgraph doesn't require langchain", "langgraph does require langchain"),
+        ]
+        for cached, asked in pairs:
+            # Same TF-IDF vector, so only the question words and negation tell them apart
+            cosine = cache._embed(cached).multiply(cache._embed(asked)).sum()
+            assert cosine > 0.999
+            cache.put(cached, f"Answer to: {cached}")
+            assert cache.get(asked) == (None, None)
+        assert cache.get("langgraph does not require langchain!")[1] == "exact"
+        assert cache.get("langgraph doesn't require langchain?")[1] == "exact"
+        assert cache.get("langgraph cannot require langchain")[1] == "similar"
+    print(f"✓ {len(pairs)} stop-word variants missed instead of sharing an answer")
+
+def test_answer_cache_eviction_and_invalidation():
+    """Test LRU eviction, TTL expiry and invalidation when the index changes"""
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        cache = AnswerCache(max_entries=2, ttl_seconds=0.2, similarity_threshold=None,
+                            backend="inverted_index", persist_directory=directory)
+
+        cache.put("What is LangGraph?", "graphs")
+        cache.put("What is LangChain?", "chains")
+        assert cache.get("What is LangGraph?")[0] == "graphs"
+        cache.put("What are retrievers?", "retrievers")
+        # LangChain was the least recently used
+        assert cache.get("What is LangChain?") == (None, None)
+        assert cache.metrics["evictions"] == 1
+
+        time.sleep(0.3)
+        assert cache.get("What is LangGraph?") == (None, None)
+        assert cache.metrics["expirations"] == 2
+
+        cache.ttl_seconds = 60
+        cache.put("What is LangGraph?", "graphs")
+        original_interval = answer_cache.VERSION_CHECK_INTERVAL
+        answer_cache.VERSION_CHECK_INTERVAL = 0
+        try:
+            time.sleep(0.01)
+            create_vectorstore(
+                [Document(page_content="LangGraph applications build agent workflows.", metadata={"source": "new"})],
+                persist_directory=directory, force_reload=True, backend="inverted_index",
+            )
+            assert cache.get("What is LangGraph?") == (None, None)
+            assert cache.metrics["invalidations"] == 1
+        finally:
+            answer_cache.VERSION_CHECK_INTERVAL = original_interval
+
+        # Answers generated from an LLM error are never cached, whatever their wording
+        failing = CachedGraph(FailingGraph(), cache)
+        assert ask(failing, "Why?")["cache"] is None and ask(failing, "Why?")["cache"] is None
+        assert cache.get("Why?") == (None, None)
+    print("✓ Eviction, expiry and index-version invalidation work")
+
+if __name__ == "__main__":
+    test_answer_cache_hits()
+    test_similar_hits_keep_question_words_and_negation()
+    test_answer_cache_eviction_and_invalidation()
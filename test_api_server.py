@@ -0,0 +1,115 @@
+"""
+Test the HTTP API with stubbed LLMs: JSON and streaming answers, backpressure, retrieval batching
+"""
+
+from aiohttp.test_utils import TestClient, TestServer
+from conftest import LATENCY, QUESTION, register_fake_llms
+from src.api.server import BATCHER, GRAPH, create_app
+from src.graph.answer_cache import AnswerCache
+from src.ingetsion.retriever import create_vectorstore
+from src.llms import registry
+from test_offline_rag import create_sample_documents
+import asyncio
+import json
+import tempfile
+import time
+
+def with_api(check, latency=LATENCY, **app_kwargs):
+    """Run check(client, router, app) against a test server backed by fake LLMs"""
+    async def run():
+        router, _ = register_fake_llms(latency)
+        app_kwargs.setdefault("use_cache", False)
+        app = create_app(**app_kwargs)
+        async with TestClient(TestServer(app)) as client:
+            return await check(client, router, app)
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        try:
+            return asyncio.run(run())
+        finally:
+            registry.reset_registry()
+
+def test_ask_and_stream():
+    """Test the JSON endpoint, the NDJSON streaming endpoint and input validation"""
+    print("🧪 Testing HTTP API")
+    print("=" * 50)
+
+    async def check(client, router, app):
+        response = await client.post("/ask", json={"question": QUESTION})
+        assert response.status == 200
+        body = await response.json()
+        assert body["answer"].startswith("Vector stores")
+        assert body["sources"] == ["vector_stores"]
+        assert body["nodes"] == ["generate_query_or_respond", "retrieve", "pregrade_documents", "generate_answer"]
+        assert 0 < body["ttft"] <= body["total"]
+
+        response = await client.post("/ask/stream", json={"question": QUESTION})
+        assert response.status == 200
+        events = [json.loads(line) for line in (await response.text()).splitlines()]
+        assert [e["node"] for e in events if e["event"] == "node"] == body["nodes"]
+        assert any(e["event"] == "token" for e in events)
+        assert events[-1]["event"] == "done" and events[-1]["answer"] == body["answer"]
+
+        response = await client.post("/ask", json={"question": "  "})
+        assert response.status == 400
+        print(f"✓ Answered in {body['total'] * 1000:.0f}ms through {len(body['nodes'])} nodes")
+
+    with_api(check)
+
+def test_backpressure():
+    """Test that requests beyond the concurrency limit and queue are rejected with 503"""
+    async def check(client, router, app):
+        responses = await asyncio.gather(*(client.post("/ask", json={"question": QUESTION}) for _ in range(8)))
+        statuses = sorted(response.status for response in responses)
+        assert statuses.count(200) == 3 and statuses.count(503) == 5
+        assert all(r.headers.get("Retry-After") == "1" for r in responses if r.status == 503)
+        assert router.max_in_flight <= 2
+        health = await (await client.get("/health")).json()
+        assert health["rejected"] == 5 and health["in_flight"] == 0
+        print(f"✓ {statuses.count(503)} of 8 requests shed with 503")
+
+    with_api(check, latency=0.2, max_concurrency=2, max_queue=1)
+
+def test_retrieval_is_micro_batched():
+    """Test that concurrent requests share vectorized retrieval batches"""
+    async def check(client, router, app):
+        n = 12
+        responses = await asyncio.gather(*(client.post("/ask", json={"question": QUESTION}) for _ in range(n)))
+        assert all(response.status == 200 for response in responses)
+        stats = app[BATCHER].stats
+        assert stats["queries"] == n and stats["batches"] < n and stats["largest_batch"] > 1
+        print(f"✓ {stats['queries']} retrievals in {stats['batches']} batches")
+
+    with_api(check, max_concurrency=16)
+
+class SlowAnswerCache(AnswerCache):
+    """Lookups take as long as a first lookup that loads the fitted vectorizer"""
+
+    def get(self, question):
+        time.sleep(0.3)
+        return super().get(question)
+
+def test_cache_lookup_does_not_block_the_loop():
+    """Test that other requests are served while a slow answer cache lookup runs"""
+    async def check(client, router, app):
+        app[GRAPH].cache = SlowAnswerCache(similarity_threshold=None)
+        start = time.perf_counter()
+        pending = asyncio.ensure_future(client.post("/ask", json={"question": QUESTION}))
+        await asyncio.sleep(0.05)
+        assert (await client.get("/health")).status == 200
+        # A lookup on the event loop would hold /health back until it finished
+        health_time = time.perf_counter() - start
+        assert health_time < 0.25
+        assert (await (await pending).json())["cache"] is None
+        assert (await (await client.post("/ask", json={"question": QUESTION})).json())["cache"] == "exact"
+        print(f"✓ /health answered in {health_time * 1000:.0f}ms during a 300ms cache lookup")
+
+    with_api(check, use_cache=True)
+
+if __name__ == "__main__":
+    test_ask_and_stream()
+    test_backpressure()
+    test_retrieval_is_micro_batched()
+    test_cache_lookup_does_not_block_the_loop()
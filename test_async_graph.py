@@ -0,0 +1,74 @@
+"""
+Test the async graph: many questions served concurrently on one event loop
+"""
+
+from conftest import LATENCY, QUESTION, TEXTS, make_state, register_fake_llms
+from langchain_core.messages import HumanMessage
+from src.ingetsion.retriever import create_vectorstore
+from src.llms import registry
+from src.llms.fake_llm import FakeChatModel
+from src.models.grader import GradeDocuments
+from src.nodes.grader import agrade_chunks_concurrently
+from test_offline_rag import create_sample_documents
+import asyncio
+import tempfile
+import time
+
+async def ask(graph):
+    result = await graph.ainvoke({"messages": [HumanMessage(content=QUESTION)]})
+    return result["messages"][-1].content
+
+async def run_sequentially(graph, n):
+    return [await ask(graph) for _ in range(n)]
+
+async def run_concurrently(graph, n):
+    return await asyncio.gather(*(ask(graph) for _ in range(n)))
+
+def test_async_graph_serves_questions_concurrently():
+    """Test that concurrent ainvoke calls overlap their LLM waits on a single event loop"""
+    print("🧪 Testing Async Graph Concurrency")
+    print("=" * 50)
+
+    from src.graph.graph_builder import async_graph
+
+    n = 20
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        router, llm = register_fake_llms()
+        try:
+            start = time.perf_counter()
+            sequential = asyncio.run(run_sequentially(async_graph, n))
+            sequential_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            concurrent = asyncio.run(run_concurrently(async_graph, n))
+            concurrent_time = time.perf_counter() - start
+        finally:
+            registry.reset_registry()
+
+    assert sequential == concurrent
+    assert all(answer.startswith("Vector stores") for answer in concurrent)
+    # Two LLM calls per question: retrieve decision and answer
+    assert router.calls == llm.calls == 2 * n
+    assert router.max_in_flight > n // 2 and llm.max_in_flight > n // 2
+    assert concurrent_time < sequential_time / 4
+    print(f"✓ {n} questions: {sequential_time:.2f}s one after another, "
+          f"{concurrent_time:.2f}s concurrently ({sequential_time / concurrent_time:.1f}x)")
+
+def test_async_concurrent_grading_is_capped():
+    """Test that async per-chunk grading overlaps calls up to the concurrency cap"""
+    grader = FakeChatModel(latency=LATENCY)
+    registry.reset_registry()
+    registry.register("grader_llm", grader.with_structured_output(GradeDocuments))
+    try:
+        docs = make_state(TEXTS * 3)["messages"][-1].artifact
+        grades = asyncio.run(agrade_chunks_concurrently("What is LangGraph?", docs, max_workers=4))
+    finally:
+        registry.reset_registry()
+    assert grades == [("LangGraph" in doc.page_content) for doc in docs]
+    assert grader.max_in_flight == 4
+
+if __name__ == "__main__":
+    test_async_graph_serves_questions_concurrently()
+    test_async_concurrent_grading_is_capped()
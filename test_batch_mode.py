@@ -0,0 +1,141 @@
+"""
+Test batch question answering: JSONL/CSV input, JSONL output and resuming after a crash
+"""
+
+from conftest import LATENCY, register_fake_llms
+from src.graph.batch_runner import build_batch_graph, completed_ids, load_questions, run_batch_file
+from src.ingetsion.retriever import create_vectorstore
+from src.llms import registry
+from src.llms.fake_llm import FakeChatModel
+from src.models.grader import ChunkGrades
+from test_offline_rag import create_sample_documents
+import json
+import os
+import tempfile
+
+QUESTIONS = [
+    "How do vector stores enable semantic search?",
+    "What is LangGraph?",
+    "How are documents graded for relevance?",
+    "What are LangChain components?",
+] * 3
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+class FakeAsyncChunkGrader:
+    """Batched grader: the first chunk is always relevant"""
+
+    async def ainvoke(self, messages):
+        return ChunkGrades(relevant=[1])
+
+class FlakyChatModel(FakeChatModel):
+    """Answer model whose first `failures` calls time out"""
+
+    failures: int = 0
+
+    def _respond(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError("LLM request timed out")
+        return super()._respond(*args, **kwargs)
+
+def with_stub_llms(run, llm=None):
+    router, _ = register_fake_llms()
+    if llm is not None:
+        registry.register("llm", llm)
+    registry.register("chunk_grader_llm", FakeAsyncChunkGrader())
+    try:
+        return run(), router
+    finally:
+        registry.reset_registry()
+
+def test_batch_answers_and_resume():
+    """Test the output records and that a rerun only answers what is missing"""
+    print("🧪 Testing Batch Mode")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        input_path = os.path.join(directory, "questions.jsonl")
+        with open(input_path, "w", encoding="utf-8") as f:
+            for i, question in enumerate(QUESTIONS):
+                f.write(json.dumps({"id": f"q{i}", "question": question}) + "\n")
+
+        summary, router = with_stub_llms(lambda: run_batch_file(input_path, parallelism=4))
+        output_path = os.path.join(directory, "questions.answers.jsonl")
+        records = read_records(output_path)
+        assert summary["answered"] == len(QUESTIONS) and summary["failed"] == 0
+        assert router.max_in_flight == 4
+        assert sorted(r["id"] for r in records) == sorted(f"q{i}" for i in range(len(QUESTIONS)))
+        first = next(r for r in records if r["id"] == "q0")
+        assert first["answer"].startswith("Vector stores")
+        assert first["sources"][0] == "vector_stores"
+        assert first["nodes"] == ["generate_query_or_respond", "retrieve", "generate_answer"]
+        assert set(first["timings"]) == set(first["nodes"])
+        assert sum(first["timings"].values()) <= first["total"]
+
+        # Simulate a crash: keep five answers, a failed one and a torn last line
+        with open(output_path, "w", encoding="utf-8") as f:
+            for record in records[:5]:
+                f.write(json.dumps(record) + "\n")
+            f.write(json.dumps({"id": records[5]["id"], "question": "...", "error": "timeout"}) + "\n")
+            f.write('{"id": "q1')
+        assert completed_ids(output_path) == {r["id"] for r in records[:5]}
+
+        summary, router = with_stub_llms(lambda: run_batch_file(input_path, parallelism=4))
+        assert summary["skipped"] == 5 and summary["answered"] == len(QUESTIONS) - 5
+        assert router.calls == len(QUESTIONS) - 5
+        answered = {r["id"] for r in read_records(output_path) if "error" not in r}
+        assert answered == {f"q{i}" for i in range(len(QUESTIONS))}
+    print(f"✓ Resumed after a crash, {summary['answered']} questions rerun")
+
+def test_llm_failures_are_retried_on_resume():
+    """Test that answers generated from an LLM error are marked failed and rerun by a resumed batch"""
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        input_path = os.path.join(directory, "questions.jsonl")
+        with open(input_path, "w", encoding="utf-8") as f:
+            for i, question in enumerate(QUESTIONS[:4]):
+                f.write(json.dumps({"id": f"q{i}", "question": question}) + "\n")
+        output_path = os.path.join(directory, "out.jsonl")
+
+        summary, _ = with_stub_llms(lambda: run_batch_file(input_path, output_path, parallelism=1),
+                                    llm=FlakyChatModel(latency=LATENCY, failures=2))
+        records = read_records(output_path)
+        assert summary["answered"] == 2 and summary["failed"] == 2
+        failed = [r for r in records if "error" in r]
+        assert all(r["error"] == "TimeoutError: LLM request timed out" for r in failed)
+        assert all(r["answer"].startswith("I encountered an error") for r in failed)
+        assert completed_ids(output_path) == {r["id"] for r in records if "error" not in r}
+
+        summary, router = with_stub_llms(lambda: run_batch_file(input_path, output_path, parallelism=1))
+        assert summary["skipped"] == 2 and summary["answered"] == 2 and router.calls == 2
+        assert completed_ids(output_path) == {"q0", "q1", "q2", "q3"}
+    print("✓ 2 answers from LLM errors marked failed and rerun on resume")
+
+def test_csv_input_and_full_graph():
+    """Test CSV input without ids and the full graph with grading"""
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        input_path = os.path.join(directory, "questions.csv")
+        with open(input_path, "w", encoding="utf-8", newline="") as f:
+            f.write("question\n" + "\n".join(f'"{q}"' for q in QUESTIONS[:3]) + "\n")
+        assert [q["id"] for q in load_questions(input_path)] == ["0", "1", "2"]
+
+        output_path = os.path.join(directory, "out.jsonl")
+        summary, _ = with_stub_llms(
+            lambda: run_batch_file(input_path, output_path, graph=build_batch_graph("full"), parallelism=2)
+        )
+        records = read_records(output_path)
+    assert summary["answered"] == 3
+    assert all("pregrade_documents" in r["nodes"] and r["llm_calls"] >= 2 for r in records)
+
+if __name__ == "__main__":
+    test_batch_answers_and_resume()
+    test_llm_failures_are_retried_on_resume()
+    test_csv_input_and_full_graph()
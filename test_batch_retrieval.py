@@ -0,0 +1,117 @@
+"""
+Test vectorized batch retrieval against one-query-at-a-time retrieval
+"""
+
+from src.ingetsion.batch_retriever import retrieve_batch, search_batch
+from src.ingetsion.evaluation import evaluate_retrieval
+from src.ingetsion.retriever import create_embedding, create_vectorstore
+from src.ingetsion.sparse_retriever import SparseTfidfRetriever
+from test_offline_rag import create_sample_documents
+from langchain_core.documents import Document
+import numpy as np
+import tempfile
+
+QUERIES = [
+    "What is LangGraph?",
+    "How do vector stores enable semantic search?",
+    "Kubernetes autoscaling",
+    "LangChain components",
+    "How are documents graded for relevance?",
+]
+
+def sources(hits):
+    return [doc.metadata["source"] for doc, _ in hits]
+
+def single_query_hits(retriever, query):
+    """Per-query results, without the zero-score padding batch retrieval leaves out"""
+    return [(doc, doc.metadata["score"]) for doc in retriever.invoke(query) if doc.metadata["score"] > 0]
+
+def check_matches_single_queries(backend):
+    with tempfile.TemporaryDirectory() as directory:
+        retriever = create_vectorstore(create_sample_documents(), persist_directory=directory,
+                                       force_reload=True, backend=backend)
+        batched = search_batch(QUERIES, store=retriever)
+        if backend == "inverted_index":
+            expected = [single_query_hits(retriever, query) for query in QUERIES]
+        else:
+            # Chroma returns no scores; the batch path computes exact cosine scores for its hits
+            expected = [[(doc, None) for doc in retriever.invoke(query)] for query in QUERIES]
+
+    assert len(batched) == len(QUERIES)
+    for hits, single in zip(batched, expected):
+        assert sources(hits) == sources(single)[:len(hits)]
+        assert all(score > 0 for _, score in hits)
+        if backend == "inverted_index":
+            assert [round(s, 5) for _, s in hits] == [round(s, 5) for _, s in single]
+    assert batched[2] == []
+
+def test_batch_matches_single_queries():
+    """Test that both backends return the per-query top-k from one batched call"""
+    print("🧪 Testing Batch Retrieval")
+    print("=" * 50)
+    for backend in ("inverted_index", "chroma"):
+        check_matches_single_queries(backend)
+        print(f"✓ {backend}: {len(QUERIES)} queries in one batch")
+
+def test_inverted_index_query_matrix():
+    """Test that the batched query matrix equals the per-query vectors and the document matrix is reused"""
+    with tempfile.TemporaryDirectory() as directory:
+        index = create_vectorstore(create_sample_documents(), persist_directory=directory,
+                                   force_reload=True, backend="inverted_index").index
+        queries = QUERIES + ["", "vector stores vector stores"]
+        matrix = index.query_matrix(queries)
+        for row, query in enumerate(queries):
+            term_ids, weights = index.query_vector(query)
+            expected = np.zeros(len(index.vocabulary), dtype=np.float32)
+            expected[term_ids] = weights
+            assert np.array_equal(matrix[row].toarray().ravel(), expected)
+
+        doc_matrix = index.doc_matrix()
+        index.search_batch(QUERIES)
+        assert index.doc_matrix() is doc_matrix
+
+        # update() returns a new index whose matrix includes the added document
+        embedding = create_embedding(directory)
+        embedding.load_cache()
+        added = Document(page_content="Vector stores, vector stores", metadata={"chunk_id": "k8s"})
+        updated = index.update(embedding, [added])
+        assert updated.doc_matrix().shape[0] == len(index) + 1 and index.doc_matrix() is doc_matrix
+        assert updated.search_batch(["vector stores"], k=1)[0][0][0].metadata["chunk_id"] == "k8s"
+    print(f"✓ {len(queries)} queries vectorized in one pass, document matrix built once per index")
+
+def test_sparse_retriever_batch():
+    """Test the sparse TF-IDF retriever's batch search and the scored documents"""
+    documents = create_sample_documents()
+    with tempfile.TemporaryDirectory() as directory:
+        embedding = create_embedding(directory)
+        embedding.fit([doc.page_content for doc in documents])
+        retriever = SparseTfidfRetriever.from_documents(documents, embedding, k=3)
+        batched = retriever.similarity_search_batch(QUERIES)
+        for query, hits in zip(QUERIES, batched):
+            assert hits == retriever.similarity_search_with_score(query)
+
+        scored = retrieve_batch(QUERIES[:2], store=retriever)
+        assert [doc.metadata["score"] for doc in scored[0]] == [score for _, score in batched[0]]
+    assert retrieve_batch([], store=retriever) == []
+
+def test_evaluate_retrieval():
+    """Test hit rate and MRR on labelled questions"""
+    with tempfile.TemporaryDirectory() as directory:
+        retriever = create_vectorstore(create_sample_documents(), persist_directory=directory,
+                                       force_reload=True, backend="inverted_index")
+        examples = [
+            {"question": "How do vector stores enable semantic search?", "sources": ["vector_stores"]},
+            {"question": "What is LangGraph?", "sources": ["langgraph_nodes"]},
+            {"question": "Kubernetes autoscaling", "sources": ["vector_stores"]},
+        ]
+        report = evaluate_retrieval(examples, k=2, batch_size=2, store=retriever)
+    assert report["questions"] == 3
+    assert abs(report["hit_rate"] - 2 / 3) < 1e-9
+    assert abs(report["mrr"] - (1 + 1 / 2) / 3) < 1e-9
+    print(f"✓ Hit rate {report['hit_rate']:.0%}, MRR {report['mrr']:.2f}")
+
+if __name__ == "__main__":
+    test_batch_matches_single_queries()
+    test_inverted_index_query_matrix()
+    test_sparse_retriever_batch()
+    test_evaluate_retrieval()
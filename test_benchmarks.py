@@ -0,0 +1,74 @@
+"""
+Test the benchmark suite on small synthetic corpora
+"""
+
+from conftest import BYTE_ENCODING
+from src.benchmarks.corpus import synthetic_chunks, synthetic_queries, synthetic_texts
+from src.benchmarks.suite import bench_graph, bench_size, bench_split, compare, run_suite
+import json
+
+def test_synthetic_corpus_is_deterministic():
+    """Test that the same seed gives the same corpus and queries match their chunks"""
+    print("🧪 Testing Benchmark Suite")
+    print("=" * 50)
+    texts = synthetic_texts(50, words_per_chunk=40)
+    assert texts == synthetic_texts(50, words_per_chunk=40)
+    assert texts != synthetic_texts(50, words_per_chunk=40, seed=1)
+    assert all(len(text.split(" ")) == 40 for text in texts)
+    queries = synthetic_queries(texts, 10)
+    assert all(queries) and queries == synthetic_queries(texts, 10)
+    assert synthetic_chunks(20)[19].metadata["source"] == "synthetic-1"
+    print(f"✓ Deterministic corpus, e.g. query '{queries[0]}'")
+
+def test_ingestion_and_retrieval_benchmarks():
+    """Test the per-size measurements and the split benchmark"""
+    result = bench_size(300, n_queries=50)
+    assert result["fit"]["chunks_per_second"] > 0 and result["transform"]["seconds"] > 0
+    assert result["index_build"]["load_seconds"] >= 0
+    retrieval = result["retrieval"]
+    assert retrieval["hit_fraction"] > 0.9
+    assert retrieval["p50_ms"] <= retrieval["p95_ms"] <= retrieval["p99_ms"]
+    assert retrieval["peak_rss_mb"] > 0
+
+    split = bench_split(5, encoding=BYTE_ENCODING)
+    assert split["chunks"] > 5 and split["pages_per_second"] > 0
+    print(f"✓ 300 chunks: retrieval p50 {retrieval['p50_ms']:.2f}ms, fit {result['fit']['seconds']:.2f}s")
+
+def test_graph_paths():
+    """Test graph latency grouped by node path, including the off-topic rewrite path"""
+    from src.ingetsion import retriever
+
+    shared = object()
+    retriever._vectorstore_cache, retriever._vectorstore_key = shared, ("chroma", "shared")
+    try:
+        result = bench_graph(n_chunks=200, n_questions=12, llm_latency_ms=2)
+        # The benchmark's temporary store does not stay cached after its directory is deleted
+        assert retriever._vectorstore_cache is shared and retriever._vectorstore_key == ("chroma", "shared")
+    finally:
+        retriever._vectorstore_cache = retriever._vectorstore_key = None
+    assert sum(path["count"] for path in result["paths"].values()) == 12
+    assert any("rewrite_question" in path for path in result["paths"])
+    assert all(path["p50_ms"] >= 2 and "generate_answer" in path["nodes_mean_ms"] for path in result["paths"].values())
+    print(f"✓ {len(result['paths'])} node paths, overall p50 {result['p50_ms']:.1f}ms")
+
+def test_results_compare():
+    """Test that the JSON results round-trip and that slowdowns are reported as regressions"""
+    results = json.loads(json.dumps(run_suite(sizes=[200], n_queries=20, split_pages=0, graph_questions=0)))
+    assert set(results) == {"meta", "sizes"}
+    assert compare(results, results) == []
+
+    slower = json.loads(json.dumps(results))
+    slower["sizes"]["200"]["retrieval"]["p95_ms"] *= 2
+    slower["sizes"]["200"]["fit"]["chunks_per_second"] /= 2
+    slower["sizes"]["200"]["retrieval"]["queries"] *= 2
+    regressions = compare(results, slower)
+    assert len(regressions) == 2
+    assert any(line.startswith("sizes.200.retrieval.p95_ms") for line in regressions)
+    assert any(line.startswith("sizes.200.fit.chunks_per_second") for line in regressions)
+    print(f"✓ {len(regressions)} regressions found")
+
+if __name__ == "__main__":
+    test_synthetic_corpus_is_deterministic()
+    test_ingestion_and_retrieval_benchmarks()
+    test_graph_paths()
+    test_results_compare()
@@ -0,0 +1,91 @@
+"""
+Test context packing: merging overlapping chunks, dropping duplicates and the token budget
+"""
+
+from conftest import BYTE_ENCODING
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+from src.ingetsion.text_splitter import split_texts
+from src.llms import registry
+from src.llms.tokens import count_tokens
+from src.nodes.context_packing import pack_context
+from src.nodes.generate import generate_answer
+
+PAGE = " ".join(
+    f"Sentence {i} explains how LangGraph checkpoints store the state of step {i}."
+    for i in range(40)
+)
+
+def page_chunks(keep_offsets=True):
+    chunks = split_texts([Document(page_content=PAGE, metadata={"source": "checkpoints"})], mode="token",
+                         workers=1, chunk_size=200, chunk_overlap=50, encoding=BYTE_ENCODING)
+    if not keep_offsets:
+        for chunk in chunks:
+            del chunk.metadata["start_index"]
+    return chunks
+
+def test_overlapping_chunks_are_merged():
+    """Test that neighbouring chunks of a page are merged back, with and without offsets"""
+    print("🧪 Testing Context Packing")
+    print("=" * 50)
+    for keep_offsets in (True, False):
+        chunks = page_chunks(keep_offsets)
+        assert len(chunks) > 3
+        # Retrieval order is not page order
+        context, stats = pack_context(chunks[::-1], token_budget=10000)
+        assert stats["merged"] == len(chunks) - 1 and stats["passages"] == 1
+        assert context == PAGE
+        assert stats["tokens_out"] < stats["tokens_in"]
+    print(f"✓ {len(chunks)} chunks merged into one passage, "
+          f"~{stats['tokens_in']} -> ~{stats['tokens_out']} tokens")
+
+def test_duplicates_order_and_budget():
+    """Test near-duplicate removal, relevance order and cutting the last passage to the budget"""
+    text = ("Vector stores index embeddings so that similar chunks can be found quickly. "
+            "Chroma keeps the vectors on disk and loads them when the app starts. "
+            "Each query is embedded with the same model and compared by cosine similarity. "
+            "The closest chunks are returned together with their metadata and source.")
+    docs = [
+        Document(page_content="LangChain provides document loaders for web pages.", metadata={"source": "a", "score": 0.2}),
+        Document(page_content=text, metadata={"source": "b", "score": 0.9}),
+        Document(page_content=text.replace("quickly", "fast"), metadata={"source": "c", "score": 0.5}),
+        Document(page_content="similar chunks can be found quickly", metadata={"source": "d", "score": 0.4}),
+    ]
+    context, stats = pack_context(docs, token_budget=1000)
+    assert stats["duplicates"] == 2 and stats["passages"] == 2
+    assert context.split("\n\n") == [text.strip(), docs[0].page_content]
+
+    long_doc = Document(page_content=" ".join(f"Point {i} about retrieval." for i in range(200)),
+                        metadata={"source": "e", "score": 0.1})
+    context, stats = pack_context(docs + [long_doc], token_budget=200)
+    assert stats["truncated"] == 1 and count_tokens(context) <= 200
+    assert context.endswith("retrieval.")
+    print(f"✓ {stats['duplicates']} duplicates dropped, context cut to ~{stats['tokens_out']} tokens")
+
+class CapturingLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages)
+        return AIMessage(content="Checkpoints store the state.")
+
+def test_generate_answer_uses_packed_context():
+    """Test that generate_answer prompts with the packed context of the graded chunks"""
+    chunks = page_chunks()
+    llm = CapturingLLM()
+    registry.reset_registry()
+    registry.register("llm", llm)
+    try:
+        update = generate_answer({"messages": [HumanMessage(content="How are checkpoints stored?")],
+                                  "documents": chunks + chunks[:1]})
+    finally:
+        registry.reset_registry()
+    assert update["messages"][-1].content == "Checkpoints store the state."
+    prompt = llm.prompts[0][-1].content
+    assert prompt == f"Context: {PAGE}\n\nQuestion: How are checkpoints stored?"
+
+if __name__ == "__main__":
+    test_overlapping_chunks_are_merged()
+    test_duplicates_order_and_budget()
+    test_generate_answer_uses_packed_context()
@@ -0,0 +1,92 @@
+"""
+Test concurrent, cached web document loading against a local HTTP server
+"""
+
+from conftest import PAGE_DELAY, DocsHandler, start_server
+from src.ingetsion.document_loaders import load_web_documents
+from src.ingetsion.web_fetcher import fetch_urls, HostRateLimiter
+import socket
+import tempfile
+import threading
+import time
+
+def test_parallel_cached_loading():
+    """Test that pages load concurrently and unchanged pages come back as 304s"""
+    print("🧪 Testing Parallel Cached Document Loading")
+    print("=" * 50)
+
+    server = start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/page/{i}" for i in range(8)] + [f"{base}/missing"]
+    DocsHandler.requests_seen.clear()
+
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            start = time.perf_counter()
+            docs = load_web_documents(urls, max_workers=8, per_host_interval=0, cache_dir=cache_dir)
+            elapsed = time.perf_counter() - start
+            print(f"⏱️  First load: {elapsed:.2f}s")
+
+            assert [doc.metadata["source"] for doc in docs] == urls[:8]
+            assert docs[0].metadata["title"] == "Page /page/0"
+            assert docs[0].metadata["language"] == "en"
+            assert "Documentation for /page/0" in docs[0].page_content
+            # Serial fetching would take at least 9 * PAGE_DELAY
+            assert elapsed < 9 * PAGE_DELAY
+
+            DocsHandler.requests_seen.clear()
+            cached_docs = load_web_documents(urls, max_workers=8, per_host_interval=0, cache_dir=cache_dir)
+            conditional = [etag for path, etag in DocsHandler.requests_seen if path != "/missing"]
+            assert len(conditional) == 8 and all(conditional)
+            assert [doc.page_content for doc in cached_docs] == [doc.page_content for doc in docs]
+
+            DocsHandler.requests_seen.clear()
+            results = fetch_urls(urls[:8], per_host_interval=0, cache_dir=cache_dir, max_age=3600)
+            assert all(result.from_cache for result in results)
+            assert DocsHandler.requests_seen == []
+            print("✓ Fresh cache entries are served without any request")
+    finally:
+        server.shutdown()
+
+def test_stale_copy_on_connection_error():
+    """Test that a cached page is served stale when the server is down, and an uncached one fails"""
+    server = start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    with tempfile.TemporaryDirectory() as cache_dir:
+        fresh = fetch_urls([f"{base}/page/1"], per_host_interval=0, cache_dir=cache_dir)[0]
+        server.shutdown()
+        server.server_close()
+        # Nothing listens on the port any more, so connecting is refused
+        with socket.socket() as probe:
+            assert probe.connect_ex(server.server_address) != 0
+        stale, missing = fetch_urls([f"{base}/page/1", f"{base}/page/2"], per_host_interval=0, cache_dir=cache_dir)
+
+    assert stale.error is None and stale.stale and stale.from_cache
+    assert stale.html == fresh.html
+    assert missing.error and missing.html is None and not missing.stale
+    print("✓ Cached page served stale while the server was down")
+
+def test_host_rate_limiter():
+    """Test that request starts to one host are spaced out"""
+    limiter = HostRateLimiter(min_interval=0.05)
+    starts = []
+
+    def worker():
+        limiter.wait("http://example.test/page")
+        starts.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    starts.sort()
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    print(f"⏱️  Gaps between requests: {[round(gap, 3) for gap in gaps]}")
+    assert all(gap >= 0.04 for gap in gaps)
+
+if __name__ == "__main__":
+    test_parallel_cached_loading()
+    test_stale_copy_on_connection_error()
+    test_host_rate_limiter()
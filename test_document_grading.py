@@ -0,0 +1,82 @@
+"""
+Test per-chunk document grading with stub grader models
+"""
+
+from conftest import StubChunkGrader, TEXTS, make_state
+from src.llms import registry
+from src.models.grader import GradeDocuments
+from src.nodes.grader import grade_documents, route_after_grading
+import threading
+import time
+
+class StubGrader:
+    """Per-chunk grader: a chunk is relevant when it mentions LangGraph; tracks concurrency"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def invoke(self, messages):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+        document = messages[0]["content"].split("Here is the user question")[0]
+        return GradeDocuments(binary_score="yes" if "LangGraph" in document else "no")
+
+def test_batched_grading_filters_chunks():
+    """Test that one batched call grades every chunk and only relevant ones are kept"""
+    print("🧪 Testing Batched Document Grading")
+    print("=" * 50)
+
+    chunk_grader = StubChunkGrader(relevant=[1, 3])
+    registry.reset_registry()
+    registry.register("chunk_grader_llm", chunk_grader)
+    try:
+        update = grade_documents(make_state(TEXTS))
+    finally:
+        registry.reset_registry()
+
+    assert len(chunk_grader.prompts) == 1
+    assert all(f"[{i}] {text}" in chunk_grader.prompts[0] for i, text in enumerate(TEXTS, 1))
+    assert [doc.metadata["source"] for doc in update["documents"]] == ["doc-0", "doc-2"]
+    assert update["context"] == f"{TEXTS[0]}\n\n{TEXTS[2]}"
+    assert route_after_grading(update) == "generate_answer"
+    print(f"✓ Kept {len(update['documents'])} of {len(TEXTS)} chunks")
+
+def test_concurrent_fallback_and_rewrite_route():
+    """Test the capped per-chunk fallback and the rewrite route when nothing is relevant"""
+    grader = StubGrader()
+    registry.reset_registry()
+    registry.register("chunk_grader_llm", StubChunkGrader(fail=True))
+    registry.register("grader_llm", grader)
+    try:
+        texts = TEXTS * 3
+        update = grade_documents(make_state(texts))
+        assert len(update["documents"]) == 6
+        assert 1 < grader.max_in_flight <= 4
+
+        update = grade_documents(make_state(["Pinecone is a hosted vector database."]))
+        assert update["documents"] == [] and update["context"] == ""
+        assert route_after_grading(update) == "rewrite_question"
+    finally:
+        registry.reset_registry()
+    print(f"✓ Fallback graded with at most {grader.max_in_flight} calls in flight")
+
+def test_graph_has_grading_node():
+    """Test that retrieval flows through the grading nodes"""
+    from src.graph.graph_builder import graph
+
+    edges = {(edge.source, edge.target) for edge in graph.get_graph().edges}
+    assert ("retrieve", "pregrade_documents") in edges
+    assert ("pregrade_documents", "grade_documents") in edges
+    assert ("grade_documents", "generate_answer") in edges
+    assert ("grade_documents", "rewrite_question") in edges
+
+if __name__ == "__main__":
+    test_batched_grading_filters_chunks()
+    test_concurrent_fallback_and_rewrite_route()
+    test_graph_has_grading_node()
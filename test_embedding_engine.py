@@ -0,0 +1,145 @@
+"""
+Test the embedding engine: length-bucketed batches, the persistent vector cache and rebuilds
+"""
+
+from conftest import HashingEmbeddings, corpus
+from src.ingetsion.retriever import create_vectorstore
+from src.llms import embedding_engine, registry
+from src.llms.embedding_engine import EmbeddingCache, EmbeddingEngine, text_key
+import numpy as np
+import os
+import shutil
+import tempfile
+
+class FakeEncoder:
+    """sentence-transformers style encode() that records the batches it was given"""
+
+    max_seq_length = 256
+
+    def __init__(self):
+        self.hashing = HashingEmbeddings()
+        self.batches = []
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy, show_progress_bar):
+        assert batch_size == len(texts) and normalize_embeddings and convert_to_numpy
+        self.batches.append(list(texts))
+        return np.array(self.hashing.embed_documents(texts), dtype=np.float32)
+
+def texts(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [" ".join(f"word{rng.integers(1000)}" for _ in range(rng.integers(5, 400))) for _ in range(n)]
+
+def test_length_bucketed_batches():
+    """Test that batches hold texts of similar length within the padded token and size limits"""
+    print("🧪 Testing Embedding Engine")
+    print("=" * 50)
+    sample = texts(200)
+    engine = EmbeddingEngine(FakeEncoder(), "fake", cache_dir=None, batch_tokens=2048, max_batch=32)
+    batches = list(engine.batches(sample))
+    assert sorted(i for batch in batches for i in batch) == list(range(len(sample)))
+    for batch in batches:
+        lengths = [engine.estimate_tokens(sample[i]) for i in batch]
+        assert lengths == sorted(lengths, reverse=True)
+        assert len(batch) <= 32 and (len(batch) == 1 or len(batch) * lengths[0] <= 2048)
+    padded = sum(len(batch) * engine.estimate_tokens(sample[batch[0]]) for batch in batches)
+    real = sum(engine.estimate_tokens(text) for text in sample)
+    assert padded < 1.2 * real
+    print(f"✓ {len(sample)} texts in {len(batches)} batches, padding overhead {padded / real - 1:.0%}")
+
+def test_cache_embeds_only_new_texts():
+    """Test that cached vectors survive a restart, as float16 or float32, and duplicates are embedded once"""
+    sample = texts(50)
+    with tempfile.TemporaryDirectory() as directory:
+        encoder = FakeEncoder()
+        first = EmbeddingEngine(encoder, "fake/model", cache_dir=directory).embed_array(sample + sample[:5])
+        assert sum(len(batch) for batch in encoder.batches) == 50
+
+        encoder = FakeEncoder()
+        engine = EmbeddingEngine(encoder, "fake/model", cache_dir=directory)
+        again = engine.embed_array(sample + texts(3, seed=1))
+        assert sum(len(batch) for batch in encoder.batches) == 3
+        assert engine.stats["cache_hits"] == 50 and engine.stats["embedded"] == 3
+        # float16 storage keeps cosine similarities to about three decimals
+        assert again.dtype == np.float32 and np.abs(again[:50] - first[:50]).max() < 2e-3
+        assert np.allclose(first[50:], first[:5])
+
+        exact = EmbeddingEngine(FakeEncoder(), "fake/other", cache_dir=directory, dtype="float32")
+        vectors = exact.embed_array(sample[:10])
+        assert np.array_equal(EmbeddingEngine(FakeEncoder(), "fake/other", cache_dir=directory,
+                                              dtype="float32").embed_array(sample[:10]), vectors)
+        assert sorted(os.listdir(directory)) == ["fake_model", "fake_other"]
+    print("✓ Restarted engine embedded 3 new texts, 50 came from the cache")
+
+def test_cache_compaction():
+    """Test that many small flushes are merged into one shard without losing vectors"""
+    with tempfile.TemporaryDirectory() as directory:
+        limit = embedding_engine.MAX_SHARDS
+        embedding_engine.MAX_SHARDS = 4
+        try:
+            engine = EmbeddingEngine(FakeEncoder(), "fake", cache_dir=directory)
+            for i in range(10):
+                engine.embed_array(texts(5, seed=i))
+        finally:
+            embedding_engine.MAX_SHARDS = limit
+        cache = EmbeddingCache(os.path.join(directory, "fake"))
+        shards = [name for name in os.listdir(cache.directory) if name.endswith(".keys.npy")]
+        assert len(cache) == 50 and len(shards) <= 4
+    print(f"✓ 10 flushes kept in {len(shards)} shards")
+
+def test_cache_shared_between_processes():
+    """Test that caches flushing into the same directory keep each other's shards"""
+    with tempfile.TemporaryDirectory() as directory:
+        first, second = EmbeddingCache(directory), EmbeddingCache(directory)
+        for i in range(5):
+            first.put(text_key(f"first {i}"), np.full(4, i))
+            second.put(text_key(f"second {i}"), np.full(4, -i))
+        first.flush()
+        second.flush()
+        assert len(EmbeddingCache(directory)) == 10
+
+        # Compaction keeps shards written after the compacting cache was loaded
+        limit = embedding_engine.MAX_SHARDS
+        embedding_engine.MAX_SHARDS = 3
+        try:
+            second.put(text_key("third"), np.zeros(4))
+            second.flush()
+            first.put(text_key("fourth"), np.ones(4))
+            first.flush()
+        finally:
+            embedding_engine.MAX_SHARDS = limit
+        reloaded = EmbeddingCache(directory)
+        shards = [name for name in os.listdir(directory) if name.endswith(".keys.npy")]
+        assert len(shards) == 1 and len(reloaded) == 12
+        assert reloaded.get(text_key("third")) is not None
+    print(f"✓ Two caches flushed into one directory, {len(reloaded)} vectors kept")
+
+def test_rebuild_reuses_cached_vectors():
+    """Test that a clean rebuild of the hybrid store embeds only chunks it has not seen"""
+    with tempfile.TemporaryDirectory() as directory:
+        store, cache = os.path.join(directory, "store"), os.path.join(directory, "cache")
+        encoders = []
+
+        def rebuild(docs):
+            shutil.rmtree(store, ignore_errors=True)
+            encoders.append(FakeEncoder())
+            registry.reset_registry()
+            registry.register("dense_embedding", EmbeddingEngine(encoders[-1], "fake", cache_dir=cache))
+            return create_vectorstore(docs, persist_directory=store, force_reload=True, backend="hybrid")
+
+        try:
+            rebuild(corpus()[:6])
+            retriever = rebuild(corpus())
+            docs = retriever.invoke("How do checkpointers persist state?")
+        finally:
+            registry.reset_registry()
+    assert [len(batch) for batch in encoders[0].batches] == [6]
+    assert [len(batch) for batch in encoders[1].batches] == [2, 1]
+    assert docs[0].metadata["source"] == "doc-0"
+    print("✓ Rebuild embedded only the 2 new chunks")
+
+if __name__ == "__main__":
+    test_length_bucketed_batches()
+    test_cache_embeds_only_new_texts()
+    test_cache_compaction()
+    test_cache_shared_between_processes()
+    test_rebuild_reuses_cached_vectors()
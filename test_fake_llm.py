@@ -0,0 +1,107 @@
+"""
+Test the deterministic fake LLM provider and the full graph running offline on it
+"""
+
+from langchain_core.messages import HumanMessage, ToolMessage
+from src.graph.streaming import stream_answer
+from src.ingetsion.retriever import create_vectorstore
+from src.llms import registry
+from src.llms.fake_llm import FakeChatModel
+from src.llms.provider import create_llm
+from src.models.grader import ChunkGrades, GradeDocuments, GRADE_PROMPT
+from src.nodes.grader import _batch_prompt
+from test_offline_rag import create_sample_documents
+import asyncio
+import os
+import tempfile
+import time
+
+QUESTION = "How do vector stores enable semantic search?"
+
+def test_tool_calls_and_structured_output():
+    """Test routing tool calls, GradeDocuments and ChunkGrades"""
+    print("🧪 Testing Fake LLM")
+    print("=" * 50)
+
+    os.environ["LLM_PROVIDER"] = "fake"
+    try:
+        llm = create_llm()
+    finally:
+        del os.environ["LLM_PROVIDER"]
+    assert isinstance(llm, FakeChatModel)
+
+    from src.ingetsion.retriever_tool import get_retriever_tool
+    router = llm.bind_tools([get_retriever_tool()])
+    call = router.invoke([HumanMessage(content=QUESTION)]).tool_calls[0]
+    assert call["name"] == "document_retriever" and call["args"] == {"query": QUESTION}
+    assert router.invoke([HumanMessage(content=QUESTION)]).tool_calls[0]["id"] == call["id"]
+    answered = router.invoke([HumanMessage(content=QUESTION),
+                              ToolMessage(content="Context", tool_call_id=call["id"])])
+    assert not answered.tool_calls and answered.content
+
+    documents = create_sample_documents()
+    grader = llm.with_structured_output(GradeDocuments)
+    prompt = GRADE_PROMPT.format(question=QUESTION, context=documents[2].page_content)
+    assert grader.invoke([{"role": "user", "content": prompt}]) == GradeDocuments(binary_score="yes")
+    prompt = GRADE_PROMPT.format(question="Kubernetes autoscaling", context=documents[2].page_content)
+    assert grader.invoke([{"role": "user", "content": prompt}]) == GradeDocuments(binary_score="no")
+
+    grades = llm.with_structured_output(ChunkGrades).invoke(_batch_prompt(QUESTION, documents))
+    assert 3 in grades.relevant and len(grades.relevant) < len(documents)
+    print(f"✓ Tool call and structured output, relevant chunks {grades.relevant}")
+
+def test_streaming_and_latency():
+    """Test that streamed chunks add up to the invoked answer and latency is injected"""
+    prompt = [HumanMessage(content=f"Context: {create_sample_documents()[2].page_content}\n\nQuestion: {QUESTION}")]
+    llm = FakeChatModel(latency=0.05, jitter=0.02, token_latency=0.001, seed=7)
+
+    start = time.perf_counter()
+    answer = llm.invoke(prompt)
+    elapsed = time.perf_counter() - start
+    assert "semantic search" in answer.content
+    assert answer.usage_metadata["output_tokens"] > 0
+    assert elapsed >= 0.03 + answer.usage_metadata["output_tokens"] * 0.001
+
+    chunks = list(llm.stream(prompt))
+    assert len(chunks) > 1 and "".join(chunk.content for chunk in chunks) == answer.content
+
+    async def astream():
+        return [chunk.content async for chunk in llm.astream(prompt)]
+    assert "".join(asyncio.run(astream())) == answer.content
+    assert llm.calls == 3 and llm.max_in_flight == 1
+
+    async def overlapping():
+        await asyncio.gather(*(llm.ainvoke(prompt) for _ in range(4)))
+    asyncio.run(overlapping())
+    assert llm.calls == 7 and llm.max_in_flight == 4
+
+    # The same seed gives the same delay profile
+    delays = [FakeChatModel(latency=0.1, jitter=0.05, seed=3)._delay() for _ in range(2)]
+    assert delays[0] == delays[1] and 0.05 <= delays[0] <= 0.15
+    print(f"✓ {len(chunks)} streamed chunks, invoke took {elapsed * 1000:.0f}ms")
+
+def test_full_graph_offline():
+    """Test the full graph end to end with only the fake provider"""
+    from src.graph.graph_builder import graph
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        registry.reset_registry()
+        registry.register("llm", create_llm("fake"))
+        try:
+            events = list(stream_answer(graph, {"messages": [HumanMessage(content=QUESTION)]}))
+        finally:
+            registry.reset_registry()
+
+    nodes = [value for event, value in events if event == "node"]
+    info = events[-1][1]
+    assert nodes[0] == "generate_query_or_respond" and nodes[-1] == "generate_answer"
+    assert "semantic search" in info["answer"]
+    assert sum(1 for event, _ in events if event == "token") > 1
+    print(f"✓ Offline run through {' → '.join(nodes)}")
+
+if __name__ == "__main__":
+    test_tool_calls_and_structured_output()
+    test_streaming_and_latency()
+    test_full_graph_offline()
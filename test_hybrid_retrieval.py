@@ -0,0 +1,119 @@
+"""
+Test hybrid retrieval: reciprocal-rank fusion, dense-only hits and the dense index sync
+"""
+
+from conftest import HashingEmbeddings, corpus
+from langchain_core.messages import HumanMessage, ToolMessage
+from src.ingetsion.batch_retriever import retrieve_batch
+from src.ingetsion.hybrid_retriever import DenseIndex, reciprocal_rank_fusion
+from src.ingetsion.incremental import apply_changes, assign_chunk_ids
+from src.ingetsion.retriever import create_vectorstore
+from src.llms import registry
+from src.nodes.pregrader import pregrade_documents
+import tempfile
+
+def open_hybrid(directory, texts=None, embedding=None, **settings):
+    registry.reset_registry()
+    registry.register("dense_embedding", embedding or HashingEmbeddings())
+    store = create_vectorstore(texts, persist_directory=directory, force_reload=True, backend="hybrid")
+    for name, value in settings.items():
+        setattr(store, name, value)
+    return store
+
+def test_reciprocal_rank_fusion():
+    """Test weighted RRF scores and that an item ranked by both lists wins"""
+    print("🧪 Testing Hybrid Retrieval")
+    print("=" * 50)
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 4]], [1.0, 0.5], rrf_k=60)
+    assert abs(fused[2] - (1 / 62 + 0.5 / 61)) < 1e-12
+    assert abs(fused[4] - 0.5 / 62) < 1e-12
+    assert max(fused, key=fused.get) == 2 and set(fused) == {1, 2, 3, 4}
+    print("✓ RRF scores add up across rankings")
+
+def test_dense_hits_reach_the_grader():
+    """Test that the dense ranking lifts a reworded match and its own hits go to the LLM grader"""
+    question = "Where is the node state persisted by checkpointing?"
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            store = open_hybrid(directory, corpus())
+            docs = store.invoke(question)
+            sparse_only = open_hybrid(directory, dense_weight=0.0).invoke(question)
+            sequential = open_hybrid(directory, parallel=False).invoke(question)
+            assert [doc.metadata for doc in sequential] == [doc.metadata for doc in docs]
+            update = pregrade_documents({"messages": [
+                HumanMessage(content=question),
+                ToolMessage(content="", artifact=docs, tool_call_id="call-1"),
+            ]})
+        finally:
+            registry.reset_registry()
+
+    # Lexically the conditional edges chunk wins on "node" and "state"
+    assert [doc.metadata["source"] for doc in sparse_only] == ["doc-6", "doc-0"]
+    assert docs[0].metadata["source"] == "doc-0" and docs[0].metadata["score"] > 0
+    dense_only = [doc for doc in docs if "score" not in doc.metadata]
+    assert dense_only and all(doc.metadata["dense_score"] > 0 for doc in dense_only)
+    pending = [doc.page_content for doc in update["pending_documents"]]
+    assert all(doc.page_content in pending for doc in dense_only)
+    print(f"✓ Checkpointer chunk ranked first, {len(dense_only)} dense-only hits left to the LLM grader")
+
+def test_batch_matches_single_queries():
+    """Test that batched hybrid retrieval gives the same documents as one query at a time"""
+    questions = ["Which node runs tool calls?", "How are long documents chunked?", "streamed tokens"]
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            store = open_hybrid(directory, corpus())
+            singles = [store.invoke(question) for question in questions]
+            batch = retrieve_batch(questions, store=store)
+        finally:
+            registry.reset_registry()
+    for single, batched in zip(singles, batch):
+        assert [doc.page_content for doc in single] == [doc.page_content for doc in batched]
+        assert [doc.metadata.get("score") for doc in single] == [doc.metadata.get("score") for doc in batched]
+    print(f"✓ {len(questions)} batched queries match single queries")
+
+def test_dense_ranking_widened_to_k():
+    """Test that a k above the candidate count widens the dense ranking as well as the sparse one"""
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            store = open_hybrid(directory, corpus(), candidates=2, sparse_weight=0.0)
+            hits = store.similarity_search_batch(["How does the graph keep its state?"], k=6)[0]
+        finally:
+            registry.reset_registry()
+    assert len(hits) == 6 and all(score is None or score > 0 for _, score in hits)
+    print("✓ Dense-only fusion returned k=6 chunks with 2 candidates configured")
+
+def test_dense_index_embeds_only_new_chunks():
+    """Test that reopening the store reuses stored vectors and embeds only added chunks"""
+    docs = corpus()
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            embedding = HashingEmbeddings()
+            open_hybrid(directory, docs[:6], embedding)
+            assert embedding.embedded == 6
+
+            embedding = HashingEmbeddings()
+            store = open_hybrid(directory, embedding=embedding)
+            assert embedding.embedded == 0 and len(store.dense) == 6
+
+            new_chunks = assign_chunk_ids(docs[6:])
+            apply_changes("hybrid", directory, new_chunks, {docs[0].metadata["chunk_id"]})
+            embedding = HashingEmbeddings()
+            store = open_hybrid(directory, embedding=embedding)
+            assert embedding.embedded == 2 and len(store.dense) == len(store.index.documents) == 7
+
+            # Another model invalidates every stored vector
+            embedding = HashingEmbeddings(dimension=256)
+            embedding.model_name = "hashing-256"
+            open_hybrid(directory, embedding=embedding)
+            assert embedding.embedded == 7
+            assert len(DenseIndex._load_rows(directory, embedding)) == 7
+        finally:
+            registry.reset_registry()
+    print("✓ Reopening embedded 0 chunks, an update embedded only the 2 new ones")
+
+if __name__ == "__main__":
+    test_reciprocal_rank_fusion()
+    test_dense_hits_reach_the_grader()
+    test_batch_matches_single_queries()
+    test_dense_ranking_widened_to_k()
+    test_dense_index_embeds_only_new_chunks()
@@ -0,0 +1,131 @@
+"""
+Test incremental re-indexing keyed on content hashes
+"""
+
+from conftest import paragraph_split
+from langchain_core.documents import Document
+from src.ingetsion import vectorizer_refit
+from src.ingetsion.incremental import apply_changes, assign_chunk_ids, incremental_update
+from src.ingetsion.inverted_index import TfidfInvertedIndex
+from src.ingetsion.retriever import create_embedding, open_chroma, create_vectorstore
+import tempfile
+
+def make_docs(graph_text):
+    return [
+        Document(page_content="LangChain loads documents.\n\nLangChain splits text.", metadata={"source": "a"}),
+        Document(page_content=graph_text, metadata={"source": "b"}),
+        Document(page_content="Chroma stores vectors.\n\nRetrievers search vectors.", metadata={"source": "c"}),
+    ]
+
+def chunk_count(backend, directory):
+    if backend == "inverted_index":
+        return len(TfidfInvertedIndex.load(directory))
+    embedding = create_embedding(directory)
+    embedding.load_cache()
+    return open_chroma(directory, embedding)._collection.count()
+
+def run_incremental_scenario(backend):
+    print(f"\n🧪 Incremental indexing with backend={backend}")
+    with tempfile.TemporaryDirectory() as directory:
+        def update(docs, sources=None):
+            return incremental_update(docs, sources=sources, backend=backend,
+                                      persist_directory=directory, split=paragraph_split)
+
+        stats = update(make_docs("LangGraph builds graphs.\n\nNodes update state."))
+        assert stats["added_chunks"] == 6 and chunk_count(backend, directory) == 6
+
+        # Nothing changed: no chunk is re-embedded
+        stats = update(make_docs("LangGraph builds graphs.\n\nNodes update state."))
+        assert stats["changed_sources"] == 0 and stats["added_chunks"] == 0
+        assert chunk_count(backend, directory) == 6
+
+        # One paragraph of source b changed: only that chunk is replaced
+        stats = update(make_docs("LangGraph builds graphs.\n\nEdges route between nodes."))
+        assert stats["changed_sources"] == 1
+        assert stats["added_chunks"] == 1 and stats["deleted_chunks"] == 1 and stats["kept_chunks"] == 1
+        assert chunk_count(backend, directory) == 6
+
+        # Sources a and c failed to fetch: without an expected source list nothing is removed
+        docs = [doc for doc in make_docs("LangGraph builds graphs.\n\nEdges route between nodes.")
+                if doc.metadata["source"] == "b"]
+        stats = update(docs)
+        assert stats["removed_sources"] == 0 and stats["deleted_chunks"] == 0
+        assert chunk_count(backend, directory) == 6
+
+        # Source c disappeared, source a failed to fetch but is still expected
+        stats = update(docs, sources=["a", "b"])
+        assert stats["removed_sources"] == 1 and stats["deleted_chunks"] == 2
+        assert chunk_count(backend, directory) == 4
+        print(f"✓ {backend}: final store has {chunk_count(backend, directory)} chunks")
+
+def test_incremental_inverted_index():
+    run_incremental_scenario("inverted_index")
+
+def test_incremental_chroma():
+    run_incremental_scenario("chroma")
+
+def run_refit_scenario(backend):
+    print(f"\n🧪 Vectorizer refit with backend={backend}")
+    with tempfile.TemporaryDirectory() as directory:
+        def update(docs, sources=None):
+            return incremental_update(docs, sources=sources, backend=backend, persist_directory=directory,
+                                      split=paragraph_split, background_refit=False)
+
+        docs = make_docs("LangGraph builds graphs.\n\nNodes update state.")
+        update(docs)
+        first_version = create_embedding(directory).current_version()
+        assert first_version is not None
+
+        # A batch the vocabulary knows well is embedded with the current version
+        docs.append(Document(page_content="LangChain loads vectors.", metadata={"source": "d"}))
+        stats = update(docs)
+        assert not stats["refit_scheduled"]
+        assert create_embedding(directory).current_version() == first_version
+
+        # A batch of unseen vocabulary triggers a corpus-wide refit and re-embedding
+        docs.append(Document(page_content="Kubernetes operators reconcile clusters.", metadata={"source": "e"}))
+        stats = update(docs)
+        assert stats["refit_scheduled"]
+        second_version = create_embedding(directory).current_version()
+        assert second_version != first_version
+        assert chunk_count(backend, directory) == 8
+
+        retriever = create_vectorstore(persist_directory=directory, backend=backend, force_reload=True)
+        results = retriever.invoke("Kubernetes operators")
+        assert results[0].metadata["source"] == "e"
+        print(f"✓ {backend}: vectorizer {first_version} -> {second_version}")
+
+def test_refit_inverted_index():
+    run_refit_scenario("inverted_index")
+
+def test_refit_chroma():
+    run_refit_scenario("chroma")
+
+def test_refit_cancelled_at_shutdown():
+    """Test that a refit stopped at exit keeps the current version and leaves the index readable"""
+    with tempfile.TemporaryDirectory() as directory:
+        docs = paragraph_split(make_docs("LangGraph builds graphs."))
+        apply_changes("inverted_index", directory, assign_chunk_ids(docs), set())
+        unseen = [Document(page_content="Kubernetes operators reconcile clusters.", metadata={"source": "e"})]
+        apply_changes("inverted_index", directory, assign_chunk_ids(unseen), set())
+        version = create_embedding(directory).current_version()
+
+        vectorizer_refit._stop_refit.set()
+        try:
+            thread = vectorizer_refit.start_background_refit("inverted_index", directory)
+            assert thread.daemon
+            thread.join()
+        finally:
+            vectorizer_refit._stop_refit.clear()
+        assert create_embedding(directory).current_version() == version
+        assert len(TfidfInvertedIndex.load(directory)) == 6
+
+        assert vectorizer_refit.refit_and_reindex("inverted_index", directory) != version
+    print("✓ Cancelled refit kept the current vectorizer")
+
+if __name__ == "__main__":
+    test_incremental_inverted_index()
+    test_incremental_chroma()
+    test_refit_inverted_index()
+    test_refit_chroma()
+    test_refit_cancelled_at_shutdown()
@@ -0,0 +1,107 @@
+"""
+Test the streaming ingestion pipeline against a local HTTP server
+"""
+
+from conftest import paragraph_split, start_server
+from langchain_core.documents import Document
+from src.ingetsion.pipeline import run_ingestion_pipeline, buffered, StageStats
+from src.ingetsion.retriever import create_embedding, create_vectorstore
+import tempfile
+import time
+
+FILLER = " ".join(["graph state nodes edges checkpoint memory streaming tools agents retrieval"] * 3)
+
+def test_streaming_pipeline():
+    """Test that pages stream into the index in batches and unchanged pages are skipped"""
+    print("🧪 Testing Streaming Ingestion Pipeline")
+    print("=" * 50)
+
+    server = start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/page/{i}" for i in range(6)]
+
+    try:
+        with tempfile.TemporaryDirectory() as store, tempfile.TemporaryDirectory() as cache_dir:
+            result = run_ingestion_pipeline(
+                urls, backend="inverted_index", persist_directory=store, split=paragraph_split,
+                batch_size=2, queue_size=1, per_host_interval=0, cache_dir=cache_dir,
+            )
+            fetch, split, index = result["stages"]
+            assert fetch["items"] == 6 and index["items"] == split["items"] > 0
+
+            retriever = create_vectorstore(persist_directory=store, backend="inverted_index", force_reload=True)
+            assert {doc.metadata["source"] for doc in retriever.index.documents} == set(urls)
+            assert retriever.invoke("Documentation about LangGraph")
+
+            # Second run: every page is unchanged, nothing is split or embedded
+            result = run_ingestion_pipeline(
+                urls, backend="inverted_index", persist_directory=store, split=paragraph_split,
+                per_host_interval=0, cache_dir=cache_dir,
+            )
+            assert result["pages_seen"] == 6
+            assert result["stages"][1]["items"] == 0 and result["stages"][2]["items"] == 0
+
+            # Dropping a URL removes its chunks
+            result = run_ingestion_pipeline(
+                urls[:5], backend="inverted_index", persist_directory=store, split=paragraph_split,
+                per_host_interval=0, cache_dir=cache_dir,
+            )
+            assert result["removed_sources"] == 1
+            retriever = create_vectorstore(persist_directory=store, backend="inverted_index", force_reload=True)
+            assert all(doc.metadata["source"] != urls[5] for doc in retriever.index.documents)
+    finally:
+        server.shutdown()
+
+def test_clean_build_vocabulary_covers_every_batch():
+    """Test that a build into an empty store is refit on the full corpus, not its first batch"""
+    server = start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    topics = ["checkpointers", "reducers", "subgraphs", "interrupts", "middleware", "callbacks"]
+    urls = [f"{base}/page/{topic}" for topic in topics]
+
+    def split(docs):
+        # Mostly shared words: the later batches stay above the coverage threshold
+        return [Document(page_content=f"{doc.page_content} {FILLER}", metadata=dict(doc.metadata)) for doc in docs]
+
+    try:
+        with tempfile.TemporaryDirectory() as store, tempfile.TemporaryDirectory() as cache_dir:
+            result = run_ingestion_pipeline(
+                urls, backend="inverted_index", persist_directory=store, split=split,
+                batch_size=2, queue_size=1, per_host_interval=0, cache_dir=cache_dir,
+            )
+            embedding = create_embedding(store)
+            embedding.load_cache()
+            retriever = create_vectorstore(persist_directory=store, backend="inverted_index", force_reload=True)
+            hits = {topic: retriever.invoke(topic) for topic in topics}
+    finally:
+        server.shutdown()
+    assert result["refit"]
+    assert all(topic in embedding.vectorizer.vocabulary_ for topic in topics)
+    assert all(docs and docs[0].metadata["source"].endswith(topic) for topic, docs in hits.items())
+    print(f"✓ Clean build over {len(topics)} pages in batches of 2 knows every page's terms")
+
+def test_buffered_backpressure():
+    """Test that a fast producer blocks on a bounded queue behind a slow consumer"""
+    stats = StageStats("produce", "items")
+    produced = []
+
+    def producer():
+        for i in range(5):
+            produced.append(i)
+            yield i
+
+    consumed = []
+    for item in buffered(producer(), maxsize=1, stats=stats):
+        # The producer can be at most queue size + one in-flight item ahead
+        assert len(produced) - len(consumed) <= 3
+        time.sleep(0.02)
+        consumed.append(item)
+
+    assert consumed == list(range(5))
+    assert stats.blocked_seconds > 0
+    print(f"✓ Producer was blocked for {stats.blocked_seconds:.3f}s")
+
+if __name__ == "__main__":
+    test_streaming_pipeline()
+    test_clean_build_vocabulary_covers_every_batch()
+    test_buffered_backpressure()
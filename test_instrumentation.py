@@ -0,0 +1,130 @@
+"""
+Test per-node instrumentation: traces, Prometheus metrics, the trace log and the /metrics endpoint
+"""
+
+from aiohttp.test_utils import TestClient, TestServer
+from langchain_core.messages import HumanMessage
+from src.api.server import create_app
+from src.graph import instrumentation
+from src.graph.instrumentation import METRICS, breakdown_rows, render_prometheus
+from src.graph.streaming import stream_answer
+from src.ingetsion.batch_retriever import retrieve_batch
+from src.ingetsion.retriever import create_vectorstore
+from src.llms import registry
+from src.llms.fake_llm import FakeChatModel
+from test_offline_rag import create_sample_documents
+import asyncio
+import json
+import os
+import tempfile
+
+QUESTION = "How do vector stores enable semantic search?"
+
+class FlakyChatModel(FakeChatModel):
+    """Fails its first call, like a rate-limited provider"""
+
+    failures: int = 1
+
+    def _respond(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("429 rate limited")
+        return super()._respond(*args, **kwargs)
+
+def run_with(llm, router=None):
+    from src.graph import graph_builder
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        registry.reset_registry()
+        registry.register("llm", llm)
+        if router is not None:
+            registry.register("tool_calling_llm", router)
+        try:
+            events = list(stream_answer(graph_builder.graph,
+                                        {"messages": [HumanMessage(content=QUESTION)]}))
+        finally:
+            registry.reset_registry()
+    return events[-1][1]
+
+def test_trace_per_node():
+    """Test time, LLM calls, tokens and chunks per node, and the Prometheus export"""
+    print("🧪 Testing Instrumentation")
+    print("=" * 50)
+    METRICS.reset()
+    info = run_with(FakeChatModel(latency=0.01))
+    trace = info["trace"]
+
+    assert [step["node"] for step in trace["steps"]] == [
+        "generate_query_or_respond", "retrieve", "pregrade_documents", "generate_answer"]
+    nodes = trace["nodes"]
+    assert nodes["generate_query_or_respond"]["llm_calls"] == 1
+    assert nodes["generate_answer"]["llm_seconds"] >= 0.01
+    assert nodes["generate_answer"]["seconds"] >= nodes["generate_answer"]["llm_seconds"]
+    assert nodes["retrieve"]["chunks"] == 4 and nodes["retrieve"]["llm_calls"] == 0
+    assert trace["totals"]["llm_calls"] == info["result"]["llm_calls"] == 2
+    assert trace["totals"]["prompt_tokens"] > trace["totals"]["completion_tokens"] > 0
+    assert trace["question"] == QUESTION and trace["seconds"] <= info["total"] + 0.01
+    assert breakdown_rows(trace)[0]["seconds"] >= breakdown_rows(trace)[-1]["seconds"]
+
+    metrics = render_prometheus()
+    assert "rag_requests_total 1" in metrics
+    assert 'rag_llm_calls_total{node="generate_answer"} 1' in metrics
+    assert 'rag_retrieved_chunks_total{node="retrieve"} 4' in metrics
+    assert 'rag_request_seconds_bucket{le="+Inf"} 1' in metrics
+    tokens = nodes["generate_answer"]["prompt_tokens"]
+    assert f'rag_llm_tokens_total{{node="generate_answer",type="prompt"}} {tokens}' in metrics
+    print(f"✓ {len(trace['steps'])} node steps, {trace['totals']['prompt_tokens']} prompt tokens")
+
+def test_retries_and_trace_log():
+    """Test that retried LLM calls are counted per node and traces go to the log file"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "logs", "traces.jsonl")
+        instrumentation.TRACE_LOG_FILE = path
+        try:
+            llm = FlakyChatModel().with_retry(stop_after_attempt=2, wait_exponential_jitter=False)
+            router = FakeChatModel().bind_tools([registry.get_retriever_tool()])
+            info = run_with(llm, router)
+        finally:
+            instrumentation.TRACE_LOG_FILE = ""
+        with open(path, encoding="utf-8") as f:
+            logged = [json.loads(line) for line in f]
+
+    answer = info["trace"]["nodes"]["generate_answer"]
+    assert answer["retries"] == 1 and answer["errors"] == 1 and answer["llm_calls"] == 2
+    assert info["answer"] and "error" not in info["answer"]
+    assert len(logged) == 1 and logged[0]["trace_id"] == info["trace"]["trace_id"]
+    print("✓ Retry counted on generate_answer, trace written as JSON")
+
+def test_metrics_endpoint():
+    """Test /metrics on the API server, with the async graph and micro-batched retrieval"""
+    async def run():
+        app = create_app(use_cache=False)
+        async with TestClient(TestServer(app)) as client:
+            body = await (await client.post("/ask", json={"question": QUESTION})).json()
+            text = await (await client.get("/metrics")).text()
+        return body, text
+
+    METRICS.reset()
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        registry.reset_registry()
+        registry.register("llm", FakeChatModel())
+        try:
+            body, text = asyncio.run(run())
+        finally:
+            registry.reset_registry()
+        expected = len(retrieve_batch([QUESTION])[0])
+
+    # Batched retrieval leaves out zero-score chunks
+    assert body["trace"]["nodes"]["retrieve"]["chunks"] == expected > 0
+    assert "rag_requests_total 1" in text and "rag_retrieval_batches_total 1" in text
+    assert 'rag_node_runs_total{node="generate_answer"} 1' in text
+    print("✓ /metrics served in the Prometheus text format")
+
+if __name__ == "__main__":
+    test_trace_per_node()
+    test_retries_and_trace_log()
+    test_metrics_endpoint()
@@ -0,0 +1,120 @@
+"""
+Test the in-process TF-IDF inverted index backend
+"""
+
+from src.llms.offline_embeddings import OfflineTfIdfEmbeddings
+from src.ingetsion.inverted_index import TfidfInvertedIndex, InvertedIndexRetriever
+from src.ingetsion.sparse_retriever import SparseTfidfRetriever
+from test_offline_rag import create_sample_documents
+from src.ingetsion import index_format
+import numpy as np
+import json
+import tempfile
+import time
+
+TEST_QUERIES = [
+    "What is LangGraph?",
+    "How do vector stores work?",
+    "Explain RAG systems",
+    "What are document graders?",
+]
+
+def test_inverted_index():
+    """Test exact top-k results and a save/load round trip"""
+    print("🧪 Testing TF-IDF Inverted Index")
+    print("=" * 50)
+
+    documents = create_sample_documents()
+    embedding = OfflineTfIdfEmbeddings(max_features=1000)
+    embedding.fit([doc.page_content for doc in documents])
+
+    index = TfidfInvertedIndex.build(documents, embedding)
+    sparse = SparseTfidfRetriever.from_documents(documents, embedding, k=3)
+    print(f"📚 Indexed {len(index)} documents, {len(index.doc_ids)} postings")
+
+    for query in TEST_QUERIES:
+        results = index.search(query, k=3)
+        expected = sparse.similarity_search_with_score(query)
+        print(f"\n❓ Query: {query}")
+        for doc, score in results:
+            print(f"  {score:.3f}  {doc.metadata['source']}")
+        assert [doc.metadata["source"] for doc, _ in results] == [doc.metadata["source"] for doc, _ in expected]
+        for (_, got), (_, want) in zip(results, expected):
+            assert abs(got - want) < 1e-5
+
+    assert index.search("quantum chromodynamics") == []
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        index.search("What is LangGraph?", k=4)
+    print(f"\n⚡ Average query latency: {(time.perf_counter() - start) * 1000:.1f} µs")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        loaded = TfidfInvertedIndex.load(directory)
+        # Arrays are memory-mapped, not read into process memory
+        assert isinstance(loaded.weights, np.memmap)
+        retriever = InvertedIndexRetriever(index=loaded, k=2)
+        docs = retriever.invoke("What is LangGraph?")
+        assert len(loaded) == len(documents)
+        score = docs[0].metadata.pop("score")
+        assert docs[0].metadata == {"source": "langgraph_intro", "topic": "introduction"}
+        assert score == loaded.search("What is LangGraph?", k=1)[0][1]
+        print(f"💾 Reloaded index answers: {docs[0].metadata['source']}")
+
+def test_index_analyzer_matches_sklearn():
+    """Test that query tokenization from the stored index matches TfidfVectorizer"""
+    embedding = OfflineTfIdfEmbeddings(max_features=1000)
+    analyzer = index_format.build_analyzer(index_format.analyzer_params(embedding.vectorizer))
+    reference = embedding.vectorizer.build_analyzer()
+    for doc in create_sample_documents():
+        assert analyzer(doc.page_content) == reference(doc.page_content)
+    assert analyzer("How do I build a StateGraph in LangGraph?") == reference("How do I build a StateGraph in LangGraph?")
+
+def test_index_format_version_check():
+    """Test that an index from another format version is rejected with a clear error"""
+    documents = create_sample_documents()
+    embedding = OfflineTfIdfEmbeddings(max_features=1000)
+    embedding.fit([doc.page_content for doc in documents])
+
+    with tempfile.TemporaryDirectory() as directory:
+        TfidfInvertedIndex.build(documents, embedding).save(directory)
+        manifest_path = f"{directory}/{index_format.MANIFEST_FILE}"
+        manifest = index_format.read_manifest(directory)
+        manifest["format_version"] = index_format.FORMAT_VERSION + 1
+        with open(manifest_path, "w") as f:
+            f.write(json.dumps(manifest))
+        try:
+            TfidfInvertedIndex.load(directory)
+        except index_format.IndexFormatError as e:
+            print(f"✓ Rejected: {e}")
+        else:
+            raise AssertionError("Loading an index with a newer format version should fail")
+
+def test_store_cache_follows_backend_and_directory():
+    """Test that the shared store is reopened when another backend or directory is asked for"""
+    from src.ingetsion import retriever
+    from src.ingetsion.retriever import create_vectorstore
+
+    with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+        try:
+            tfidf = create_vectorstore(create_sample_documents(), persist_directory=first,
+                                       force_reload=True, backend="inverted_index")
+            assert create_vectorstore() is tfidf
+            assert create_vectorstore(persist_directory=first, backend="inverted_index") is tfidf
+
+            chroma = create_vectorstore(create_sample_documents(), persist_directory=second, backend="chroma")
+            assert not isinstance(chroma, InvertedIndexRetriever)
+            assert create_vectorstore() is chroma
+
+            reopened = create_vectorstore(persist_directory=first, backend="inverted_index")
+            assert isinstance(reopened, InvertedIndexRetriever) and len(reopened.index) == len(tfidf.index)
+        finally:
+            retriever._vectorstore_cache = None
+    print("✓ Cached store reopened for a different backend and directory")
+
+if __name__ == "__main__":
+    test_inverted_index()
+    test_index_analyzer_matches_sklearn()
+    test_index_format_version_check()
+    test_store_cache_follows_backend_and_directory()
@@ -0,0 +1,36 @@
+"""
+Test the shared model/tool registry
+"""
+
+from src.llms import registry
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+def test_registry_creates_once():
+    """Test that concurrent first uses share one instance built by one factory call"""
+    print("🧪 Testing Model Registry")
+    print("=" * 50)
+
+    calls = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    registry.reset_registry()
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            instances = list(executor.map(lambda _: registry._get_or_create("test", factory), range(16)))
+        assert len(calls) == 1
+        assert all(instance is instances[0] for instance in instances)
+
+        registry.reset_registry()
+        assert registry._get_or_create("test", factory) is not instances[0]
+        assert len(calls) == 2
+    finally:
+        registry.reset_registry()
+    print("✓ One instance per key, rebuilt only after reset")
+
+if __name__ == "__main__":
+    test_registry_creates_once()
@@ -118,5 +118,56 @@ def test_offline_rag():
             print(f"  {i}. {preview}...")
             print(f"     Source: {doc.metadata.get('source', 'unknown')}")
 
+def test_sparse_retriever():
+    """Test that the sparse TF-IDF retriever ranks like dense cosine similarity"""
+    from src.ingetsion.sparse_retriever import SparseTfidfRetriever
+    import numpy as np
+    
+    print("\n🧪 Testing Sparse TF-IDF Retriever")
+    print("=" * 50)
+    
+    documents = create_sample_documents()
+    embedding = OfflineTfIdfEmbeddings(max_features=1000)
+    embedding.fit([doc.page_content for doc in documents])
+    
+    retriever = SparseTfidfRetriever.from_documents(documents, embedding, k=2)
+    print(f"🗃️  Sparse matrix: {retriever.doc_matrix.shape}, {retriever.doc_matrix.nnz} non-zeros")
+    
+    dense_docs = np.array(embedding.embed_documents([doc.page_content for doc in documents]))
+    for query in ["What is LangGraph?", "How do vector stores work?", "What are document graders?"]:
+        results = retriever.similarity_search_with_score(query)
+        expected = dense_docs @ np.array(embedding.embed_query(query))
+        print(f"\n❓ Query: {query}")
+        for doc, score in results:
+            print(f"  {score:.3f}  {doc.metadata['source']}")
+        assert len(results) == 2
+        assert np.isclose(results[0][1], expected.max())
+        assert results[0][0] is documents[int(np.argmax(expected))]
+    
+    assert retriever.invoke("What is LangGraph?")[0].metadata["source"] == "langgraph_intro"
+    # Documents sharing no term with the query are left out, as in batch search
+    assert retriever.similarity_search_with_score("Kubernetes autoscaling") == []
+    assert retriever.similarity_search_batch(["Kubernetes autoscaling"]) == [[]]
+
+def test_legacy_chroma_store_is_refit():
+    """Test that a Chroma store built before vectorizer artifacts gets a versioned vectorizer when opened"""
+    from src.ingetsion.retriever import create_embedding, create_vectorstore
+    
+    documents = create_sample_documents()
+    with tempfile.TemporaryDirectory() as directory:
+        # Legacy layout: default collection, no vectorizer folder
+        embedding = OfflineTfIdfEmbeddings(max_features=1000)
+        embedding.fit([doc.page_content for doc in documents])
+        Chroma.from_documents(documents, embedding, persist_directory=directory)
+        assert create_embedding(directory).current_version() is None
+        
+        retriever = create_vectorstore(persist_directory=directory, backend="chroma", force_reload=True)
+        version = create_embedding(directory).current_version()
+        assert version is not None
+        assert retriever.invoke("What is LangGraph?")[0].metadata["source"] == "langgraph_intro"
+    print(f"💾 Legacy store refit with vectorizer {version}")
+
 if __name__ == "__main__":
-    test_offline_rag()
\ No newline at end of file
+    test_offline_rag()
+    test_sparse_retriever()
+    test_legacy_chroma_store_is_refit()
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Test the local pre-grader that skips LLM grading on clear-cut retrievals
+"""
+
+from conftest import StubChunkGrader
+from langchain_core.messages import HumanMessage, ToolMessage
+from src.ingetsion.retriever import create_vectorstore
+from src.llms import registry
+from src.nodes.grader import grade_documents, route_after_grading
+from src.nodes.pregrader import (
+    pregrade_documents, route_after_pregrading, pregrade_stats, calibrate_thresholds,
+)
+from test_offline_rag import create_sample_documents
+import tempfile
+
+def retrieval_state(retriever, question):
+    docs = retriever.invoke(question)
+    return {
+        "messages": [
+            HumanMessage(content=question),
+            ToolMessage(content="\n\n".join(doc.page_content for doc in docs), artifact=docs,
+                        tool_call_id="call-1"),
+        ]
+    }
+
+def test_pregrader_routes():
+    """Test that decisive retrievals skip the LLM grader and ambiguous chunks reach it"""
+    print("🧪 Testing Local Pre-Grader")
+    print("=" * 50)
+
+    pregrade_stats.reset()
+    registry.reset_registry()
+    with tempfile.TemporaryDirectory() as directory:
+        retriever = create_vectorstore(create_sample_documents(), persist_directory=directory,
+                                       force_reload=True, backend="inverted_index")
+
+        # Strong match with full query-term coverage; the weak second hit is rejected locally
+        state = retrieval_state(retriever, "How do vector stores enable semantic search?")
+        update = pregrade_documents(state)
+        assert route_after_pregrading(update) == "generate_answer"
+        assert [doc.metadata["source"] for doc in update["documents"]] == ["vector_stores"]
+
+        # Nothing matches at all
+        update = pregrade_documents(retrieval_state(retriever, "Kubernetes autoscaling"))
+        assert route_after_pregrading(update) == "rewrite_question"
+
+        # Moderate scores: only the ambiguous chunks go to the LLM grader
+        state = retrieval_state(retriever, "What is LangGraph?")
+        update = pregrade_documents(state)
+        assert route_after_pregrading(update) == "grade_documents"
+        assert len(update["pending_documents"]) == 2
+
+        chunk_grader = StubChunkGrader(relevant=[1])
+        registry.register("chunk_grader_llm", chunk_grader)
+        graded = grade_documents({**state, **update})
+        assert "[2]" in chunk_grader.prompts[0] and "[3]" not in chunk_grader.prompts[0]
+        assert [doc.metadata["source"] for doc in graded["documents"]] == ["langgraph_intro"]
+        assert route_after_grading(graded) == "generate_answer"
+
+    registry.reset_registry()
+    summary = pregrade_stats.summary()
+    assert summary["retrievals"] == 3 and summary["llm_grading_skipped"] == 2
+    assert summary["observations"] == 2
+    print(f"✓ Skip rate {summary['skip_rate']:.0%}: {summary}")
+
+def test_calibrate_thresholds():
+    """Test threshold suggestions from LLM verdicts"""
+    observations = [(i / 100, 1.0, i >= 30) for i in range(60)]
+    high, low = calibrate_thresholds(observations, target_precision=0.95, min_support=5)
+    assert 0.29 <= high <= 0.30
+    assert 0.28 <= low <= 0.30
+    assert calibrate_thresholds(observations[:3], min_support=5) == (None, None)
+
+if __name__ == "__main__":
+    test_pregrader_routes()
+    test_calibrate_thresholds()
@@ -0,0 +1,85 @@
+"""
+Test that the rewrite loop is bounded and ends with a best-effort answer
+"""
+
+from conftest import StubRouter
+from langchain_core.messages import AIMessage, HumanMessage
+from src.llms import registry
+from src.nodes import budget
+from src.ingetsion.retriever import create_vectorstore
+from test_offline_rag import create_sample_documents
+import tempfile
+
+class StubLLM:
+    """Rewrites by appending a word (or repeating the question) and echoes the answer prompt"""
+
+    def __init__(self, repeat=False):
+        self.repeat = repeat
+        self.prompts = []
+
+    def invoke(self, messages):
+        prompt = messages[-1]["content"] if isinstance(messages[-1], dict) else messages[-1].content
+        self.prompts.append(prompt)
+        if prompt.startswith("look at the input"):
+            question = prompt.split("---------")[1].strip()
+            return AIMessage(content=question if self.repeat else f"{question} please")
+        return AIMessage(content=f"Best effort answer from: {prompt[:80]}")
+
+def run(question, llm):
+    from src.graph.graph_builder import graph
+
+    router = StubRouter()
+    registry.reset_registry()
+    registry.register("tool_calling_llm", router)
+    registry.register("llm", llm)
+    try:
+        return graph.invoke({"messages": [HumanMessage(content=question)]}), router
+    finally:
+        registry.reset_registry()
+
+def test_rewrites_stop_at_budget():
+    """Test that unanswerable questions stop after MAX_REWRITES rewrites with bounded history"""
+    print("🧪 Testing Bounded Rewrite Loop")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        llm = StubLLM()
+        result, router = run("Kubernetes autoscaling", llm)
+
+    assert result["rewrite_count"] == budget.MAX_REWRITES
+    assert router.calls == budget.MAX_REWRITES + 1
+    # Each rewrite builds on the previous one
+    assert result["query"] == "Kubernetes autoscaling" + " please" * budget.MAX_REWRITES
+    # Only the question, the newest rewrite and its last round trip are kept
+    assert len(result["messages"]) <= 5
+    assert result["messages"][0].content == "Kubernetes autoscaling"
+    assert result["llm_calls"] == router.calls + budget.MAX_REWRITES + 1
+    print(f"✓ Stopped after {result['rewrite_count']} rewrites and {result['llm_calls']} LLM calls")
+
+def test_repeated_retrieval_answers_best_effort():
+    """Test that a rewrite retrieving the same chunks ends the loop with a best-effort answer"""
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        llm = StubLLM(repeat=True)
+        # Matches LangGraph chunks, but covers too few of the question's terms to pass pre-grading
+        result, router = run("LangGraph kubernetes autoscaling clusters", llm)
+
+    assert result["rewrite_count"] == 1 and result["repeated_retrieval"]
+    assert result["documents"] == [] and result["best_documents"]
+    assert "LangGraph" in llm.prompts[-1]
+    assert result["messages"][-1].content.startswith("Best effort answer")
+    print("✓ Repeated retrieval answered best-effort after one rewrite")
+
+def test_call_and_time_budget():
+    """Test that the LLM-call and time budgets block further rewrites"""
+    assert budget.stop_reason({}) is None
+    assert budget.route_rewrite({"llm_calls": budget.MAX_LLM_CALLS}) == "generate_answer"
+    assert budget.route_rewrite({"started_at": 0.0}) == "generate_answer"
+
+if __name__ == "__main__":
+    test_rewrites_stop_at_budget()
+    test_repeated_retrieval_answers_best_effort()
+    test_call_and_time_budget()
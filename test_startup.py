@@ -0,0 +1,45 @@
+"""
+Test that importing the graph is cheap: no clients, vector store or heavy libraries
+"""
+
+from pathlib import Path
+import json
+import os
+import subprocess
+import sys
+
+# Generous ceiling for a cold interpreter; eager start-up used to take well over this
+IMPORT_BUDGET_SECONDS = 5.0
+HEAVY_MODULES = ["chromadb", "langchain_chroma", "sklearn", "scipy", "langchain_google_genai", "tiktoken"]
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import src.graph.graph_builder
+import src.graph.simple_graph_builder
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+def test_graph_import_is_lazy():
+    """Test the import-time budget and that heavy dependencies load on first use only"""
+    print("🧪 Testing Graph Import Time")
+    print("=" * 50)
+
+    root = Path(__file__).parent
+    env = dict(os.environ, PYTHONPATH=str(root))
+    # No API key and no vector store: import must not need either
+    env.pop("GOOGLE_API_KEY", None)
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        cwd=root, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    # Importing prints nothing; the report is the only output
+    report = json.loads(result.stdout)
+    print(f"✓ Graph imported in {report['seconds']:.2f}s")
+    assert report["loaded"] == [], f"Heavy modules loaded at import: {report['loaded']}"
+    assert report["seconds"] < IMPORT_BUDGET_SECONDS
+
+if __name__ == "__main__":
+    test_graph_import_is_lazy()
@@ -0,0 +1,77 @@
+"""
+Test token streaming and time-to-first-token reporting
+"""
+
+from conftest import StubRouter
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from src.graph.answer_cache import AnswerCache, CachedGraph
+from src.graph.streaming import stream_answer
+from src.ingetsion.retriever import create_vectorstore
+from src.llms import registry
+from test_offline_rag import create_sample_documents
+import tempfile
+
+ANSWER = "Vector stores index embeddings so similar chunks can be found quickly."
+
+def fake_llm(*contents):
+    return GenericFakeChatModel(messages=iter([AIMessage(content=content) for content in contents]))
+
+def collect(graph, question):
+    events = list(stream_answer(graph, {"messages": [HumanMessage(content=question)]}))
+    nodes = [value for event, value in events if event == "node"]
+    tokens = [value for event, value in events if event == "token"]
+    assert events[-1][0] == "done"
+    return nodes, tokens, events[-1][1]
+
+def test_answer_tokens_stream():
+    """Test that generate_answer tokens arrive one by one, after node progress events"""
+    print("🧪 Testing Answer Streaming")
+    print("=" * 50)
+
+    from src.graph.graph_builder import graph
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        registry.reset_registry()
+        registry.register("tool_calling_llm", StubRouter())
+        registry.register("llm", fake_llm(ANSWER))
+        try:
+            nodes, tokens, info = collect(graph, "How do vector stores enable semantic search?")
+        finally:
+            registry.reset_registry()
+
+    assert nodes[:3] == ["generate_query_or_respond", "retrieve", "pregrade_documents"]
+    assert nodes[-1] == "generate_answer"
+    assert len(tokens) > 1 and "".join(tokens) == ANSWER
+    assert info["answer"] == ANSWER and info["cache"] is None
+    assert 0 < info["ttft"] <= info["total"]
+    print(f"✓ {len(tokens)} tokens, first after {info['ttft'] * 1000:.1f}ms of {info['total'] * 1000:.1f}ms")
+
+def test_direct_answer_and_cache_hit():
+    """Test direct answers from the routing model and a cached answer streamed as one token"""
+    from src.graph.graph_builder import graph
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_vectorstore(create_sample_documents(), persist_directory=directory,
+                           force_reload=True, backend="inverted_index")
+        cached = CachedGraph(graph, AnswerCache(backend="inverted_index", persist_directory=directory))
+        registry.reset_registry()
+        registry.register("tool_calling_llm", fake_llm("Two plus two is four."))
+        try:
+            nodes, tokens, info = collect(cached, "What is 2+2?")
+            assert nodes == ["generate_query_or_respond"]
+            assert len(tokens) > 1 and info["answer"] == "Two plus two is four."
+
+            nodes, tokens, info = collect(cached, "What is 2+2?")
+        finally:
+            registry.reset_registry()
+
+    assert nodes == [] and tokens == ["Two plus two is four."]
+    assert info["cache"] == "exact" and info["result"]["cache"] == "exact"
+    print("✓ Direct answers stream and cache hits return at once")
+
+if __name__ == "__main__":
+    test_answer_tokens_stream()
+    test_direct_answer_and_cache_hit()
@@ -0,0 +1,77 @@
+"""
+Test the token-offset text splitter
+"""
+
+from conftest import BYTE_ENCODING
+from langchain_core.documents import Document
+from src.ingetsion import text_splitter
+from src.ingetsion.text_splitter import split_texts, token_offsets
+
+def make_docs(count):
+    docs = []
+    for i in range(count):
+        paragraphs = [
+            f"Section {j} of page {i}: LangGraph nodes read and update the graph state. "
+            f"Edges route between nodes — the router picks the next step."
+            for j in range(1 + i % 4)
+        ]
+        docs.append(Document(page_content="\n\n".join(paragraphs), metadata={"source": f"page-{i}"}))
+    return docs
+
+def test_token_splitter():
+    """Test chunk sizes, offsets and overlap of token-mode chunks"""
+    print("🧪 Testing Token-Offset Text Splitter")
+    print("=" * 50)
+
+    docs = make_docs(8)
+    tokens = BYTE_ENCODING.encode_ordinary(docs[3].page_content)
+    assert list(token_offsets(BYTE_ENCODING, tokens)) == BYTE_ENCODING.decode_with_offsets(tokens)[1]
+
+    chunks = split_texts(docs, mode="token", workers=1, chunk_size=100, chunk_overlap=20,
+                         encoding=BYTE_ENCODING)
+    assert len(chunks) > len(docs)
+
+    texts = {doc.metadata["source"]: doc.page_content for doc in docs}
+    for chunk in chunks:
+        assert len(BYTE_ENCODING.encode_ordinary(chunk.page_content)) <= 100
+        start = chunk.metadata["start_index"]
+        text = texts[chunk.metadata["source"]]
+        assert text[start:start + len(chunk.page_content)] == chunk.page_content
+
+    # Consecutive chunks of a document overlap and together cover all of it
+    for source, text in texts.items():
+        spans = [(c.metadata["start_index"], c.metadata["start_index"] + len(c.page_content))
+                 for c in chunks if c.metadata["source"] == source]
+        assert spans[0][0] == 0 and spans[-1][1] == len(text)
+        for (_, prev_end), (next_start, _) in zip(spans, spans[1:]):
+            assert next_start < prev_end
+    print(f"✓ {len(chunks)} chunks from {len(docs)} documents")
+
+def test_parallel_split_matches_serial():
+    """Test that the process pool produces the same chunks in the same order"""
+    docs = make_docs(40)
+    kwargs = dict(mode="token", chunk_size=120, chunk_overlap=30, encoding=BYTE_ENCODING)
+    serial = split_texts(docs, workers=1, **kwargs)
+    parallel = split_texts(docs, workers=3, **kwargs)
+    assert [(c.page_content, c.metadata) for c in serial] == [(c.page_content, c.metadata) for c in parallel]
+    print(f"✓ Serial and parallel splits match ({len(serial)} chunks)")
+
+def test_workers_reuse_parent_offset_tables():
+    """Test that a worker process takes the parent's offset tables instead of rebuilding them"""
+    tables = text_splitter._token_char_tables(BYTE_ENCODING)
+    text_splitter._char_tables.clear()
+    built = []
+    build = text_splitter._build_token_char_tables
+    text_splitter._build_token_char_tables = lambda encoder: built.append(encoder) or build(encoder)
+    try:
+        text_splitter._init_worker(BYTE_ENCODING, tables)
+        assert text_splitter._token_char_tables(BYTE_ENCODING) is tables
+    finally:
+        text_splitter._build_token_char_tables = build
+    assert built == []
+    print("✓ Worker reused the parent's offset tables")
+
+if __name__ == "__main__":
+    test_token_splitter()
+    test_parallel_split_matches_serial()
+    test_workers_reuse_parent_offset_tables()